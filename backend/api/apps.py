@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from core.checks import require_shared_cache
+
+        if settings.TOKEN_AUTH_SHARED_CACHE:
+            require_shared_cache(settings.TOKEN_AUTH_SHARED_CACHE,
+                                 'TOKEN_AUTH_SHARED_CACHE')
@@ -0,0 +1,192 @@
+"""Аутентификация по токену с кэшированием пользователя."""
+import copy
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+
+from core import metrics
+from core.constants import TOKEN_AUTH_CACHE_MAX_SIZE, TOKEN_AUTH_CACHE_TTL
+
+SHARED_CACHE_KEY = 'token-auth:{key}'
+SHARED_GENERATION_KEY = 'token-auth-generation:{key}'
+
+
+class TokenUserCache:
+    """
+    LRU-кэш процесса «ключ токена → пользователь» с ограниченным временем
+    жизни.
+
+    Поколение увеличивается при каждом сбросе записей: снимок, прочитанный
+    из базы до сброса, уже не сохраняется.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at < time.monotonic():
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def generation(self, key):
+        return self._generation
+
+    def set(self, key, user, generation):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._pop(key)
+            self._entries[key] = (user, time.monotonic() + self.ttl)
+            self._keys_by_user.setdefault(user.pk, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._pop(next(iter(self._entries)))
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            keys = self._keys_by_user.get(entry[0].pk)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_user[entry[0].pk]
+
+    def invalidate_keys(self, keys):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._pop(key)
+
+    def user_keys(self, user_id):
+        with self._lock:
+            return set(self._keys_by_user.get(user_id, ()))
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SharedTokenUserCache:
+    """
+    Кэш токенов в общем для процессов кэше Django.
+
+    У каждого ключа есть поколение — случайное значение, которое меняется
+    при сбросе. Запись, сделанная после чтения из базы, удаляется, если
+    поколение за это время изменилось: иначе выход в соседнем процессе
+    мог бы проскочить между запросом к базе и записью в кэш.
+    """
+
+    def __init__(self, cache, ttl):
+        self.cache = cache
+        self.ttl = ttl
+
+    def get(self, key):
+        return self.cache.get(SHARED_CACHE_KEY.format(key=key))
+
+    def generation(self, key):
+        return self.cache.get(SHARED_GENERATION_KEY.format(key=key))
+
+    def set(self, key, user, generation):
+        entry_key = SHARED_CACHE_KEY.format(key=key)
+        self.cache.set(entry_key, user, self.ttl)
+        if self.generation(key) != generation:
+            self.cache.delete(entry_key)
+
+    def invalidate_keys(self, keys):
+        # Сначала поколение, затем запись: так сброс не теряется ни при
+        # каком порядке операций с set.
+        self.cache.set_many({SHARED_GENERATION_KEY.format(key=key):
+                             secrets.token_hex(8) for key in keys}, self.ttl)
+        self.cache.delete_many(
+            [SHARED_CACHE_KEY.format(key=key) for key in keys])
+
+
+token_user_cache = TokenUserCache(TOKEN_AUTH_CACHE_MAX_SIZE,
+                                  TOKEN_AUTH_CACHE_TTL)
+metrics.Gauge('token_auth_cache_entries', 'Токены в кэше процесса.',
+              lambda: len(token_user_cache))
+
+
+def get_token_user_cache():
+    """
+    Кэш токенов по настройкам или None, если кэшировать нельзя.
+
+    Кэш процесса не видит выходы и смену пароля в других процессах,
+    поэтому при нескольких воркерах нужен общий кэш.
+    """
+    if settings.TOKEN_AUTH_SHARED_CACHE:
+        return SharedTokenUserCache(
+            caches[settings.TOKEN_AUTH_SHARED_CACHE], TOKEN_AUTH_CACHE_TTL)
+    if settings.TOKEN_AUTH_PROCESS_CACHE:
+        return token_user_cache
+    return None
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication без запроса к базе для уже известных токенов.
+
+    Пользователь хранится в общем кэше TOKEN_AUTH_SHARED_CACHE или, если
+    процесс единственный (TOKEN_AUTH_PROCESS_CACHE), в памяти процесса.
+    Записи сбрасываются сигналами (см. api/signals.py) при выходе,
+    сохранении и удалении пользователя, поэтому отзыв токена действует
+    сразу. request.user при попадании в кэш — снимок, который может
+    отставать от базы, поэтому действия, сохраняющие пользователя,
+    загружают его заново (см. `fresh_user`).
+    """
+
+    def authenticate_credentials(self, key):
+        cache = get_token_user_cache()
+        if cache is None:
+            return super().authenticate_credentials(key)
+        user = cache.get(key)
+        metrics.cache_requests.inc(
+            'token_auth', 'miss' if user is None else 'hit')
+        if user is None:
+            generation = cache.generation(key)
+            user, token = super().authenticate_credentials(key)
+            cache.set(key, copy.copy(user), generation)
+            return user, token
+        user = copy.copy(user)
+        return user, self.get_model()(key=key, user=user)
+
+
+def invalidate_token(key):
+    token_user_cache.invalidate_keys([key])
+    if settings.TOKEN_AUTH_SHARED_CACHE:
+        get_token_user_cache().invalidate_keys([key])
+
+
+def invalidate_user_tokens(user_id):
+    token_user_cache.invalidate_keys(token_user_cache.user_keys(user_id))
+    if settings.TOKEN_AUTH_SHARED_CACHE:
+        # Токены, закэшированные другими процессами, известны только базе.
+        keys = TokenAuthentication().get_model().objects.filter(
+            user_id=user_id).values_list('key', flat=True)
+        get_token_user_cache().invalidate_keys(list(keys))
+
+
+def fresh_user(user):
+    """
+    Пользователь, прочитанный из базы заново.
+
+    Для действий, которые сохраняют пользователя: снимок из кэша
+    токенов, сохранённый целиком, записал бы поверх изменений, сделанных
+    в базе после его чтения.
+    """
+    return type(user)._base_manager.get(pk=user.pk)
@@ -1,12 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Q
 from django_filters import rest_framework
+from core.ingredient_search import search_ingredients
 from core.models import Ingredient
 from django_filters.rest_framework import FilterSet
 
+User = get_user_model()
+
 
 class IngredientFilter(FilterSet):
-    name = rest_framework.CharFilter(
-        field_name='name', lookup_expr='startswith')
+    name = rest_framework.CharFilter(method='filter_name')
 
     class Meta:
         model = Ingredient
         fields = ("name",)
+
+    def filter_name(self, queryset, name, value):
+        # Сначала совпадения по началу названия, затем — с опечатками.
+        return search_ingredients(queryset, value)
+
+
+class UserFilter(FilterSet):
+    search = rest_framework.CharFilter(method='filter_search')
+
+    class Meta:
+        model = User
+        fields = ("search",)
+
+    def filter_search(self, queryset, name, value):
+        # Поиск по префиксу использует индексы username и email. Список
+        # публичный: анониму поиск по email позволил бы проверять, какие
+        # адреса зарегистрированы.
+        condition = Q(username__startswith=value)
+        if self.request is not None and self.request.user.is_authenticated:
+            condition |= Q(email__startswith=value)
+        return queryset.filter(condition)
@@ -0,0 +1,34 @@
+from core.models import Subscription
+
+FOLLOWED_AUTHOR_IDS_ATTR = '_followed_author_ids'
+
+
+def _http_request(request):
+    # DRF-запрос оборачивает HttpRequest; кэш храним на исходном объекте,
+    # чтобы его видели все сериализаторы и представления этого запроса.
+    return getattr(request, '_request', request)
+
+
+def get_followed_author_ids(request):
+    """
+    Возвращает множество id авторов, на которых подписан пользователь.
+
+    Множество загружается одним запросом и запоминается на объекте
+    запроса до конца его обработки.
+    """
+    http_request = _http_request(request)
+    author_ids = getattr(http_request, FOLLOWED_AUTHOR_IDS_ATTR, None)
+    if author_ids is None:
+        author_ids = set(
+            Subscription.objects.filter(user=request.user)
+            .values_list('author_id', flat=True)
+        )
+        setattr(http_request, FOLLOWED_AUTHOR_IDS_ATTR, author_ids)
+    return author_ids
+
+
+def invalidate_followed_author_ids(request):
+    """Сбрасывает множество подписок после подписки или отписки."""
+    http_request = _http_request(request)
+    if hasattr(http_request, FOLLOWED_AUTHOR_IDS_ATTR):
+        delattr(http_request, FOLLOWED_AUTHOR_IDS_ATTR)
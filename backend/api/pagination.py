@@ -1,6 +1,63 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+from core import metrics
+from core.constants import USERS_COUNT_CACHE_TIMEOUT
 
 
 class RecipePagination(PageNumberPagination):
     page_size_query_param = 'limit'
     max_page_size = 100
+
+
+class CachedCountPaginator(Paginator):
+    """Пагинатор, кэширующий COUNT(*) для одинаковых запросов."""
+
+    @cached_property
+    def count(self):
+        query = str(self.object_list.query).encode()
+        key = f'paginator-count:{hashlib.md5(query).hexdigest()}'
+        count = cache.get(key)
+        if count is None:
+            metrics.cache_requests.inc('paginator_count', 'miss')
+            count = super().count
+            cache.set(key, count, USERS_COUNT_CACHE_TIMEOUT)
+        else:
+            metrics.cache_requests.inc('paginator_count', 'hit')
+        return count
+
+
+class UserCursorPagination(CursorPagination):
+    ordering = ('username', 'id')
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+
+class UserPagination(RecipePagination):
+    """
+    Постраничный вывод пользователей.
+
+    По умолчанию работает по номеру страницы, как описано в спецификации
+    API, но без пересчёта COUNT(*) на каждый запрос. С параметром
+    `?cursor=` (для первой страницы — пустым) переключается на пагинацию
+    по ключу (username, id), стоимость которой не зависит от глубины.
+    """
+    django_paginator_class = CachedCountPaginator
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.cursor_query_param in request.query_params:
+            self.cursor_paginator = UserCursorPagination()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
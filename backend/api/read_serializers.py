@@ -0,0 +1,344 @@
+"""
+Быстрые сериализаторы только для чтения.
+
+Выдают тот же JSON, что RecipeSerializer, UserSerializer и
+SiteUserSerializer, но без создания полей DRF на каждый объект:
+функции доступа к полям собираются один раз на страницу, а данные для
+вычисляемых полей загружаются пакетно в prepare(). Строками могут быть
+экземпляры моделей или словари из `.values(*cls.value_fields())`.
+
+Параметры ?fields= и ?expand= (см. ReadSerializer.parse_selection)
+ограничивают набор полей; value_fields() и prepare() тогда не читают
+столбцы и не выполняют запросы для невыбранных полей.
+"""
+from collections import defaultdict
+from operator import attrgetter, itemgetter
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+from rest_framework.exceptions import ValidationError
+
+from core.constants import MAX_RECIPES_LIMIT
+from core.models import Favorite, Recipe, RecipeIngredient, ShopCart
+from .followed_authors import get_followed_author_ids
+
+User = get_user_model()
+
+
+def _getter(values, path):
+    if values:
+        return itemgetter(path.replace('.', '__'))
+    return attrgetter(path)
+
+
+def _file_url(request, storage, value):
+    # Как FileField.to_representation в DRF: для экземпляра приходит
+    # FieldFile, для строки из values() — имя файла.
+    name = getattr(value, 'name', value)
+    if not name:
+        return None
+    url = storage.url(name)
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+class ReadField:
+    """Значение из строки по пути `source`."""
+
+    def __init__(self, source):
+        self.source = source
+
+    def bind(self, serializer, name, rows, values, prefix):
+        get = _getter(values, prefix + self.source)
+        return lambda row, data: get(row)
+
+
+class FileUrlField(ReadField):
+    """Абсолютный URL файла из поля модели `model.source`."""
+
+    def __init__(self, source, model):
+        super().__init__(source)
+        self.model = model
+
+    def bind(self, serializer, name, rows, values, prefix):
+        get = _getter(values, prefix + self.source)
+        storage = self.model._meta.get_field(self.source).storage
+        request = serializer.request
+        return lambda row, data: _file_url(request, storage, get(row))
+
+
+class MethodField:
+    """
+    Значение, которое возвращает метод get_<имя> сериализатора.
+
+    Метод получает уже собранную часть представления объекта, поэтому
+    поля, от которых он зависит (обычно id), должны быть объявлены выше.
+    """
+
+    def __init__(self, method_name=None):
+        self.method_name = method_name
+
+    def bind(self, serializer, name, rows, values, prefix):
+        method = getattr(serializer, self.method_name or f'get_{name}')
+        return lambda row, data: method(data)
+
+
+class NestedField:
+    """Вложенный сериализатор для связанного объекта `source`."""
+
+    def __init__(self, serializer_class, source):
+        self.serializer_class = serializer_class
+        self.source = source
+
+    def bind(self, serializer, name, rows, values, prefix):
+        child = self.serializer_class(context=serializer.context)
+        accessors = child.bind(rows, values, f'{prefix}{self.source}.')
+        return lambda row, data: child.build(row, accessors)
+
+
+class ReadSerializer:
+    """Базовый класс; поля перечисляются в `fields` в порядке вывода."""
+    fields = {}
+    # Вложенные ресурсы и их свёрнутый вид, если их нет в ?expand=.
+    collapsed = {}
+
+    def __init__(self, instance=None, many=False, context=None,
+                 only=None, expand=None):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+        self.selected, self.hidden = self.select_fields(only, expand)
+        self.request = self.context.get('request')
+        user = getattr(self.request, 'user', None)
+        self.user = user if user and user.is_authenticated else None
+        # Что возвращают поля вида «request and user.is_authenticated
+        # and ...» в исходных сериализаторах, когда пользователя нет.
+        self.anonymous_value = None if self.request is None else False
+
+    @classmethod
+    def parse_selection(cls, query_params):
+        """
+        Читает ?fields= и ?expand= в аргументы `only` и `expand`.
+
+        `fields` — поля верхнего уровня через запятую, `expand` — какие
+        из вложенных ресурсов (`collapsed`) выводить целиком; остальные
+        выводятся в свёрнутом виде. Без параметров выводится всё.
+        """
+        selection = {}
+        for param, key, allowed in (('fields', 'only', cls.fields),
+                                    ('expand', 'expand', cls.collapsed)):
+            if param not in query_params:
+                continue
+            names = {name.strip() for name in query_params[param].split(',')
+                     if name.strip()}
+            unknown = sorted(names - allowed.keys())
+            if unknown:
+                raise ValidationError({param: [
+                    f'Неизвестные поля: {", ".join(unknown)}. '
+                    f'Допустимые: {", ".join(allowed)}.']})
+            selection[key] = frozenset(names)
+        return selection
+
+    @classmethod
+    def select_fields(cls, only=None, expand=None):
+        """
+        Выводимые поля и скрытые поля.
+
+        id нужен методам-полям и prepare(), поэтому собирается всегда и
+        скрывается, если его не запросили.
+        """
+        selected = {}
+        for name, field in cls.fields.items():
+            if only is not None and name not in only and name != 'id':
+                continue
+            if (expand is not None and name in cls.collapsed
+                    and name not in expand):
+                field = cls.collapsed[name]
+            selected[name] = field
+        hidden = () if only is None or 'id' in only else ('id',)
+        return selected, hidden
+
+    @classmethod
+    def embeds(cls, name, only=None, expand=None):
+        """Выводится ли поле `name` целиком при таком выборе."""
+        selected, _ = cls.select_fields(only, expand)
+        return selected.get(name) is cls.fields[name]
+
+    @classmethod
+    def value_fields(cls, prefix='', only=None, expand=None):
+        """Имена полей для `.values()`, достаточные для сериализации."""
+        selected, _ = cls.select_fields(only, expand)
+        names = []
+        for field in selected.values():
+            if isinstance(field, NestedField):
+                names += field.serializer_class.value_fields(
+                    f'{prefix}{field.source}__')
+            elif isinstance(field, ReadField):
+                names.append(prefix + field.source)
+        return names
+
+    def prepare(self, ids):
+        """Пакетно загружает данные для методов-полей по id объектов."""
+
+    def bind(self, rows, values, prefix=''):
+        get_id = _getter(values, f'{prefix}id')
+        self.prepare([get_id(row) for row in rows])
+        return [
+            (name, field.bind(self, name, rows, values, prefix))
+            for name, field in self.selected.items()
+        ]
+
+    def build(self, row, accessors):
+        data = {}
+        for name, get in accessors:
+            data[name] = get(row, data)
+        for name in self.hidden:
+            del data[name]
+        return data
+
+    @property
+    def data(self):
+        if not self.many and self.instance is None:
+            return {}
+        rows = list(self.instance) if self.many else [self.instance]
+        if not rows:
+            return []
+        accessors = self.bind(rows, isinstance(rows[0], dict))
+        result = [self.build(row, accessors) for row in rows]
+        return result if self.many else result[0]
+
+
+class UserReadSerializer(ReadSerializer):
+    fields = {
+        'email': ReadField('email'),
+        'id': ReadField('id'),
+        'username': ReadField('username'),
+        'first_name': ReadField('first_name'),
+        'last_name': ReadField('last_name'),
+        'is_subscribed': MethodField(),
+        'avatar': FileUrlField('avatar', User),
+    }
+
+    def prepare(self, ids):
+        self._followed = (get_followed_author_ids(self.request)
+                          if self.user else None)
+
+    def get_is_subscribed(self, data):
+        if self._followed is None:
+            return self.anonymous_value
+        return data['id'] in self._followed
+
+
+class SiteUserReadSerializer(UserReadSerializer):
+    fields = {
+        **UserReadSerializer.fields,
+        'recipes': MethodField(),
+        'recipes_count': MethodField(),
+    }
+
+    def prepare(self, ids):
+        super().prepare(ids)
+        try:
+            limit = int(self.request.GET.get(
+                'recipes_limit', MAX_RECIPES_LIMIT))
+        except ValueError:
+            limit = MAX_RECIPES_LIMIT
+        self._recipes = defaultdict(list)
+        self._counts = {}
+        if not ids:
+            return
+        storage = Recipe._meta.get_field('image').storage
+        # Первые рецепты каждого автора и их общее число — одним запросом.
+        # Первая строка нужна всегда, чтобы узнать число рецептов.
+        rows = Recipe.objects.filter(author_id__in=ids).annotate(
+            position=Window(RowNumber(), partition_by=F('author_id'),
+                            order_by=F('pub_date').desc()),
+            total=Window(Count('id'), partition_by=F('author_id')),
+        ).filter(position__lte=max(limit, 1)).order_by(
+            'author_id', 'position').values_list(
+            'author_id', 'position', 'total',
+            'id', 'name', 'image', 'cooking_time')
+        for author_id, position, total, pk, name, image, time in rows:
+            self._counts[author_id] = total
+            if position <= limit:
+                self._recipes[author_id].append({
+                    'id': pk,
+                    'name': name,
+                    'image': _file_url(self.request, storage, image),
+                    'cooking_time': time,
+                })
+
+    def get_recipes(self, data):
+        return self._recipes.get(data['id'], [])
+
+    def get_recipes_count(self, data):
+        return self._counts.get(data['id'], 0)
+
+
+class RecipeReadSerializer(ReadSerializer):
+    fields = {
+        'id': ReadField('id'),
+        'author': NestedField(UserReadSerializer, 'author'),
+        'ingredients': MethodField(),
+        'is_favorited': MethodField(),
+        'is_in_shopping_cart': MethodField(),
+        'name': ReadField('name'),
+        'image': FileUrlField('image', Recipe),
+        'text': ReadField('text'),
+        'cooking_time': ReadField('cooking_time'),
+    }
+    collapsed = {
+        'author': ReadField('author_id'),
+        # Только id и количество, без соединения с ингредиентами.
+        'ingredients': MethodField(),
+    }
+
+    def prepare(self, ids):
+        self._ingredients = defaultdict(list)
+        self._favorited = self._in_cart = None
+        if not ids:
+            return
+        if 'ingredients' in self.selected:
+            self._load_ingredients(ids)
+        if self.user and 'is_favorited' in self.selected:
+            self._favorited = set(Favorite.objects.filter(
+                user=self.user, recipe_id__in=ids,
+            ).values_list('recipe_id', flat=True))
+        if self.user and 'is_in_shopping_cart' in self.selected:
+            self._in_cart = set(ShopCart.objects.filter(
+                user=self.user, recipe_id__in=ids,
+            ).values_list('recipe_id', flat=True))
+
+    def _load_ingredients(self, ids):
+        rows = RecipeIngredient.objects.filter(
+            recipe_id__in=ids).order_by('recipe_id', 'id')
+        if self.selected['ingredients'] is not self.fields['ingredients']:
+            for recipe_id, pk, amount in rows.values_list(
+                    'recipe_id', 'ingredient_id', 'amount'):
+                self._ingredients[recipe_id].append(
+                    {'id': pk, 'amount': amount})
+            return
+        for recipe_id, pk, name, unit, amount in rows.values_list(
+                'recipe_id', 'ingredient_id', 'ingredient__name',
+                'ingredient__measurement_unit', 'amount'):
+            self._ingredients[recipe_id].append({
+                'id': pk,
+                'name': name,
+                'measurement_unit': unit,
+                'amount': amount,
+            })
+
+    def get_ingredients(self, data):
+        return self._ingredients.get(data['id'], [])
+
+    def get_is_favorited(self, data):
+        if self._favorited is None:
+            return self.anonymous_value
+        return data['id'] in self._favorited
+
+    def get_is_in_shopping_cart(self, data):
+        if self._in_cart is None:
+            return self.anonymous_value
+        return data['id'] in self._in_cart
@@ -4,12 +4,14 @@ from djoser.serializers import UserSerializer as DjoserUserSerializer
 from django.contrib.auth import get_user_model
 from core.models import (Ingredient, Recipe, RecipeIngredient,
                          Favorite, ShopCart, Subscription)
+from core.minhash import near_duplicates, update_signatures
 from core.constants import (MAX_RECIPES_LIMIT,
                             RECIPE_INGREDIENT_AMOUNT_MIN_VALUE,
                             RECIPE_INGREDIENT_AMOUNT_MAX_VALUE,
                             RECIPE_COOKING_TIME_MIN_VALUE,
                             RECIPE_COOKING_TIME_MAX_VALUE)
 from config.settings import MEDIA_URL
+from .followed_authors import get_followed_author_ids
 
 User = get_user_model()
 
@@ -137,7 +139,7 @@ class UserSerializer(DjoserUserSerializer):
     def get_is_subscribed(self, author):
         request = self.context.get('request')
         return (request and request.user.is_authenticated
-                and author.subscribers.filter(user=request.user).exists())
+                and author.id in get_followed_author_ids(request))
 
 
 class SiteUserSerializer(UserSerializer):
@@ -181,8 +183,40 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit')
 
 
+class IngredientIdField(serializers.PrimaryKeyRelatedField):
+    """Берёт ингредиент из загруженных списком, без запроса на каждый id."""
+
+    def to_internal_value(self, data):
+        ingredients = getattr(self.parent.parent, 'ingredients', None)
+        if ingredients is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return ingredients[int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+class IngredientInRecipeListSerializer(serializers.ListSerializer):
+    """Загружает все ингредиенты списка одним запросом in_bulk()."""
+
+    def to_internal_value(self, data):
+        ids = set()
+        if isinstance(data, list):
+            for item in data:
+                try:
+                    ids.add(int(item['id']))
+                except (KeyError, TypeError, ValueError):
+                    pass
+        self.ingredients = Ingredient.objects.in_bulk(ids)
+        return super().to_internal_value(data)
+
+
 class IngredientInRecipeSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
+    id = IngredientIdField(
         queryset=Ingredient.objects.all(),
         source='ingredient'
     )
@@ -202,6 +236,7 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
     class Meta:
         model = RecipeIngredient
         fields = ('id', 'name', 'measurement_unit', 'amount')
+        list_serializer_class = IngredientInRecipeListSerializer
 
 
 class RecipeSerializer(serializers.ModelSerializer):
@@ -283,6 +318,11 @@ class RecipeSerializer(serializers.ModelSerializer):
         ingredients_data = validated_data.pop('recipe_ingredients')
         recipe = Recipe.objects.create(**validated_data)
         self._create_ingredients(recipe, ingredients_data)
+        # Подпись нужна сразу для предупреждения о дубликатах, поэтому не
+        # ждём фоновой задачи из core/signals.py. Не ошибка: представление
+        # только предупреждает автора.
+        signature = update_signatures([recipe.pk])[0]
+        self.near_duplicates = near_duplicates(recipe.pk, signature)
         return recipe
 
     def _create_ingredients(self, recipe, ingredients_data):
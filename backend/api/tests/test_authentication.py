@@ -0,0 +1,130 @@
+from unittest import mock
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from api.authentication import (CachedTokenAuthentication,
+                                get_token_user_cache, invalidate_token,
+                                token_user_cache)
+from core.models import SiteUser
+
+PASSWORD = 'Xq9-long-password'
+# Маленькая картинка PNG 1x1.
+AVATAR = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAA'
+          'fFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==')
+
+
+class TokenCacheMixin:
+    """Отзыв токена и сохранение снимка пользователя из кэша."""
+
+    def setUp(self):
+        cache.clear()
+        token_user_cache.invalidate_keys(list(token_user_cache._entries))
+        self.user = SiteUser.objects.create_user(
+            email='cook@example.com', username='cook', password=PASSWORD,
+            first_name='Имя', last_name='Фамилия')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def get_me(self):
+        return self.client.get('/api/users/me/').status_code
+
+    def test_cached_request_skips_token_query(self):
+        # Токен и подписки; из кэша — только подписки.
+        with self.assertNumQueries(2):
+            self.assertEqual(self.get_me(), 200)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_me(), 200)
+
+    def test_logout_revokes_immediately(self):
+        self.assertEqual(self.get_me(), 200)
+        response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get_me(), 401)
+
+    def test_deactivation_revokes_immediately(self):
+        self.assertEqual(self.get_me(), 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get_me(), 401)
+
+    def test_deletion_revokes_immediately(self):
+        self.assertEqual(self.get_me(), 200)
+        self.user.delete()
+        self.assertEqual(self.get_me(), 401)
+
+    def test_password_change_refreshes_snapshot(self):
+        self.assertEqual(self.get_me(), 200)
+        response = self.client.post('/api/users/set_password/', {
+            'current_password': PASSWORD, 'new_password': 'An0ther-pass'})
+        self.assertEqual(response.status_code, 204)
+        self.assertIsNone(get_token_user_cache().get(self.token.key))
+
+    def test_logout_during_miss_is_not_cached(self):
+        def authenticate_then_logout(auth, key):
+            result = original(auth, key)
+            # Выход в другом процессе между запросом к базе и записью.
+            invalidate_token(key)
+            return result
+
+        original = TokenAuthentication.authenticate_credentials
+        with mock.patch.object(TokenAuthentication,
+                               'authenticate_credentials',
+                               authenticate_then_logout):
+            CachedTokenAuthentication().authenticate_credentials(
+                self.token.key)
+        self.assertIsNone(get_token_user_cache().get(self.token.key))
+
+    def test_snapshot_save_keeps_other_columns(self):
+        self.assertEqual(self.get_me(), 200)
+        # Столбец меняется в обход save(), как is_popular в core/feed.py.
+        SiteUser.objects.filter(pk=self.user.pk).update(is_popular=True)
+        response = self.client.put(
+            '/api/users/me/avatar/', {'avatar': AVATAR}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.client.post('/api/users/set_password/', {
+            'current_password': PASSWORD, 'new_password': 'An0ther-pass'})
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_popular)
+        self.assertTrue(self.user.check_password('An0ther-pass'))
+
+
+@override_settings(TOKEN_AUTH_PROCESS_CACHE=True)
+class ProcessTokenCacheTest(TokenCacheMixin, APITestCase):
+    pass
+
+
+@override_settings(TOKEN_AUTH_SHARED_CACHE='default')
+class SharedTokenCacheTest(TokenCacheMixin, APITestCase):
+    pass
+
+
+class TokenCacheSettingsTest(SimpleTestCase):
+
+    def test_without_shared_cache_tokens_are_not_cached(self):
+        self.assertIsNone(get_token_user_cache())
+
+    @override_settings(TOKEN_AUTH_SHARED_CACHE='default')
+    def test_local_memory_shared_cache_fails_at_startup(self):
+        with self.assertRaises(ImproperlyConfigured):
+            apps.get_app_config('api').ready()
+
+    @override_settings(TOKEN_AUTH_SHARED_CACHE='missing')
+    def test_unknown_alias_fails_at_startup(self):
+        with self.assertRaises(ImproperlyConfigured):
+            apps.get_app_config('api').ready()
+
+    @override_settings(TOKEN_AUTH_SHARED_CACHE='shared', CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'shared': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': 'redis://redis:6379/0'},
+    })
+    def test_redis_shared_cache_is_accepted(self):
+        apps.get_app_config('api').ready()
@@ -0,0 +1,99 @@
+from io import StringIO
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase
+from rest_framework.request import Request
+
+from api.read_serializers import (RecipeReadSerializer, SiteUserReadSerializer,
+                                  UserReadSerializer)
+from api.serializers import (RecipeSerializer, SiteUserSerializer,
+                             UserSerializer)
+from core.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                         ShopCart, SiteUser, Subscription)
+
+
+class ReadSerializersMatchTest(TestCase):
+    """Быстрые сериализаторы выдают то же, что сериализаторы DRF."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader, cls.cook, cls.baker = SiteUser.objects.bulk_create(
+            SiteUser(email=f'{name}@example.com', username=name,
+                     first_name='Имя', last_name='Фамилия')
+            for name in ('reader', 'cook', 'baker'))
+        SiteUser.objects.filter(pk=cls.cook.pk).update(
+            avatar='users/avatar.png')
+        salt, flour = Ingredient.objects.bulk_create([
+            Ingredient(name='Соль', measurement_unit='г'),
+            Ingredient(name='Мука', measurement_unit='кг')])
+        recipes = []
+        for number, author in enumerate(
+                (cls.cook, cls.cook, cls.baker, cls.cook)):
+            recipes.append(Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Текст',
+                cooking_time=number + 1,
+                image=f'recipes/images/{number}.png'))
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe=recipes[0], ingredient=salt, amount=5),
+            RecipeIngredient(recipe=recipes[0], ingredient=flour, amount=1),
+            RecipeIngredient(recipe=recipes[2], ingredient=flour, amount=2)])
+        Favorite.objects.create(user=cls.reader, recipe=recipes[0])
+        ShopCart.objects.create(user=cls.reader, recipe=recipes[2])
+        Subscription.objects.create(user=cls.reader, author=cls.cook)
+
+    def request(self, user, **params):
+        request = Request(RequestFactory().get('/api/', params))
+        request.user = user
+        return request
+
+    def assert_same(self, fast, drf):
+        self.assertEqual(len(fast), len(drf))
+        for fast_row, drf_row in zip(fast, drf):
+            # Те же поля в том же порядке и те же значения.
+            self.assertEqual(list(fast_row), list(drf_row))
+            self.assertEqual(fast_row, drf_row)
+
+    def compare(self, read_class, drf_class, queryset, user, **params):
+        context = {'request': self.request(user, **params)}
+        drf = drf_class(queryset, many=True, context=context).data
+        for rows in (queryset, queryset.values(*read_class.value_fields())):
+            with self.subTest(values=rows is not queryset):
+                self.assert_same(
+                    read_class(rows, many=True, context=context).data, drf)
+
+    def users(self):
+        return (AnonymousUser(), self.reader)
+
+    def test_recipes(self):
+        queryset = Recipe.objects.order_by('-pub_date')
+        for user in self.users():
+            with self.subTest(user=user):
+                self.compare(RecipeReadSerializer, RecipeSerializer,
+                             queryset, user)
+
+    def test_users(self):
+        queryset = SiteUser.objects.order_by('pk')
+        for user in self.users():
+            with self.subTest(user=user):
+                self.compare(UserReadSerializer, UserSerializer,
+                             queryset, user)
+
+    def test_authors_with_recipes(self):
+        queryset = SiteUser.objects.order_by('pk')
+        for limit in ('1', '10', 'abc'):
+            with self.subTest(recipes_limit=limit):
+                self.compare(SiteUserReadSerializer, SiteUserSerializer,
+                             queryset, self.reader, recipes_limit=limit)
+
+    def test_missing_instance(self):
+        self.assertEqual(RecipeReadSerializer().data, {})
+        self.assertEqual(RecipeReadSerializer([], many=True).data, [])
+
+    def test_benchmark_baseline_matches(self):
+        for user in (None, self.reader.pk):
+            out, err = StringIO(), StringIO()
+            call_command('benchmark_serializers', repeat=1, user=user,
+                         stdout=out, stderr=err)
+            self.assertEqual(err.getvalue(), '')
+            self.assertIn('RecipeReadSerializer', out.getvalue())
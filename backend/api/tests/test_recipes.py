@@ -0,0 +1,119 @@
+import tempfile
+
+from django.test import TestCase
+from rest_framework import serializers
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from api.serializers import IngredientInRecipeSerializer, RecipeSerializer
+from core.models import Ingredient, Recipe, SiteUser
+
+# Маленькая картинка PNG 1x1.
+IMAGE = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAA'
+         'fFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==')
+
+
+class StockIngredientInRecipeSerializer(IngredientInRecipeSerializer):
+    """Ингредиенты рецепта с обычным PrimaryKeyRelatedField DRF."""
+
+    id = serializers.PrimaryKeyRelatedField(
+        queryset=Ingredient.objects.all(), source='ingredient')
+
+    class Meta(IngredientInRecipeSerializer.Meta):
+        list_serializer_class = serializers.ListSerializer
+
+
+def recipe_data(ingredients):
+    return {'name': 'Рецепт', 'text': 'Текст', 'cooking_time': 10,
+            'image': IMAGE, 'ingredients': ingredients}
+
+
+class IngredientValidationQueriesTest(TestCase):
+    """Ингредиенты рецепта проверяются одним запросом при любом их числе."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(50))
+        cls.ids = list(Ingredient.objects.order_by('pk').values_list(
+            'pk', flat=True))
+
+    def test_fifty_ingredients_take_one_query(self):
+        serializer = RecipeSerializer(data=recipe_data(
+            [{'id': pk, 'amount': 10} for pk in self.ids]))
+        with self.assertNumQueries(1):
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+
+    def test_errors_match_primary_key_field(self):
+        unknown = max(self.ids) + 1
+        payloads = (
+            [{'id': self.ids[0], 'amount': 1}, {'id': unknown, 'amount': 1}],
+            [{'id': 'abc', 'amount': 1}],
+            [{'id': True, 'amount': 1}],
+            [{'id': [self.ids[0]], 'amount': 1}],
+            [{'id': None, 'amount': 1}],
+            [{'amount': 1}],
+            [{'id': unknown, 'amount': 0}],
+        )
+        for payload in payloads:
+            with self.subTest(payload=payload):
+                fast = IngredientInRecipeSerializer(data=payload, many=True)
+                stock = StockIngredientInRecipeSerializer(
+                    data=payload, many=True)
+                self.assertFalse(fast.is_valid())
+                self.assertFalse(stock.is_valid())
+                self.assertEqual(fast.errors, stock.errors)
+
+
+class RecipeCreateErrorsTest(APITestCase):
+    """Ошибки ингредиентов в ответе на создание рецепта."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = SiteUser.objects.create(
+            email='cook@example.com', username='cook')
+        cls.token = Token.objects.create(user=cls.user)
+        cls.ingredient = Ingredient.objects.create(
+            name='Соль', measurement_unit='г')
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = self.settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def create(self, ingredients):
+        return self.client.post('/api/recipes/', recipe_data(ingredients),
+                                format='json')
+
+    def test_unknown_id(self):
+        response = self.create([
+            {'id': self.ingredient.pk, 'amount': 1},
+            {'id': self.ingredient.pk + 1, 'amount': 1}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'ingredients': [
+            {},
+            {'id': ['Недопустимый первичный ключ '
+                    f'"{self.ingredient.pk + 1}" - объект не существует.']},
+        ]})
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_duplicate_id(self):
+        response = self.create([{'id': self.ingredient.pk, 'amount': 1}] * 2)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {
+            'ingredients': ['Дублирование ингредиентов не допускается.']})
+
+    def test_created_recipe_keeps_write_representation(self):
+        response = self.create([{'id': self.ingredient.pk, 'amount': 5}])
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(data['author']['id'], self.user.pk)
+        self.assertIs(data['is_favorited'], False)
+        self.assertIs(data['is_in_shopping_cart'], False)
+        self.assertEqual(data['ingredients'], [{
+            'id': self.ingredient.pk, 'name': 'Соль',
+            'measurement_unit': 'г', 'amount': 5}])
@@ -0,0 +1,76 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from api.throttling import (CacheRateBackend, SlidingWindowThrottle,
+                            reset_rate_backend)
+from core.models import SiteUser
+
+RATES = {'recipe.write': '3/hour'}
+
+
+class RecipeWriteThrottleMixin:
+    """PUT, PATCH и POST рецепта расходуют один лимит recipe.write."""
+
+    def setUp(self):
+        cache.clear()
+        reset_rate_backend()
+        self.addCleanup(reset_rate_backend)
+        patcher = mock.patch.object(
+            SlidingWindowThrottle, 'THROTTLE_RATES', RATES)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        user = SiteUser.objects.create_user(
+            email='cook@example.com', username='cook', password='x')
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_put_and_patch_share_budget(self):
+        # Тело неверное: ограничение проверяется раньше валидации.
+        statuses = [
+            self.client.put('/api/recipes/1/', {}, format='json').status_code,
+            self.client.patch('/api/recipes/1/', {},
+                              format='json').status_code,
+            self.client.put('/api/recipes/1/', {}, format='json').status_code,
+            self.client.patch('/api/recipes/1/', {},
+                              format='json').status_code,
+        ]
+        self.assertNotIn(429, statuses[:3])
+        self.assertEqual(statuses[3], 429)
+        response = self.client.post('/api/recipes/', {}, format='json')
+        self.assertEqual(response.status_code, 429)
+
+
+class LocalRecipeWriteThrottleTest(RecipeWriteThrottleMixin, APITestCase):
+    pass
+
+
+@override_settings(THROTTLE_SHARED_CACHE='default')
+class SharedRecipeWriteThrottleTest(RecipeWriteThrottleMixin, APITestCase):
+    pass
+
+
+class CacheRateBackendTest(SimpleTestCase):
+    """Общий кэш: счётчики видны всем процессам, операция на запрос одна."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_processes_share_counters(self):
+        first = CacheRateBackend('default')
+        second = CacheRateBackend('default')
+        self.assertEqual(first.hit('key', 10, 60), (0, 1))
+        self.assertEqual(second.hit('key', 10, 60), (0, 2))
+        self.assertEqual(first.hit('key', 11, 60), (2, 1))
+        self.assertEqual(second.hit('key', 11, 60), (2, 2))
+
+    def test_single_cache_operation_per_hit(self):
+        backend = CacheRateBackend('default')
+        backend.hit('key', 10, 60)
+        with mock.patch.object(backend, 'cache', wraps=backend.cache) as store:
+            backend.hit('key', 10, 60)
+        self.assertEqual(
+            [name for name, args, kwargs in store.method_calls], ['incr'])
@@ -0,0 +1,140 @@
+from django.core.cache import cache
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from core.models import SiteUser, Subscription
+
+
+class UserListQueriesTest(APITestCase):
+    """Число запросов к базе в списке пользователей не зависит от размера
+    страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        SiteUser.objects.bulk_create(
+            SiteUser(email=f'user{number}@example.com',
+                     username=f'user{number:03d}',
+                     first_name='Имя', last_name='Фамилия')
+            for number in range(120))
+        cls.user = SiteUser.objects.order_by('pk').first()
+        Subscription.objects.bulk_create(
+            Subscription(user=cls.user, author=author)
+            for author in SiteUser.objects.order_by('pk')[1:60])
+        cls.token = Token.objects.create(user=cls.user)
+
+    def assert_list_queries(self, expected):
+        for limit in (10, 100):
+            # COUNT(*) списка кэшируется; каждый запрос считает его заново.
+            cache.clear()
+            with self.assertNumQueries(expected):
+                response = self.client.get(
+                    '/api/users/', {'limit': limit})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['results']), limit)
+
+    def test_anonymous(self):
+        # COUNT(*) и страница.
+        self.assert_list_queries(2)
+        response = self.client.get('/api/users/', {'limit': 100})
+        self.assertFalse(any(
+            user['is_subscribed'] for user in response.data['results']))
+
+    def test_authenticated(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        # Токен, COUNT(*), страница и подписки одним запросом.
+        self.assert_list_queries(4)
+        response = self.client.get('/api/users/', {'limit': 100})
+        subscribed = {user['id'] for user in response.data['results']
+                      if user['is_subscribed']}
+        self.assertEqual(subscribed, set(Subscription.objects.filter(
+            user=self.user).values_list('author_id', flat=True)))
+
+
+class UserSearchTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = SiteUser.objects.create(
+            email='secret@example.com', username='chef')
+        SiteUser.objects.create(email='chef2@example.com', username='baker')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def search(self, value):
+        response = self.client.get('/api/users/', {'search': value})
+        return [user['username'] for user in response.data['results']]
+
+    def test_anonymous_searches_username_only(self):
+        self.assertEqual(self.search('ch'), ['chef'])
+        self.assertEqual(self.search('secret'), [])
+
+    def test_authenticated_searches_email_too(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(self.search('ch'), ['baker', 'chef'])
+        self.assertEqual(self.search('secret'), ['chef'])
+
+
+class UserPaginationTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        SiteUser.objects.bulk_create(
+            SiteUser(email=f'user{number}@example.com',
+                     username=f'user{number:02d}')
+            for number in range(0, 50, 2))
+
+    def setUp(self):
+        cache.clear()
+
+    def walk(self, limit, between_pages=None):
+        response = self.client.get(
+            '/api/users/', {'cursor': '', 'limit': limit})
+        usernames = []
+        while True:
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            usernames += [user['username']
+                          for user in response.data['results']]
+            if not response.data['next']:
+                return usernames
+            if between_pages:
+                between_pages()
+            response = self.client.get(response.data['next'])
+
+    def test_cursor_pages_follow_username_order(self):
+        usernames = self.walk(7)
+        self.assertEqual(usernames, sorted(SiteUser.objects.values_list(
+            'username', flat=True)))
+
+    def test_cursor_pages_are_stable_under_inserts(self):
+        expected = list(SiteUser.objects.order_by(
+            'username').values_list('username', flat=True))
+        inserted = []
+
+        def insert():
+            # Новые пользователи перед уже выданными страницами не
+            # сдвигают следующие страницы.
+            number = len(inserted)
+            SiteUser.objects.create(email=f'a{number}@example.com',
+                                    username=f'a{number}')
+            inserted.append(number)
+
+        self.assertEqual(self.walk(5, insert), expected)
+        self.assertEqual(len(inserted), 4)
+
+    def test_cursor_is_opaque_and_validated(self):
+        response = self.client.get('/api/users/', {'cursor': 'bogus'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_page_count_is_cached(self):
+        self.assertEqual(self.client.get('/api/users/').data['count'], 25)
+        SiteUser.objects.create(email='new@example.com', username='new')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/users/')
+        self.assertEqual(response.data['count'], 25)
+        cache.clear()
+        self.assertEqual(self.client.get('/api/users/').data['count'], 26)
+
+    def test_count_cache_depends_on_filter(self):
+        self.assertEqual(self.client.get('/api/users/').data['count'], 25)
+        response = self.client.get('/api/users/', {'search': 'user1'})
+        self.assertEqual(response.data['count'], 5)
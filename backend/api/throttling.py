@@ -0,0 +1,157 @@
+"""Ограничение частоты запросов скользящим окном."""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import SimpleRateThrottle
+
+from core import metrics
+from core.constants import THROTTLE_LOCAL_MAX_KEYS
+
+
+class LocalRateBackend:
+    """Счётчики в памяти процесса; подходит для одного узла."""
+
+    def __init__(self, max_keys=THROTTLE_LOCAL_MAX_KEYS):
+        self.max_keys = max_keys
+        self._counters = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, window, timeout):
+        """Учитывает запрос; возвращает счётчики прошлого и текущего окна."""
+        with self._lock:
+            counter = self._counters.pop(key, None)
+            if counter is None or counter[0] < window - 1:
+                counter = [window, 0, 0]
+            elif counter[0] == window - 1:
+                counter = [window, 0, counter[1]]
+            counter[1] += 1
+            self._counters[key] = counter
+            if len(self._counters) > self.max_keys:
+                self._counters.popitem(last=False)
+            return counter[2], counter[1]
+
+    def __len__(self):
+        return len(self._counters)
+
+
+class CacheRateBackend:
+    """
+    Счётчики в общем кэше (Redis, Memcached) для нескольких узлов.
+
+    На запрос приходится одна атомарная операция incr. Счётчик прошлого
+    окна уже не меняется, поэтому читается один раз за окно и хранится
+    в памяти процесса.
+    """
+
+    def __init__(self, alias, max_keys=THROTTLE_LOCAL_MAX_KEYS):
+        self.cache = caches[alias]
+        self.max_keys = max_keys
+        self._previous = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, window, timeout):
+        current_key = f'{key}:{window}'
+        try:
+            current = self.cache.incr(current_key)
+        except ValueError:
+            if self.cache.add(current_key, 1, timeout):
+                current = 1
+            else:
+                current = self.cache.incr(current_key)
+        previous_key = f'{key}:{window - 1}'
+        with self._lock:
+            previous = self._previous.get(previous_key)
+        if previous is None:
+            previous = self.cache.get(previous_key, 0)
+            with self._lock:
+                self._previous[previous_key] = previous
+                if len(self._previous) > self.max_keys:
+                    self._previous.popitem(last=False)
+        return previous, current
+
+    def __len__(self):
+        return len(self._previous)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_rate_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                alias = settings.THROTTLE_SHARED_CACHE
+                _backend = (CacheRateBackend(alias) if alias
+                            else LocalRateBackend())
+    return _backend
+
+
+metrics.Gauge('throttle_keys', 'Счётчики ограничения частоты в памяти.',
+              lambda: len(_backend) if _backend is not None else 0)
+
+
+def reset_rate_backend():
+    """Сбрасывает выбранный бэкенд, например после смены настроек."""
+    global _backend
+    _backend = None
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """
+    Ограничивает действия вьюсетов по областям `<basename>.<action>`.
+
+    Несколько действий делят одну область, если вьюсет сопоставляет
+    их с ней в `throttle_scopes` (действие → имя области). Лимиты
+    задаются в REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'];
+    действия без лимита не ограничиваются. Число запросов оценивается
+    как счётчик текущего окна плюс доля счётчика прошлого окна,
+    пропорциональная ещё не истёкшей его части.
+    """
+
+    def __init__(self):
+        # Область известна только в allow_request.
+        self.wait_seconds = None
+
+    def get_scope(self, view):
+        basename = getattr(view, 'basename', None)
+        action = getattr(view, 'action', None)
+        if basename and action:
+            action = getattr(view, 'throttle_scopes', {}).get(action, action)
+            return f'{basename}.{action}'
+        return None
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return f'throttle:{self.scope}:{ident}'
+
+    def allow_request(self, request, view):
+        self.scope = self.get_scope(view)
+        self.rate = self.THROTTLE_RATES.get(self.scope)
+        if self.rate is None:
+            return True
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        window, offset = divmod(self.timer(), self.duration)
+        previous, current = get_rate_backend().hit(
+            self.get_cache_key(request, view), int(window),
+            2 * self.duration)
+        remaining = 1 - offset / self.duration
+        estimate = previous * remaining + current
+        if estimate <= self.num_requests:
+            return True
+        if previous and current <= self.num_requests:
+            # Ждать, пока вклад прошлого окна не уменьшится до лимита.
+            self.wait_seconds = ((estimate - self.num_requests)
+                                 / previous * self.duration)
+        else:
+            self.wait_seconds = self.duration - offset
+        return False
+
+    def wait(self):
+        return self.wait_seconds
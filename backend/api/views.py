@@ -8,24 +8,38 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.exceptions import ValidationError
 from djoser.views import UserViewSet as DjoserUserViewSet
+from core.feed import get_feed_entries
+from core.recipe_ids import recipe_exists
+from core.page_cache import (INGREDIENTS_TAG, RECIPES_TAG, TRENDING_TAG,
+                             recipe_tag, set_cache_tags, user_tag)
+from core.view_counts import record_view
+from core.deletion import soft_delete_recipe, soft_delete_user
 from core.models import (Ingredient, Recipe, RecipeIngredient,
                          Favorite, ShopCart, Subscription)
 from .serializers import (IngredientSerializer, RecipeSerializer,
+                          RecipeShortSerializer,
                           UserSerializer, AvatarSerializer,
                           SiteUserSerializer, ShopCartSerializer,
                           FavoriteSerializer, SubscriptionSerializer
                           )
+from .read_serializers import (RecipeReadSerializer, SiteUserReadSerializer,
+                               UserReadSerializer)
 from .permissions import IsAuthorOrReadOnly
+from .followed_authors import invalidate_followed_author_ids
+from .authentication import fresh_user
 
 from .get_shopping_cart_text import get_shopping_cart_text
-from .pagination import RecipePagination
+from .pagination import RecipePagination, UserPagination
 from django.http import Http404
 from rest_framework.exceptions import NotFound
-from api.filters import IngredientFilter
+from api.filters import IngredientFilter, UserFilter
 from django_filters.rest_framework import DjangoFilterBackend
 
 User = get_user_model()
 
+# Id почти одинаковых рецептов, найденных при создании рецепта.
+NEAR_DUPLICATES_HEADER = 'X-Near-Duplicates'
+
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
@@ -36,6 +50,14 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     search_fields = ("^name",)
 
+    def list(self, request, *args, **kwargs):
+        return set_cache_tags(
+            super().list(request, *args, **kwargs), INGREDIENTS_TAG)
+
+    def retrieve(self, request, *args, **kwargs):
+        return set_cache_tags(
+            super().retrieve(request, *args, **kwargs), INGREDIENTS_TAG)
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
@@ -43,12 +65,59 @@ class RecipeViewSet(viewsets.ModelViewSet):
     permission_classes = [
         permissions.IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
     pagination_class = RecipePagination
+    read_actions = ('list', 'retrieve', 'feed')
+    # Создание и оба вида изменения расходуют один лимит recipe.write.
+    throttle_scopes = {
+        'create': 'write', 'update': 'write', 'partial_update': 'write'}
+
+    def get_serializer_class(self):
+        if self.action in self.read_actions:
+            return RecipeReadSerializer
+        return super().get_serializer_class()
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context['request'] = self.request
         return context
 
+    def get_read_selection(self):
+        """Поля из ?fields= и ?expand= для действий чтения."""
+        if self.action not in self.read_actions:
+            return {}
+        if not hasattr(self, '_read_selection'):
+            self._read_selection = RecipeReadSerializer.parse_selection(
+                self.request.query_params)
+        return self._read_selection
+
+    def get_serializer(self, *args, **kwargs):
+        if self.get_serializer_class() is RecipeReadSerializer:
+            kwargs.update(self.get_read_selection())
+        return super().get_serializer(*args, **kwargs)
+
+    @staticmethod
+    def author_tags(recipes):
+        # Свёрнутый или невыбранный автор не зависит от профиля.
+        return [user_tag(recipe['author']['id']) for recipe in recipes
+                if isinstance(recipe.get('author'), dict)]
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        tags = [RECIPES_TAG, INGREDIENTS_TAG]
+        if request.query_params.get('ordering') == 'trending':
+            tags.append(TRENDING_TAG)
+        tags.extend(self.author_tags(response.data['results']))
+        return set_cache_tags(response, *tags)
+
+    def retrieve(self, request, *args, **kwargs):
+        # Тег и просмотр — по id найденного рецепта: в адресе может быть
+        # «05», а сигналы сбрасывают тег recipe:5.
+        instance = self.get_object()
+        response = Response(self.get_serializer(instance).data)
+        record_view(instance.pk, response)
+        return set_cache_tags(
+            response, recipe_tag(instance.pk), INGREDIENTS_TAG,
+            *self.author_tags([response.data]))
+
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
         serializer = self.get_serializer(
@@ -86,10 +155,31 @@ class RecipeViewSet(viewsets.ModelViewSet):
             if user.is_authenticated:
                 queryset = queryset.filter(favorites__user=user)
 
-        return queryset.order_by('-pub_date').distinct()
+        ordering = ('-pub_date',)
+        if self.request.query_params.get('ordering') == 'trending':
+            ordering = ('-trending_score', '-pub_date')
+        queryset = queryset.order_by(*ordering).distinct()
+        selection = self.get_read_selection()
+        if self.action == 'list':
+            return queryset.values(
+                *RecipeReadSerializer.value_fields(**selection))
+        if RecipeReadSerializer.embeds('author', **selection):
+            return queryset.select_related('author')
+        return queryset
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        if self.near_duplicates:
+            response[NEAR_DUPLICATES_HEADER] = ','.join(
+                str(recipe_id) for recipe_id, _ in self.near_duplicates)
+        return response
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
+        self.near_duplicates = serializer.near_duplicates
+
+    def perform_destroy(self, instance):
+        soft_delete_recipe(instance)
 
     @staticmethod
     def handle_favorite_or_cart(request, model, serializer_class, pk):
@@ -142,7 +232,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         user = request.user
         ingredients = (
             RecipeIngredient.objects
-            .filter(recipe__shopcarts__user=user)
+            .filter(recipe__shopcarts__user=user, recipe__is_deleted=False)
             .values('ingredient__name', 'ingredient__measurement_unit')
             .annotate(total_amount=Sum('amount'))
             .order_by('ingredient__name')
@@ -154,11 +244,46 @@ class RecipeViewSet(viewsets.ModelViewSet):
                             filename='shopping_cart.txt',
                             content_type='text/plain')
 
+    @action(detail=False, methods=['get'],
+            permission_classes=[permissions.IsAuthenticated])
+    def feed(self, request):
+        entries = self.paginate_queryset(get_feed_entries(request.user))
+        recipes = {recipe['pk']: recipe for recipe in Recipe.objects.filter(
+            pk__in=[recipe_id for recipe_id, _ in entries]).values(
+            'pk', *RecipeReadSerializer.value_fields(
+                **self.get_read_selection()))}
+        page = [recipes[recipe_id] for recipe_id, _ in entries
+                if recipe_id in recipes]
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @staticmethod
+    def parse_pk(pk):
+        # Нечисловой id из адреса — такой же несуществующий рецепт.
+        if not (pk.isascii() and pk.isdigit()):
+            raise NotFound(detail="Страница не найдена.")
+        return int(pk)
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        pk = self.parse_pk(pk)
+        if not recipe_exists(pk):
+            raise NotFound(detail="Страница не найдена.")
+        recipes = Recipe.objects.filter(
+            similar_for__recipe_id=pk).order_by('similar_for__rank')
+        serializer = RecipeShortSerializer(
+            recipes, many=True, context={'request': request})
+        return Response(serializer.data)
+
     @action(detail=True, methods=['get'], url_path='get-link')
     def short_link(self, request, pk=None):
-        recipe = self.get_object()
+        pk = self.parse_pk(pk)
+        codes = list(Recipe.objects.filter(pk=pk).values_list(
+            'short_code', flat=True))
+        if not codes:
+            raise NotFound(detail="Страница не найдена.")
         short_url = request.build_absolute_uri(
-            reverse('short_link', args=[recipe.pk]))
+            reverse('short_link', args=[codes[0] or pk]))
         return Response({'short-link': short_url}, status=status.HTTP_200_OK)
 
 
@@ -166,7 +291,32 @@ class UserViewSet(DjoserUserViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = UserPagination
+    filterset_class = UserFilter
+    filter_backends = (DjangoFilterBackend,)
     lookup_field = "id"
+    read_actions = ('list', 'retrieve', 'me')
+    # Действия, которые сохраняют request.user.
+    user_write_actions = ('avatar', 'set_password', 'set_username')
+
+    def get_queryset(self):
+        # Список пользователей публичный (см. docs/openapi-schema.yml),
+        # поэтому HIDE_USERS из Djoser к нему не применяется.
+        if self.action == 'list':
+            return self.queryset.values(*UserReadSerializer.value_fields())
+        return super().get_queryset()
+
+    def get_serializer_class(self):
+        if self.action in self.read_actions:
+            return UserReadSerializer
+        return super().get_serializer_class()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Снимок из кэша токенов годится для чтения, а сохранять можно
+        # только пользователя, прочитанного из базы.
+        if self.action in self.user_write_actions:
+            request.user = fresh_user(request.user)
 
     @action(detail=False, methods=['put', 'delete'],
             permission_classes=[permissions.IsAuthenticated],
@@ -176,9 +326,10 @@ class UserViewSet(DjoserUserViewSet):
 
         if request.method == 'DELETE':
             if user.avatar:
-                user.avatar.delete()
+                # Файл может быть общим с другими записями; его удалит
+                # сигнал, когда ссылок не останется.
                 user.avatar = None
-                user.save()
+                user.save(update_fields=['avatar'])
                 return Response(status=status.HTTP_204_NO_CONTENT)
             raise ValidationError({'error': 'Аватар отсутствует'})
 
@@ -198,6 +349,9 @@ class UserViewSet(DjoserUserViewSet):
             return self.request.user
         return super().get_object()
 
+    def perform_destroy(self, instance):
+        soft_delete_user(instance)
+
     def retrieve(self, request, *args, **kwargs):
         try:
             return super().retrieve(request, *args, **kwargs)
@@ -210,14 +364,18 @@ class UserViewSet(DjoserUserViewSet):
         return Response(self.get_serializer(request.user).data)
 
     @action(detail=False, methods=['get'],
-            permission_classes=[permissions.IsAuthenticated])
+            permission_classes=[permissions.IsAuthenticated],
+            pagination_class=RecipePagination)
     def subscriptions(self, request):
-        subscriptions = Subscription.objects.filter(
-            user=request.user).select_related('author')
-        authors = [sub.author for sub in subscriptions]
+        # Обычная пагинация: число подписок меняется сразу после
+        # подписки, кэшировать COUNT(*) здесь нельзя.
+        authors = User.objects.filter(
+            authors__user=request.user,
+        ).order_by('authors__id').values(
+            *SiteUserReadSerializer.value_fields())
         page = self.paginate_queryset(authors)
-        serializer = SiteUserSerializer(page, many=True,
-                                        context={'request': request})
+        serializer = SiteUserReadSerializer(page, many=True,
+                                            context={'request': request})
         return self.get_paginated_response(serializer.data)
 
     @action(detail=True,
@@ -248,6 +406,7 @@ class UserViewSet(DjoserUserViewSet):
 
             serializer.is_valid(raise_exception=True)
             serializer.save()
+            invalidate_followed_author_ids(request)
 
             author_serializer = SiteUserSerializer(
                 author,
@@ -262,6 +421,7 @@ class UserViewSet(DjoserUserViewSet):
         try:
             subscription = Subscription.objects.get(user=user, author=author)
             subscription.delete()
+            invalidate_followed_author_ids(request)
             return Response(
                 {'status': 'Вы успешно отписались'},
                 status=status.HTTP_204_NO_CONTENT
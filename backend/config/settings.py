@@ -26,6 +26,7 @@ CORS_ALLOW_METHODS = [
 ]
 
 CORS_ALLOWED_ORIGINS = CSRF_TRUSTED_ORIGINS
+CORS_EXPOSE_HEADERS = ['X-Near-Duplicates']
 
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -45,17 +46,31 @@ INSTALLED_APPS = [
     'core',
 ]
 
+# Процессы, обслуживающие только API, запускаются с
+# DJANGO_ADMIN_ENABLED=False: админка и django-import-export с его
+# openpyxl, xlwt и PyYAML тогда не загружаются.
+ADMIN_ENABLED = os.getenv('DJANGO_ADMIN_ENABLED', 'True').lower() == 'true'
+if not ADMIN_ENABLED:
+    INSTALLED_APPS = [app for app in INSTALLED_APPS
+                      if app not in ('django.contrib.admin', 'import_export')]
+
 MIDDLEWARE = [
+    'core.middleware.RequestLogMiddleware',
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
-    'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # До CommonMiddleware: её перенаправления (APPEND_SLASH) тоже должны
+    # получать заголовки CORS.
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'core.middleware.PageCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -89,6 +104,26 @@ DATABASES = {
     }
 }
 
+# Реплики для чтения через запятую: хосты (host или host:port) для
+# PostgreSQL или пути к файлам для SQLite. Алиасы — replica1, replica2...
+# Кэш по умолчанию тогда должен быть общим для процессов: в нём
+# хранится закрепление клиента за основной базой после записи.
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+        filter(None, os.getenv('DB_REPLICAS', '').split(',')), 1):
+    alias = f'replica{number}'
+    DATABASES[alias] = {**DATABASES['default'],
+                        'TEST': {'MIRROR': 'default'}}
+    if 'sqlite' in DATABASES[alias]['ENGINE']:
+        DATABASES[alias]['NAME'] = replica
+    else:
+        host, _, port = replica.partition(':')
+        DATABASES[alias]['HOST'] = host
+        DATABASES[alias]['PORT'] = port or DATABASES['default']['PORT']
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
 AUTHENTICATION_BACKENDS = [
     "django.contrib.auth.backends.ModelBackend",
 ]
@@ -126,25 +161,121 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly'],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'api.throttling.SlidingWindowThrottle',
+    ),
+    # Области — '<basename>.<action>' вьюсетов из api/urls.py или общие
+    # для нескольких действий (см. throttle_scopes у вьюсета).
+    'DEFAULT_THROTTLE_RATES': {
+        'recipe.write': os.getenv('THROTTLE_RECIPE_WRITE', '30/hour'),
+        'recipe.download_shopping_cart': os.getenv(
+            'THROTTLE_SHOPPING_CART_DOWNLOAD', '20/min'),
+        'recipe.favorite': os.getenv('THROTTLE_USER_ACTION', '120/min'),
+        'recipe.shopping_cart': os.getenv('THROTTLE_USER_ACTION', '120/min'),
+        'users.subscribe': os.getenv('THROTTLE_USER_ACTION', '120/min'),
+        'users.avatar': os.getenv('THROTTLE_AVATAR_UPLOAD', '20/hour'),
+    },
 }
 
-
-LOGGING = {
-    'version': 1,
-    'disable_existing_loggers': False,
-    'handlers': {
-        'console': {
-            'class': 'logging.StreamHandler',
-        },
-    },
-    'root': {
-        'handlers': ['console'],
-        'level': 'DEBUG',
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     },
 }
 
+# Алиас общего для всех процессов кэша токенов: default с Redis, как
+# в infra/.env.example. Кэш в памяти процесса (LocMemCache) здесь не
+# годится — процесс не запустится. Без алиаса токены кэшируются в
+# памяти процесса, только если TOKEN_AUTH_PROCESS_CACHE=True: так можно
+# лишь при одном воркере gunicorn, иначе другие воркеры не увидят выход
+# пользователя; иначе токен ищется в базе на каждый запрос.
+TOKEN_AUTH_SHARED_CACHE = os.getenv('TOKEN_AUTH_SHARED_CACHE')
+TOKEN_AUTH_PROCESS_CACHE = os.getenv(
+    'TOKEN_AUTH_PROCESS_CACHE', 'False').lower() == 'true'
+
+# Алиас общего кэша для счётчиков ограничения частоты. Без него лимиты
+# считаются отдельно в каждом процессе gunicorn.
+THROTTLE_SHARED_CACHE = os.getenv('THROTTLE_SHARED_CACHE')
+
+# Алиас кэша ответов анонимным пользователям. Отметки изменений тегов
+# хранятся там же, поэтому при нескольких процессах кэш должен быть
+# общим; без алиаса ответы не кэшируются.
+PAGE_CACHE = os.getenv('PAGE_CACHE')
+
+
+# development — синхронный вывод в консоль, production — JSON-записи,
+# которые форматируются и пишутся в фоновом потоке.
+LOG_PROFILE = os.getenv('LOG_PROFILE', 'development' if DEBUG else 'production')
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG' if DEBUG else 'INFO')
+# Доля SQL-запросов уровня DEBUG, попадающих в лог в production.
+LOG_SQL_SAMPLE_RATE = float(os.getenv('LOG_SQL_SAMPLE_RATE', '0.01'))
+
+if LOG_PROFILE == 'production':
+    LOGGING = {
+        'version': 1,
+        'disable_existing_loggers': False,
+        'formatters': {
+            'json': {
+                '()': 'core.log.JsonFormatter',
+            },
+        },
+        'filters': {
+            'request_id': {
+                '()': 'core.log.RequestIdFilter',
+            },
+            'sql_sampling': {
+                '()': 'core.log.SamplingFilter',
+                'rate': LOG_SQL_SAMPLE_RATE,
+            },
+        },
+        'handlers': {
+            'async_console': {
+                '()': 'core.log.AsyncStreamHandler',
+                'formatter': 'json',
+                'filters': ['request_id'],
+            },
+        },
+        'loggers': {
+            'django.db.backends': {
+                'level': LOG_LEVEL,
+                'filters': ['sql_sampling'],
+            },
+        },
+        'root': {
+            'handlers': ['async_console'],
+            'level': LOG_LEVEL,
+        },
+    }
+else:
+    LOGGING = {
+        'version': 1,
+        'disable_existing_loggers': False,
+        'handlers': {
+            'console': {
+                'class': 'logging.StreamHandler',
+            },
+        },
+        'root': {
+            'handlers': ['console'],
+            'level': LOG_LEVEL,
+        },
+    }
+
+# Кто может читать /metrics кроме сотрудников: адреса (например,
+# Prometheus во внутренней сети; nginx этот путь не проксирует) и
+# запросы с заголовком `Authorization: Bearer <METRICS_TOKEN>`.
+METRICS_ALLOWED_IPS = os.getenv(
+    'METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# Очередь фоновых задач (см. core/tasks.py).
+TASK_QUEUE_BACKEND = os.getenv('TASK_QUEUE_BACKEND',
+                               'core.tasks.ThreadTaskQueue')
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'PERMISSIONS': {
@@ -163,4 +294,14 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+STORAGES = {
+    # Загруженные файлы хранятся под именами по хэшу содержимого.
+    'default': {
+        'BACKEND': 'core.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
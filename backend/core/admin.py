@@ -1,24 +1,53 @@
 from django.contrib import admin
 from django.contrib.auth import get_user_model
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.urls import reverse
+from django.utils.html import format_html_join
 from import_export.admin import ImportExportModelAdmin
 from import_export.resources import ModelResource
 
+from .admin_utils import AutocompleteFilter, LargeTableAdmin
+from .deletion import soft_delete_recipe, soft_delete_user
+from .minhash import has_duplicate_candidates, near_duplicates
 from .models import (Favorite, Ingredient, Recipe, RecipeIngredient, ShopCart,
                      Subscription)
 
 User = get_user_model()
 
 
+class MarkedForDeletionMixin:
+    """
+    Показывает и записи, помеченные на удаление.
+
+    Менеджер по умолчанию их скрывает (см. core/deletion.py), а в
+    админке они нужны, пока фоновая задача удаляет их данные.
+    """
+
+    def get_queryset(self, request):
+        queryset = self.model.all_objects.get_queryset()
+        ordering = self.get_ordering(request)
+        return queryset.order_by(*ordering) if ordering else queryset
+
+
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
-    list_display = ('username', 'email', 'full_name')
+class UserAdmin(MarkedForDeletionMixin, LargeTableAdmin):
+    list_display = ('username', 'email', 'full_name', 'is_deleted')
     search_fields = ('username', 'email')
-    list_filter = ('is_staff', 'is_active')
+    list_filter = ('is_staff', 'is_active', 'is_deleted')
 
     @admin.display(description="ФИО")
     def full_name(self, obj):
         return obj.get_full_name()
 
+    # Данные удаляются в фоне (см. core/deletion.py).
+    def delete_model(self, request, obj):
+        soft_delete_user(obj)
+
+    def delete_queryset(self, request, queryset):
+        for user in queryset:
+            soft_delete_user(user)
+
 
 class IngredientResource(ModelResource):
     class Meta:
@@ -43,46 +72,105 @@ class RecipeIngredientInline(admin.TabularInline):
     extra = 1
     autocomplete_fields = ['ingredient']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'recipe', 'ingredient')
+
+
+class NearDuplicateFilter(admin.SimpleListFilter):
+    """Рецепты, у которых совпала полоса MinHash-подписи с другим."""
+    title = 'возможные дубликаты'
+    parameter_name = 'near_duplicates'
+
+    def lookups(self, request, model_admin):
+        return (('yes', 'Есть'),)
+
+    def queryset(self, request, queryset):
+        if self.value() == 'yes':
+            return queryset.filter(has_duplicate_candidates())
+        return queryset
+
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'author')
+class RecipeAdmin(MarkedForDeletionMixin, LargeTableAdmin):
+    list_display = ('name', 'author', 'favorites_count', 'views_count',
+                    'is_deleted')
+    list_select_related = ('author',)
     search_fields = ('name', 'author__username')
-    list_filter = ('author',)
+    list_filter = (('author', AutocompleteFilter), NearDuplicateFilter,
+                   'is_deleted')
+    autocomplete_fields = ('author',)
     inlines = [RecipeIngredientInline]
-    readonly_fields = ('favorites_count',)
+    readonly_fields = ('favorites_count', 'views_count', 'near_duplicates')
 
     fieldsets = (
         (None, {
             'fields': ('name', 'author', 'image', 'text', 'cooking_time')
         }),
         ('Дополнительная информация', {
-            'fields': ('favorites_count',),
+            'fields': ('favorites_count', 'views_count'),
             'classes': ('collapse',)
         }),
+        ('Возможные дубликаты', {
+            'fields': ('near_duplicates',),
+        }),
     )
 
+    def get_queryset(self, request):
+        # Подзапрос считается только для строк текущей страницы,
+        # в отличие от Count() с GROUP BY по всей таблице.
+        favorites = Favorite.objects.filter(
+            recipe=OuterRef('pk')).order_by().values('recipe').annotate(
+            total=Count('pk')).values('total')
+        return super().get_queryset(request).annotate(
+            favorites_total=Coalesce(Subquery(favorites), 0))
+
     @admin.display(description='В избранном')
     def favorites_count(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_total
+
+    @admin.display(description='Похожие рецепты')
+    def near_duplicates(self, obj):
+        duplicates = near_duplicates(obj.pk) if obj.pk else []
+        return format_html_join(
+            ', ', '<a href="{}">{}</a> ({})',
+            ((reverse('admin:core_recipe_change', args=[recipe_id]),
+              recipe_id, f'{similarity:.0%}')
+             for recipe_id, similarity in duplicates)) or '—'
+
+    def delete_model(self, request, obj):
+        soft_delete_recipe(obj)
+
+    def delete_queryset(self, request, queryset):
+        for recipe in queryset:
+            soft_delete_recipe(recipe)
 
 
 @admin.register(RecipeIngredient)
-class RecipeIngredientAdmin(admin.ModelAdmin):
+class RecipeIngredientAdmin(LargeTableAdmin):
     list_display = ('recipe', 'ingredient', 'amount')
-    list_filter = ('recipe', 'ingredient')
+    list_select_related = ('recipe', 'ingredient')
+    list_filter = (('recipe', AutocompleteFilter),
+                   ('ingredient', AutocompleteFilter))
+    autocomplete_fields = ('recipe', 'ingredient')
     search_fields = ('recipe__name', 'ingredient__name')
 
 
 @admin.register(Favorite, ShopCart)
-class UserRecipeRelationAdmin(admin.ModelAdmin):
+class UserRecipeRelationAdmin(LargeTableAdmin):
     list_display = ('user', 'recipe')
-    list_filter = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    list_filter = (('user', AutocompleteFilter),
+                   ('recipe', AutocompleteFilter))
+    autocomplete_fields = ('user', 'recipe')
     search_fields = ('user__username', 'recipe__name')
 
 
 @admin.register(Subscription)
-class SubscriptionAdmin(admin.ModelAdmin):
+class SubscriptionAdmin(LargeTableAdmin):
     list_display = ('user', 'author')
-    list_filter = ('user', 'author')
+    list_select_related = ('user', 'author')
+    list_filter = (('user', AutocompleteFilter),
+                   ('author', AutocompleteFilter))
+    autocomplete_fields = ('user', 'author')
     search_fields = ('user__username', 'author__username')
@@ -0,0 +1,90 @@
+"""Инструменты админки для больших таблиц."""
+import json
+
+from django import forms
+from django.contrib import admin
+from django.contrib.admin.utils import get_last_value_from_parameters
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from .constants import ADMIN_EXACT_COUNT_LIMIT
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """
+    Фильтр по внешнему ключу с полем автодополнения вместо списка.
+
+    Загружает только выбранный объект; варианты подгружает стандартное
+    представление autocomplete админки, поэтому у админки связанной
+    модели должны быть заданы search_fields.
+    """
+    template = 'admin/core/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin,
+                 field_path):
+        self.lookup_kwarg = f'{field_path}__{field.target_field.name}__exact'
+        self.lookup_val = get_last_value_from_parameters(
+            params, self.lookup_kwarg)
+        super().__init__(field, request, params, model, model_admin,
+                         field_path)
+        self.form_field = forms.ModelChoiceField(
+            queryset=field.remote_field.model._default_manager.all(),
+            widget=AutocompleteSelect(field, model_admin.admin_site),
+            required=False,
+        )
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def get_facet_counts(self, pk_attname, filtered_qs):
+        return {}
+
+    def choices(self, changelist):
+        yield {
+            'query_string': changelist.get_query_string(
+                remove=[self.lookup_kwarg]),
+            'lookup_kwarg': self.lookup_kwarg,
+            'widget': self.form_field.widget.render(
+                self.lookup_kwarg, self.lookup_val,
+                attrs={'id': f'id_filter_{self.lookup_kwarg}'}),
+        }
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор, который на PostgreSQL не считает COUNT(*) больших выборок.
+
+    Если по оценке планировщика строк больше ADMIN_EXACT_COUNT_LIMIT,
+    число страниц считается по этой оценке; на других СУБД и для
+    небольших выборок используется точный COUNT(*).
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql':
+            plan = json.loads(queryset.explain(format='json'))
+            # Django сериализует уже разобранный драйвером план, то есть
+            # объект; список в ответе бывает, если драйвер отдал строку.
+            if isinstance(plan, list):
+                plan = plan[0]
+            estimate = int(plan['Plan']['Plan Rows'])
+            if estimate > ADMIN_EXACT_COUNT_LIMIT:
+                return estimate
+        return queryset.count()
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Админка без полных подсчётов строк, с фильтрами-автодополнением."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+
+    @property
+    def media(self):
+        return (super().media
+                + AutocompleteSelect(None, self.admin_site).media
+                + forms.Media(js=['core/admin/autocomplete_filter.js']))
@@ -1,7 +1,18 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
     verbose_name = "Хранилище сайта"
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .checks import require_shared_cache
+
+        if settings.DATABASE_REPLICAS:
+            # Закрепление клиента за основной базой хранится в кэше по
+            # умолчанию и должно быть видно всем воркерам.
+            require_shared_cache(DEFAULT_CACHE_ALIAS, 'DB_REPLICAS')
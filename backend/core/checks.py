@@ -0,0 +1,25 @@
+"""Проверки настроек, которые выполняются при запуске процесса."""
+from django.conf import settings
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+# LocMemCache живёт в памяти одного процесса, DummyCache ничего не хранит.
+PROCESS_LOCAL_CACHES = (LocMemCache, DummyCache)
+
+
+def require_shared_cache(alias, setting):
+    """
+    Требует, чтобы кэш alias был общим для всех процессов gunicorn.
+
+    Иначе запись, сделанная одним воркером (сброс токена, закрепление
+    клиента за основной базой), не видна остальным.
+    """
+    if alias not in settings.CACHES:
+        raise ImproperlyConfigured(f'{setting}: нет кэша {alias!r} в CACHES.')
+    backend = settings.CACHES[alias]['BACKEND']
+    if issubclass(import_string(backend), PROCESS_LOCAL_CACHES):
+        raise ImproperlyConfigured(
+            f'{setting}: кэш {alias!r} ({backend}) не общий для процессов; '
+            'нужен Redis или Memcached (CACHE_BACKEND, CACHE_LOCATION).')
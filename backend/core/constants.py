@@ -16,5 +16,113 @@ RECIPE_INGREDIENT_AMOUNT_MAX_VALUE = 10000
 AVATAR_UPLOAD_PATH = 'avatar/icons/'
 RECIPE_IMAGE_UPLOAD_PATH = 'recipes/images/'
 
+RECIPE_FRONTEND_URL = '/recipes/{pk}'
+
+RECIPE_SHORT_CODE_ALPHABET = (
+    '0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ')
+RECIPE_SHORT_CODE_LENGTH = 7
+RECIPE_SHORT_CODE_CACHE_SIZE = 100_000
+# Через сколько секунд битовая карта id рецептов перестраивается, чтобы
+# увидеть удаления из других процессов и management-команд.
+RECIPE_ID_SET_TTL = 60
+
+USERS_COUNT_CACHE_TIMEOUT = 60
+
+# Авторам с большим числом подписчиков ленту строим при чтении.
+FEED_FANOUT_MAX_FOLLOWERS = 10_000
+FEED_FANOUT_BATCH_SIZE = 1000
+# Сколько последних рецептов автора попадает в ленту при подписке.
+FEED_BACKFILL_DEPTH = 50
+
+TOKEN_AUTH_CACHE_MAX_SIZE = 10_000
+# Секунды; столько живут записи кэша токенов и поколения их ключей.
+TOKEN_AUTH_CACHE_TTL = 60
+
+# Сколько секунд после записи клиент читает только из основной базы.
+REPLICA_PIN_SECONDS = 5
+# Реплика с большим отставанием (в секундах) не используется.
+REPLICA_MAX_LAG_SECONDS = 2
+REPLICA_LAG_CHECK_INTERVAL = 5
+
+# Ответы короче (в байтах) не сжимаются: выигрыш меньше накладных
+# расходов.
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+# Сколько секунд сжатое тело анонимного ответа хранится в кэше.
+COMPRESSION_CACHE_SECONDS = 300
+
+# Сколько секунд ответ анонимному пользователю считается свежим и
+# сколько ещё его можно отдавать, пока новый собирается.
+PAGE_CACHE_SECONDS = 60
+PAGE_CACHE_STALE_SECONDS = 300
+# Дольше этого пересборка ответа не блокирует другие запросы.
+PAGE_CACHE_LOCK_SECONDS = 10
+# Сколько запрос без сохранённого ответа ждёт, пока его соберёт другой.
+PAGE_CACHE_WAIT_SECONDS = 2
+PAGE_CACHE_POLL_SECONDS = 0.05
+
+# Больше этого числа строк по оценке PostgreSQL админка не считает точно.
+ADMIN_EXACT_COUNT_LIMIT = 50_000
+
+# Файл моложе этого (в секундах) не удаляется: ссылка на него
+# может быть ещё не сохранена.
+MEDIA_DELETE_GRACE_SECONDS = 3600
+
+# Вклад добавления в избранное и в корзину в популярность рецепта.
+TRENDING_FAVORITE_WEIGHT = 1.0
+TRENDING_SHOPPING_CART_WEIGHT = 1.5
+TRENDING_VIEW_WEIGHT = 0.05
+# За сколько часов популярность уменьшается вдвое.
+TRENDING_HALF_LIFE_HOURS = 72
+# Меньшие значения после затухания обнуляются.
+TRENDING_MIN_SCORE = 0.01
+TRENDING_DECAY_BATCH_SIZE = 10_000
+
+# Просмотры рецептов копятся в памяти процесса и записываются в базу
+# не чаще раза в столько секунд, пачками по столько рецептов.
+VIEW_COUNT_FLUSH_SECONDS = 10
+VIEW_COUNT_FLUSH_BATCH_SIZE = 500
+
+# Сколько строк удаляется одним запросом при фоновом удалении
+# пользователей и рецептов.
+DELETION_BATCH_SIZE = 1000
+
+# Сколько счётчиков ограничителя частоты хранится в памяти процесса.
+THROTTLE_LOCAL_MAX_KEYS = 100_000
+
+SIMILAR_RECIPES_TOP_K = 10
+SIMILAR_RECIPES_CHUNK_SIZE = 256
+# Признаки, встречающиеся чаще, чем у стольких рецептов, не учитываются.
+SIMILAR_RECIPES_MAX_POSTING = 5000
+# Доля сходства по ингредиентам; остальное — по избранному.
+SIMILAR_RECIPES_INGREDIENT_WEIGHT = 0.7
+
+# MinHash-подписи для поиска дубликатов рецептов. После изменения
+# этих значений подписи нужно пересчитать командой build_minhash.
+MINHASH_NUM_PERM = 64
+# Полосы LSH: рецепты с одинаковой полосой становятся кандидатами.
+# При 8 полосах по 8 значений порог — примерно 0.77 по Жаккару.
+MINHASH_BANDS = 8
+MINHASH_SHINGLE_SIZE = 3
+MINHASH_SEED = 48
+MINHASH_BATCH_SIZE = 2000
+# Оценка сходства по Жаккару, начиная с которой рецепт — дубликат.
+NEAR_DUPLICATE_THRESHOLD = 0.8
+NEAR_DUPLICATE_LIMIT = 10
+
+# Поиск ингредиентов (core/ingredient_search.py): сколько результатов
+# возвращать, с какой длины запроса искать с опечатками и с каким
+# минимальным сходством по триграммам (как pg_trgm.similarity_threshold).
+INGREDIENT_SEARCH_LIMIT = 100
+INGREDIENT_SEARCH_FUZZY_MIN_LENGTH = 3
+INGREDIENT_SEARCH_MIN_SIMILARITY = 0.3
+# Через сколько секунд индекс в памяти перестраивается, чтобы увидеть
+# изменения каталога из других процессов.
+INGREDIENT_SEARCH_INDEX_TTL = 300
+
+# Границы корзин гистограммы времени ответа для /metrics, в секундах.
+METRICS_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
 
 MAX_RECIPES_LIMIT = 10**10
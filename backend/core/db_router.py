@@ -0,0 +1,104 @@
+"""Чтение с реплик с гарантией чтения собственных записей."""
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+from .constants import REPLICA_LAG_CHECK_INTERVAL, REPLICA_MAX_LAG_SECONDS
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = 'default'
+# Токены и сессии читаются только с основной базы: клиент использует
+# их сразу после создания.
+PRIMARY_ONLY_APPS = frozenset({'authtoken', 'sessions'})
+PIN_CACHE_KEY = 'db-pin:{client}'
+
+
+# Можно ли текущему запросу читать с реплик.
+replica_reads_var = ContextVar('replica_reads', default=False)
+
+
+class ReplicaHealth:
+    """Периодически проверяет отставание реплик и помнит здоровые."""
+
+    def __init__(self, interval=REPLICA_LAG_CHECK_INTERVAL,
+                 max_lag=REPLICA_MAX_LAG_SECONDS):
+        self.interval = interval
+        self.max_lag = max_lag
+        self._checked_at = {}
+        self._healthy = {}
+        self._lock = threading.Lock()
+
+    def is_healthy(self, alias):
+        now = time.monotonic()
+        with self._lock:
+            checked_at = self._checked_at.get(alias)
+            if checked_at is not None and now - checked_at < self.interval:
+                # Пока первая проверка не закончилась, реплика не
+                # используется.
+                return self._healthy.get(alias, False)
+            self._checked_at[alias] = now
+        lag = self.measure_lag(alias)
+        healthy = lag is not None and lag <= self.max_lag
+        if not healthy:
+            logger.warning('Реплика %s недоступна или отстаёт: %s с',
+                           alias, lag)
+        with self._lock:
+            self._healthy[alias] = healthy
+        return healthy
+
+    @staticmethod
+    def measure_lag(alias):
+        """Отставание реплики в секундах или None, если она недоступна."""
+        connection = connections[alias]
+        try:
+            if connection.vendor != 'postgresql':
+                connection.ensure_connection()
+                return 0.0
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT CASE WHEN pg_last_wal_receive_lsn() '
+                    '= pg_last_wal_replay_lsn() THEN 0 ELSE '
+                    'COALESCE(EXTRACT(EPOCH FROM now() '
+                    '- pg_last_xact_replay_timestamp()), 0) END')
+                return float(cursor.fetchone()[0])
+        except DatabaseError:
+            return None
+
+
+replica_health = ReplicaHealth()
+
+
+class ReplicaRouter:
+    """
+    Направляет чтения безопасных запросов на реплики из DB_REPLICAS.
+
+    Пишет всегда в основную базу. Внутри транзакции и в течение
+    REPLICA_PIN_SECONDS после записи того же клиента (см.
+    core.middleware.ReplicaRoutingMiddleware) чтения тоже идут в основную
+    базу. Вне запросов (команды, фоновые задачи) реплики не используются.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (not replica_reads_var.get()
+                or model._meta.app_label in PRIMARY_ONLY_APPS
+                or connections[PRIMARY].in_atomic_block):
+            return PRIMARY
+        replicas = [alias for alias in settings.DATABASE_REPLICAS
+                    if replica_health.is_healthy(alias)]
+        return random.choice(replicas) if replicas else PRIMARY
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная база.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
@@ -0,0 +1,134 @@
+"""
+Удаление пользователей и рецептов в два шага.
+
+Запрос только помечает запись удалённой: менеджеры `objects` её больше
+не видят. Зависимые строки удаляет фоновая задача пачками по
+DELETION_BATCH_SIZE, чтобы не держать блокировки и не загружать в
+память всё, что каскадно удалил бы Collector. Прерванное удаление
+доводит до конца команда purge_deleted.
+"""
+from django.db import models, transaction
+
+from .constants import DELETION_BATCH_SIZE
+from .models import Favorite, Recipe, ShopCart, SiteUser
+from .page_cache import RECIPES_TAG, invalidate_tags, recipe_tag
+from .recipe_ids import live_recipe_ids
+from .tasks import enqueue
+
+# Сигналы удаления этих связей пользователя уменьшают популярность
+# живых рецептов, поэтому они удаляются с сигналами.
+KEEP_SIGNALS = (Favorite, ShopCart)
+
+
+def soft_delete_recipe(recipe):
+    """Скрывает рецепт сразу и ставит удаление его данных в очередь."""
+    recipe.is_deleted = True
+    recipe.save(update_fields=['is_deleted'])
+    live_recipe_ids.discard(recipe.pk)
+    enqueue(purge_recipe, recipe.pk)
+
+
+def soft_delete_user(user):
+    """
+    Скрывает пользователя и его рецепты, удаление данных — в очереди.
+
+    Email и никнейм освобождаются сразу, чтобы по ним можно было снова
+    зарегистрироваться, а вход и токены перестают работать.
+    """
+    with transaction.atomic():
+        user.is_deleted = True
+        user.is_active = False
+        user.email = f'deleted-{user.pk}@deleted.invalid'
+        user.username = f'deleted-{user.pk}'
+        user.set_unusable_password()
+        user.save()
+        recipe_ids = list(Recipe.objects.filter(
+            author=user).values_list('pk', flat=True))
+        Recipe.all_objects.filter(pk__in=recipe_ids).update(is_deleted=True)
+        for pk in recipe_ids:
+            live_recipe_ids.discard(pk)
+        invalidate_tags(RECIPES_TAG, *map(recipe_tag, recipe_ids))
+        enqueue(purge_user, user.pk)
+
+
+def _report(progress, model, count):
+    if progress and count:
+        progress(model._meta.label_lower, count)
+
+
+def _cascades(model):
+    """Связи, по которым удаление `model` каскадно удаляет строки."""
+    return [relation for relation in model._meta.related_objects
+            if relation.on_delete is models.CASCADE]
+
+
+def delete_in_batches(queryset, batch_size=DELETION_BATCH_SIZE,
+                      progress=None, signals=True):
+    """
+    Удаляет строки queryset пачками по pk; возвращает их число.
+
+    С signals=False строки модели, на которую никто не ссылается,
+    удаляются одним DELETE без загрузки объектов и без сигналов.
+    """
+    model = queryset.model
+    raw = not signals and not _cascades(model)
+    total = 0
+    while True:
+        ids = list(queryset.order_by().values_list(
+            'pk', flat=True)[:batch_size])
+        if not ids:
+            return total
+        batch = model._base_manager.filter(pk__in=ids)
+        if raw:
+            count = batch._raw_delete(batch.db)
+        else:
+            count = batch.delete()[1].get(model._meta.label, 0)
+        total += count
+        _report(progress, model, count)
+
+
+def _delete_dependents(model, pks, batch_size, progress, exclude=()):
+    for relation in _cascades(model):
+        related_model = relation.related_model
+        if related_model in exclude:
+            continue
+        delete_in_batches(
+            related_model._base_manager.filter(
+                **{f'{relation.field.name}__in': pks}),
+            batch_size, progress,
+            # Связи удаляемых рецептов на живые данные не влияют.
+            signals=model is SiteUser and related_model in KEEP_SIGNALS)
+
+
+def purge_recipes(queryset, batch_size=DELETION_BATCH_SIZE, progress=None):
+    """Удаляет рецепты queryset и их зависимые строки пачками."""
+    total = 0
+    while True:
+        ids = list(queryset.order_by().values_list(
+            'pk', flat=True)[:batch_size])
+        if not ids:
+            return total
+        _delete_dependents(Recipe, ids, batch_size, progress)
+        # Через delete(): сигналы освобождают файлы изображений.
+        count = Recipe._base_manager.filter(pk__in=ids).delete()[1].get(
+            Recipe._meta.label, 0)
+        total += count
+        _report(progress, Recipe, count)
+
+
+def purge_recipe(recipe_id, batch_size=DELETION_BATCH_SIZE, progress=None):
+    return purge_recipes(
+        Recipe.all_objects.filter(pk=recipe_id, is_deleted=True),
+        batch_size, progress)
+
+
+def purge_user(user_id, batch_size=DELETION_BATCH_SIZE, progress=None):
+    """Удаляет помеченного пользователя: сначала рецепты, затем связи."""
+    if not SiteUser.all_objects.filter(pk=user_id, is_deleted=True).exists():
+        return
+    purge_recipes(Recipe.all_objects.filter(author_id=user_id),
+                  batch_size, progress)
+    _delete_dependents(SiteUser, [user_id], batch_size, progress,
+                       exclude=(Recipe,))
+    SiteUser.all_objects.filter(pk=user_id).delete()
+    _report(progress, SiteUser, 1)
@@ -0,0 +1,88 @@
+"""
+Лента рецептов от авторов, на которых подписан пользователь.
+
+Новые рецепты рассылаются в ленты подписчиков при публикации (fan-out
+on write), так что чтение ленты — один проход по индексу
+(user, -pub_date) таблицы FeedEntry. Авторы, у которых подписчиков
+больше FEED_FANOUT_MAX_FOLLOWERS, помечаются `is_popular`: их рецепты
+не рассылаются, а подмешиваются к ленте при чтении.
+"""
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+
+from .constants import (FEED_BACKFILL_DEPTH, FEED_FANOUT_BATCH_SIZE,
+                        FEED_FANOUT_MAX_FOLLOWERS)
+from .models import FeedEntry, Recipe, Subscription
+
+User = get_user_model()
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def fan_out_recipe(recipe_id):
+    """Добавляет рецепт в ленты подписчиков автора."""
+    recipe = Recipe.objects.filter(pk=recipe_id).values(
+        'pk', 'author_id', 'pub_date').first()
+    if recipe is None:
+        return
+    followers = Subscription.objects.filter(
+        author_id=recipe['author_id']).order_by()
+    is_popular = followers.count() > FEED_FANOUT_MAX_FOLLOWERS
+    User.objects.filter(
+        pk=recipe['author_id']
+    ).exclude(is_popular=is_popular).update(is_popular=is_popular)
+    if is_popular:
+        return
+    follower_ids = followers.values_list('user_id', flat=True).iterator(
+        chunk_size=FEED_FANOUT_BATCH_SIZE)
+    for batch in _batches(follower_ids, FEED_FANOUT_BATCH_SIZE):
+        FeedEntry.objects.bulk_create([
+            FeedEntry(user_id=user_id, recipe_id=recipe['pk'],
+                      author_id=recipe['author_id'],
+                      pub_date=recipe['pub_date'])
+            for user_id in batch
+        ], ignore_conflicts=True)
+
+
+def add_author_to_feed(user_id, author_id):
+    """Добавляет в ленту последние рецепты автора после подписки."""
+    if User.objects.filter(pk=author_id, is_popular=True).exists():
+        return
+    recipes = Recipe.objects.filter(author_id=author_id).order_by(
+        '-pub_date').values_list('pk', 'pub_date')[:FEED_BACKFILL_DEPTH]
+    FeedEntry.objects.bulk_create([
+        FeedEntry(user_id=user_id, recipe_id=recipe_id, author_id=author_id,
+                  pub_date=pub_date)
+        for recipe_id, pub_date in recipes
+    ], ignore_conflicts=True)
+
+
+def remove_author_from_feed(user_id, author_id):
+    """Убирает рецепты автора из ленты после отписки."""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def get_feed_entries(user):
+    """
+    Пары (recipe_id, pub_date) ленты пользователя, от новых к старым.
+
+    Рецепты популярных авторов добавляются через UNION ALL, а не условием
+    OR по рецептам: обе части читаются по индексам, и на страницу и
+    COUNT(*) не приходится искать строку каждого рецепта ленты. Записи
+    удалённого рецепта остаются до фоновой очистки (core/deletion.py),
+    их отбрасывает выборка самих рецептов страницы.
+    """
+    entries = FeedEntry.objects.filter(user=user).order_by().values_list(
+        'recipe_id', 'pub_date')
+    popular_author_ids = list(User.objects.filter(
+        is_popular=True, authors__user=user).values_list('pk', flat=True))
+    if popular_author_ids:
+        entries = entries.union(
+            Recipe.objects.filter(author_id__in=popular_author_ids)
+            .order_by().values_list('pk', 'pub_date'), all=True)
+    return entries.order_by('-pub_date', '-recipe_id')
@@ -0,0 +1,218 @@
+"""
+Поиск ингредиентов по началу названия с исправлением опечаток.
+
+Сначала идут ингредиенты, название которых начинается с запроса, затем
+похожие по триграммам, как в pg_trgm: слово дополняется двумя пробелами
+слева и одним справа, сходство — доля общих триграмм. На PostgreSQL
+запрос выполняет pg_trgm по GIN-индексу (миграция 0011), на остальных
+СУБД — инвертированный индекс триграмм в памяти процесса.
+"""
+import re
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+from django.db import connections
+from django.db.models import Case, FloatField, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Collate, Lower, Upper
+
+from . import metrics
+from .constants import (INGREDIENT_SEARCH_FUZZY_MIN_LENGTH,
+                        INGREDIENT_SEARCH_INDEX_TTL, INGREDIENT_SEARCH_LIMIT,
+                        INGREDIENT_SEARCH_MIN_SIMILARITY)
+from .models import Ingredient
+from .tasks import enqueue
+
+WORD = re.compile(r'\w+')
+SPACE = ord(' ')
+
+
+def trigram_codes(texts):
+    """
+    Триграммы текстов как пары (номер текста, код) с повторами.
+
+    Код — три символа по 21 бит в uint64. Все тексты склеиваются в один
+    массив символов; окна, заканчивающиеся двумя пробелами, приходятся
+    на стык слов и отбрасываются.
+    """
+    padded = [''.join(f'  {word} ' for word in WORD.findall(text.lower()))
+              for text in texts]
+    chars = np.frombuffer(''.join(padded).encode('utf-32-le'),
+                          dtype=np.uint32).astype(np.uint64)
+    if chars.size < 3:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint64)
+    first, second, third = chars[:-2], chars[1:-1], chars[2:]
+    valid = np.flatnonzero((second != SPACE) | (third != SPACE))
+    codes = (first[valid] << 42) | (second[valid] << 21) | third[valid]
+    starts = np.cumsum([0] + [len(text) for text in padded])
+    rows = np.searchsorted(starts, valid, side='right') - 1
+    return rows, codes
+
+
+class TrigramIndex:
+    """Неизменяемый индекс: отсортированные названия и списки триграмм."""
+
+    def __init__(self, rows):
+        self.ids = np.array([pk for pk, _ in rows], dtype=np.int64)
+        names = [name.lower() for _, name in rows]
+        order = sorted(range(len(names)), key=names.__getitem__)
+        self.sorted_names = [names[row] for row in order]
+        self.sorted_rows = order
+        # Место в порядке названий: при равном сходстве раньше идёт
+        # меньшее название, как в ORDER BY на PostgreSQL.
+        self.ranks = np.empty(len(names), dtype=np.int64)
+        self.ranks[order] = np.arange(len(names))
+        owners, codes = trigram_codes(names)
+        self.vocabulary, grams = np.unique(codes, return_inverse=True)
+        # Повторы триграммы в одном названии считаются один раз.
+        pairs = np.unique(grams * len(names) + owners)
+        grams, owners = pairs // len(names), pairs % len(names)
+        self.sizes = np.bincount(owners, minlength=len(names))
+        self.postings = owners.astype(np.int32)
+        self.offsets = np.concatenate(([0], np.cumsum(
+            np.bincount(grams, minlength=self.vocabulary.size))))
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (
+            self.ids, self.ranks, self.sizes, self.vocabulary,
+            self.postings, self.offsets))
+
+    def prefix_rows(self, prefix, limit):
+        start = bisect_left(self.sorted_names, prefix)
+        stop = min(bisect_right(self.sorted_names, prefix + '\U0010ffff'),
+                   start + limit)
+        return self.sorted_rows[start:stop]
+
+    def similar_rows(self, query, min_similarity, limit):
+        """
+        Строки по убыванию сходства с запросом.
+
+        Просматриваются только списки триграмм запроса, а не весь каталог.
+        """
+        grams = np.unique(trigram_codes([query])[1])
+        positions = np.searchsorted(self.vocabulary, grams)
+        found = positions < self.vocabulary.size
+        found[found] = self.vocabulary[positions[found]] == grams[found]
+        positions = positions[found]
+        if not positions.size:
+            return []
+        candidates = np.concatenate([
+            self.postings[self.offsets[position]:self.offsets[position + 1]]
+            for position in positions])
+        rows, shared = np.unique(candidates, return_counts=True)
+        similarity = shared / (grams.size + self.sizes[rows] - shared)
+        keep = similarity >= min_similarity
+        rows, similarity = rows[keep], similarity[keep]
+        order = np.lexsort((self.ranks[rows], -similarity))[:limit]
+        return rows[order].tolist()
+
+
+class IngredientIndex:
+    """
+    Индекс каталога, который строится при первом поиске.
+
+    Дальше он перестраивается фоновой задачей, а поиск тем временем идёт
+    по старому индексу. Перестроение запускают сигналы изменения
+    ингредиентов в этом процессе и, для изменений из других процессов,
+    истечение INGREDIENT_SEARCH_INDEX_TTL секунд.
+    """
+
+    def __init__(self, ttl=INGREDIENT_SEARCH_INDEX_TTL):
+        self.ttl = ttl
+        self._index = None
+        self._built_at = 0
+        self._refresh_pending = False
+        self._lock = threading.Lock()
+
+    def get(self):
+        index = self._index
+        if index is None:
+            with self._lock:
+                if self._index is None:
+                    self.build()
+                return self._index
+        if time.monotonic() - self._built_at >= self.ttl:
+            self.invalidate()
+        return index
+
+    def build(self):
+        # Изменения, сделанные во время сборки, запустят ещё одну.
+        self._refresh_pending = False
+        index = TrigramIndex(list(
+            Ingredient.objects.order_by('pk')
+            .values_list('pk', 'name').iterator(chunk_size=10000)))
+        self._index, self._built_at = index, time.monotonic()
+
+    def invalidate(self):
+        if self._index is None or self._refresh_pending:
+            return
+        self._refresh_pending = True
+        enqueue(self.build)
+
+
+ingredient_index = IngredientIndex()
+metrics.Gauge('ingredient_search_index_bytes',
+              'Размер индекса триграмм ингредиентов.',
+              lambda: ingredient_index._index.nbytes
+              if ingredient_index._index is not None else 0)
+
+
+def _in_order(queryset, ids):
+    if not ids:
+        return queryset.none()
+    # Одно выражение вместо сотни When: их разбор в ORM дороже поиска.
+    column = f'{Ingredient._meta.db_table}.{Ingredient._meta.pk.column}'
+    position = RawSQL(
+        f'CASE {column} {" ".join(["WHEN %s THEN %s"] * len(ids))} END',
+        [value for pair in enumerate(ids) for value in pair[::-1]])
+    return queryset.filter(pk__in=ids).order_by(position)
+
+
+def _search_in_memory(queryset, query, limit):
+    index = ingredient_index.get()
+    rows = index.prefix_rows(query.lower(), limit)
+    if len(rows) < limit and len(query) >= INGREDIENT_SEARCH_FUZZY_MIN_LENGTH:
+        seen = set(rows)
+        rows += [row for row in index.similar_rows(
+            query, INGREDIENT_SEARCH_MIN_SIMILARITY, limit + len(rows))
+            if row not in seen][:limit - len(rows)]
+    return _in_order(queryset, index.ids[rows].tolist())
+
+
+def _search_postgres(queryset, query, limit):
+    from django.contrib.postgres.lookups import TrigramSimilar
+    from django.contrib.postgres.search import TrigramSimilarity
+
+    # Выражение совпадает с индексом ingredient_name_trgm_idx.
+    queryset = queryset.alias(upper_name=Upper('name'))
+    is_prefix = Q(upper_name__startswith=query.upper())
+    condition = is_prefix
+    if len(query) >= INGREDIENT_SEARCH_FUZZY_MIN_LENGTH:
+        # Оператор % использует порог pg_trgm.similarity_threshold
+        # (по умолчанию 0.3, как INGREDIENT_SEARCH_MIN_SIMILARITY).
+        condition |= Q(TrigramSimilar(Upper('name'), Value(query)))
+    # Порядок как у индекса в памяти: совпадения по префиксу — по
+    # названию, остальные — по сходству, а равные — по названию в нижнем
+    # регистре побайтно (COLLATE "C"), затем по id.
+    return queryset.filter(condition).annotate(
+        is_prefix=Case(When(is_prefix, then=Value(1)), default=Value(0),
+                       output_field=IntegerField()),
+        similarity=Case(
+            When(is_prefix, then=Value(1.0)),
+            default=TrigramSimilarity(Upper('name'), Value(query)),
+            output_field=FloatField()),
+    ).order_by('-is_prefix', '-similarity',
+               Collate(Lower('name'), 'C'), 'pk')[:limit]
+
+
+def search_ingredients(queryset, query, limit=INGREDIENT_SEARCH_LIMIT):
+    """Не больше limit ингредиентов: сначала по префиксу, затем похожие."""
+    query = ' '.join(query.split())
+    if not query:
+        return queryset
+    if connections[queryset.db].vendor == 'postgresql':
+        return _search_postgres(queryset, query, limit)
+    return _search_in_memory(queryset, query, limit)
@@ -0,0 +1,130 @@
+"""Структурированное логирование с записью в фоновом потоке."""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+request_id_var = ContextVar('request_id', default=None)
+
+# Стандартные атрибуты LogRecord: всё остальное считается полями extra.
+_RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {
+    'message', 'asctime', 'request_id'}
+_PRIMITIVES = (str, int, float, bool, type(None))
+_exception_formatter = logging.Formatter()
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматирует запись в одну строку JSON."""
+
+    def format(self, record):
+        payload = {
+            'time': datetime.fromtimestamp(
+                record.created, tz=timezone.utc
+            ).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                payload[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload['exc_info'] = record.exc_text
+        if record.stack_info:
+            payload['stack_info'] = record.stack_info
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class RequestIdFilter(logging.Filter):
+    """Добавляет к записи идентификатор текущего запроса."""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает только долю `rate` записей уровня DEBUG."""
+
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self.rate = float(rate)
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+
+class AsyncStreamHandler(QueueHandler):
+    """
+    Кладёт записи в очередь, а форматирует и пишет их в фоновом потоке.
+
+    Поток-слушатель запускается лениво и перезапускается после fork,
+    поэтому обработчик можно использовать с `gunicorn --preload`.
+    При переполнении очереди записи отбрасываются, а не блокируют запрос.
+    """
+
+    def __init__(self, stream=None, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        self.maxsize = maxsize
+        self.target = logging.StreamHandler(stream)
+        self.listener = None
+        self.dropped = 0
+        self._pid = None
+        self._start_lock = threading.Lock()
+        atexit.register(self.stop)
+
+    def setFormatter(self, fmt):
+        self.target.setFormatter(fmt)
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # Очередь и поток родительского процесса после fork непригодны.
+            self.queue = queue.Queue(self.maxsize)
+            self.listener = QueueListener(self.queue, self.target)
+            self.listener.start()
+            self._pid = os.getpid()
+
+    def prepare(self, record):
+        # В потоке запроса фиксируются только текст сообщения и значения,
+        # которые нельзя безопасно передать в другой поток; JSON собирается
+        # и пишется уже слушателем.
+        prepared = logging.LogRecord.__new__(logging.LogRecord)
+        prepared.__dict__.update(record.__dict__)
+        record = prepared
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(
+                record.exc_info)
+            record.exc_info = None
+        for key in record.__dict__.keys() - _RECORD_ATTRS:
+            value = record.__dict__[key]
+            if not isinstance(value, _PRIMITIVES):
+                record.__dict__[key] = str(value)
+        return record
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        if self.listener is not None and self._pid == os.getpid():
+            self.listener.stop()
+            self.listener = None
+            self._pid = None
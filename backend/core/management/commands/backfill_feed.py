@@ -0,0 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from core.constants import FEED_FANOUT_MAX_FOLLOWERS
+from core.feed import add_author_to_feed
+from core.models import Subscription
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Заполняет ленты подписчиков по существующим подпискам.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        popular_ids = (
+            Subscription.objects.values('author_id')
+            .annotate(followers=Count('pk'))
+            .filter(followers__gt=FEED_FANOUT_MAX_FOLLOWERS)
+            .values_list('author_id', flat=True)
+        )
+        User.objects.filter(is_popular=True).exclude(
+            pk__in=popular_ids).update(is_popular=False)
+        marked = User.objects.filter(pk__in=popular_ids).update(
+            is_popular=True)
+        self.stdout.write(f'Популярных авторов: {marked}')
+
+        subscriptions = (
+            Subscription.objects.filter(author__is_popular=False)
+            .order_by('pk').values_list('user_id', 'author_id')
+            .iterator(chunk_size=options['chunk_size'])
+        )
+        total = 0
+        for user_id, author_id in subscriptions:
+            add_author_to_feed(user_id, author_id)
+            total += 1
+            if total % options['chunk_size'] == 0:
+                self.stdout.write(f'Обработано подписок: {total}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово, обработано подписок: {total}.'))
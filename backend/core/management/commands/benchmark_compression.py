@@ -0,0 +1,72 @@
+import statistics
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from api.read_serializers import RecipeReadSerializer
+from core.middleware import COMPRESSORS, CompressionMiddleware
+from core.models import Recipe, SiteUser
+
+
+class Command(BaseCommand):
+    help = ('Замеряет CompressionMiddleware на странице синтетических '
+            'рецептов: размер тела, сжатие на каждый запрос и ответ из '
+            'кэша сжатых тел. Рецепты создаются в транзакции и '
+            'откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            body = self.page(options['recipes'])
+            transaction.set_rollback(True)
+        self.stdout.write(f'Тело: {len(body)} байт')
+        for encoding, compress in COMPRESSORS.items():
+            self.stdout.write(f'{encoding}: {len(compress(body))} байт')
+        factory = RequestFactory()
+        middleware = CompressionMiddleware(
+            lambda request: HttpResponse(
+                body, content_type='application/json'))
+        # В кэш попадают только ответы анониму; первый запрос — промах.
+        cases = (
+            ('без кэша', {'HTTP_AUTHORIZATION': 'Token benchmark'}),
+            ('из кэша', {}),
+        )
+        for encoding in COMPRESSORS:
+            for name, headers in cases:
+                timings = []
+                for _ in range(options['repeat']):
+                    request = factory.get(
+                        '/api/recipes/', HTTP_ACCEPT_ENCODING=encoding,
+                        **headers)
+                    started = time.perf_counter()
+                    middleware(request)
+                    timings.append(time.perf_counter() - started)
+                self.stdout.write(
+                    f'{encoding}, {name}: p50 '
+                    f'{statistics.median(timings) * 1e6:.0f} мкс на ответ')
+
+    def page(self, count):
+        """Тело ответа /api/recipes/ из count рецептов."""
+        author = SiteUser.objects.create(
+            email='benchmark@example.invalid', username='benchmark',
+            first_name='Имя', last_name='Фамилия')
+        Recipe.objects.bulk_create(
+            Recipe(author=author, name=f'Рецепт {number}',
+                   text='Текст рецепта, ' * 20, cooking_time=number + 1,
+                   image=f'recipes/images/{number}.png')
+            for number in range(count))
+        request = Request(RequestFactory().get('/api/recipes/'))
+        request.user = AnonymousUser()
+        return JSONRenderer().render(RecipeReadSerializer(
+            Recipe.objects.filter(author=author).values(
+                *RecipeReadSerializer.value_fields()),
+            many=True, context={'request': request}).data)
@@ -0,0 +1,88 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.feed import add_author_to_feed, get_feed_entries
+from core.models import FeedEntry, Recipe, SiteUser, Subscription
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает чтение ленты подписок через FeedEntry с выборкой '
+            'author__in по синтетическим данным. Данные создаются в '
+            'транзакции и откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=3000)
+        parser.add_argument('--recipes', type=int, default=20,
+                            help='рецептов у каждого автора')
+        parser.add_argument('--popular', type=int, default=10,
+                            help='сколько авторов пометить популярными')
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            reader, authors = self.create_data(
+                options['authors'], options['recipes'])
+            self.measure('Лента', reader, options)
+            # Рецепты популярных авторов подмешиваются при чтении.
+            popular = authors[:options['popular']]
+            SiteUser.objects.filter(pk__in=popular).update(is_popular=True)
+            FeedEntry.objects.filter(
+                user=reader, author_id__in=popular).delete()
+            self.measure(f'Лента с {len(popular)} популярными авторами',
+                         reader, options)
+            transaction.set_rollback(True)
+
+    def create_data(self, author_count, recipe_count):
+        reader, *authors = SiteUser.objects.bulk_create(
+            SiteUser(email=f'benchmark{number}@example.invalid',
+                     username=f'benchmark{number}')
+            for number in range(author_count + 1))
+        author_ids = [author.pk for author in authors]
+        Recipe.objects.bulk_create((
+            Recipe(author_id=author_id, name=f'Рецепт {number}',
+                   text='Текст', cooking_time=10,
+                   image='recipes/images/benchmark.png')
+            for author_id in author_ids for number in range(recipe_count)),
+            batch_size=5000)
+        Subscription.objects.bulk_create(
+            Subscription(user=reader, author_id=author_id)
+            for author_id in author_ids)
+        for author_id in author_ids:
+            add_author_to_feed(reader.pk, author_id)
+        self.stdout.write(
+            f'Авторов: {author_count}, рецептов: '
+            f'{author_count * recipe_count}, записей ленты: '
+            f'{FeedEntry.objects.filter(user=reader).count()}')
+        return reader, author_ids
+
+    def measure(self, title, reader, options):
+        page_size = options['page_size']
+
+        # Как при пагинации: первая страница и COUNT(*).
+        def author_in():
+            recipes = Recipe.objects.filter(
+                author__in=Subscription.objects.filter(
+                    user=reader).values('author_id'),
+            ).order_by('-pub_date', '-pk').values_list('pk', 'pub_date')
+            return recipes.count(), list(recipes[:page_size])
+
+        def feed():
+            entries = get_feed_entries(reader)
+            return entries.count(), list(entries[:page_size])
+
+        if author_in() != feed():
+            self.stderr.write(f'{title}: страницы различаются.')
+        for name, read in (('author__in', author_in), ('FeedEntry', feed)):
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                read()
+                timings.append(time.perf_counter() - started)
+            self.stdout.write(
+                f'{title}, {name}: p50 '
+                f'{statistics.median(timings) * 1000:.1f} мс '
+                f'на {page_size} рецептов и COUNT(*)')
@@ -0,0 +1,84 @@
+import statistics
+import time
+from itertools import product
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.ingredient_search import (TrigramIndex, ingredient_index,
+                                    search_ingredients)
+from core.models import Ingredient
+
+FOODS = ('молоко', 'картофель', 'морковь', 'сахар', 'мука', 'соль',
+         'масло', 'сыр', 'творог', 'яблоко', 'лук', 'чеснок', 'перец',
+         'томат', 'огурец', 'капуста', 'свёкла', 'рис', 'гречка', 'овёс',
+         'говядина', 'свинина', 'курица', 'индейка', 'лосось', 'треска',
+         'кефир', 'сметана', 'йогурт', 'мёд')
+KINDS = ('', 'сушёный', 'молотый', 'свежий', 'копчёный', 'консервированный',
+         'органический', 'домашний', 'отборный', 'резаный')
+# Запрос и ожидаемое первое название.
+QUERIES = (('млоко', 'молоко'), ('картошель', 'картофель'),
+           ('мол', None), ('говядина', None))
+
+
+def catalog(size):
+    """Сами продукты, затем уникальные названия «продукт вид сорт»."""
+    names = (' '.join(filter(None, (food, kind, str(grade))))
+             for grade, food, kind in product(range(size), FOODS, KINDS))
+    names = [*FOODS, *(name for name, _ in zip(names, range(
+        size - len(FOODS))))]
+    return [Ingredient(name=name, measurement_unit='г') for name in names]
+
+
+class Command(BaseCommand):
+    help = ('Замеряет поиск ингредиентов на синтетическом каталоге: '
+            'сборку индекса и время ответа на запросы с опечатками. '
+            'Каталог создаётся в транзакции и откатывается.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            Ingredient.objects.bulk_create(
+                catalog(options['size']), batch_size=5000)
+            self.measure(options['repeat'])
+            transaction.set_rollback(True)
+        # Индекс процесса не должен помнить откаченный каталог.
+        ingredient_index.build()
+
+    def measure(self, repeat):
+        rows = list(Ingredient.objects.values_list('pk', 'name'))
+        started = time.perf_counter()
+        index = TrigramIndex(rows)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Каталог: {len(rows)} ингредиентов. Сборка индекса: '
+            f'{elapsed * 1000:.0f} мс, {index.nbytes / 2**20:.1f} МБ')
+        ingredient_index.build()
+        queryset = Ingredient.objects.all()
+        for query, expected in QUERIES:
+            def search():
+                return list(search_ingredients(queryset, query)
+                            .values_list('name', flat=True))
+
+            def startswith():
+                return list(queryset.filter(name__istartswith=query)
+                            .values_list('name', flat=True))
+
+            found = search()
+            if expected and (not found or found[0] != expected):
+                self.stderr.write(
+                    f'«{query}»: первым найдено {found[:1]}, '
+                    f'ожидалось «{expected}».')
+            for name, function in (('поиск', search),
+                                   ('istartswith', startswith)):
+                timings = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    result = function()
+                    timings.append(time.perf_counter() - started)
+                self.stdout.write(
+                    f'«{query}», {name}: {len(result)} строк, p50 '
+                    f'{statistics.median(timings) * 1000:.1f} мс')
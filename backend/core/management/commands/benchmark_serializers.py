@@ -0,0 +1,137 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from djoser.serializers import UserSerializer as DjoserUserSerializer
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from api.read_serializers import RecipeReadSerializer
+from core.models import Ingredient, Recipe, RecipeIngredient, SiteUser
+
+
+# Сериализаторы чтения рецептов в том виде, в каком они были до
+# RecipeReadSerializer: зафиксированы здесь, чтобы правки в
+# api/serializers.py не меняли точку отсчёта. Исправлено только
+# направление связи в is_subscribed, запросов столько же.
+
+class BaselineUserSerializer(DjoserUserSerializer):
+    is_subscribed = serializers.SerializerMethodField()
+    avatar = Base64ImageField()
+
+    class Meta(DjoserUserSerializer.Meta):
+        model = SiteUser
+        fields = ('email', 'id', 'username', 'first_name',
+                  'last_name', 'is_subscribed', 'avatar')
+
+    def get_is_subscribed(self, author):
+        request = self.context.get('request')
+        return (request and request.user.is_authenticated
+                and author.authors.filter(user=request.user).exists())
+
+
+class BaselineIngredientInRecipeSerializer(serializers.ModelSerializer):
+    id = serializers.PrimaryKeyRelatedField(
+        queryset=Ingredient.objects.all(), source='ingredient')
+    name = serializers.CharField(source='ingredient.name', read_only=True)
+    measurement_unit = serializers.CharField(
+        source='ingredient.measurement_unit', read_only=True)
+    amount = serializers.IntegerField()
+
+    class Meta:
+        model = RecipeIngredient
+        fields = ('id', 'name', 'measurement_unit', 'amount')
+
+
+class BaselineRecipeSerializer(serializers.ModelSerializer):
+    ingredients = BaselineIngredientInRecipeSerializer(
+        many=True, source='recipe_ingredients')
+    image = Base64ImageField(required=True)
+    author = BaselineUserSerializer(read_only=True)
+    is_favorited = serializers.SerializerMethodField()
+    is_in_shopping_cart = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Recipe
+        fields = ('id', 'author', 'ingredients', 'is_favorited',
+                  'is_in_shopping_cart', 'name', 'image', 'text',
+                  'cooking_time')
+
+    def to_representation(self, instance):
+        representation = super().to_representation(instance)
+        request = self.context.get('request')
+        representation['is_favorited'] = self.get_is_favorited(instance)
+        representation['is_in_shopping_cart'] = self.get_is_in_shopping_cart(
+            instance)
+        if representation.get('image'):
+            if request:
+                representation['image'] = request.build_absolute_uri(
+                    representation['image'])
+            else:
+                representation['image'] = (
+                    f"{settings.MEDIA_URL}{representation['image']}")
+        return representation
+
+    def get_is_favorited(self, obj):
+        request = self.context.get('request')
+        return (request and request.user.is_authenticated
+                and obj.favorites.filter(user=request.user).exists())
+
+    def get_is_in_shopping_cart(self, obj):
+        request = self.context.get('request')
+        return (request and request.user.is_authenticated
+                and obj.shopcarts.filter(user=request.user).exists())
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает скорость прежнего сериализатора рецептов и '
+            'RecipeReadSerializer на страницах рецептов из текущей базы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--user', type=int,
+                            help='id пользователя, от имени которого '
+                                 'выполняются запросы (по умолчанию аноним)')
+
+    def handle(self, *args, **options):
+        page_size = options['page_size']
+        queryset = Recipe.objects.order_by('-pub_date')[:page_size]
+        rows = len(queryset)
+        if not rows:
+            self.stderr.write('В базе нет рецептов.')
+            return
+        user = (SiteUser.objects.get(pk=options['user'])
+                if options['user'] else AnonymousUser())
+        render = JSONRenderer().render
+
+        def request():
+            request = Request(RequestFactory().get('/api/recipes/'))
+            request.user = user
+            return request
+
+        def baseline():
+            return render(BaselineRecipeSerializer(
+                queryset.all(), many=True,
+                context={'request': request()}).data)
+
+        def fast():
+            return render(RecipeReadSerializer(
+                queryset.values(*RecipeReadSerializer.value_fields()),
+                many=True, context={'request': request()}).data)
+
+        if baseline() != fast():
+            self.stderr.write('Ответы сериализаторов различаются.')
+        for name, serialize in (('Прежний RecipeSerializer', baseline),
+                                ('RecipeReadSerializer', fast)):
+            started = time.perf_counter()
+            for _ in range(options['repeat']):
+                serialize()
+            elapsed = (time.perf_counter() - started) / options['repeat']
+            self.stdout.write(
+                f'{name}: {elapsed * 1000:.1f} мс на страницу, '
+                f'{rows / elapsed:.0f} строк/с')
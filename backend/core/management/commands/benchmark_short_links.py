@@ -0,0 +1,65 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Recipe, SiteUser
+from core.short_codes import generate_short_code, resolve_short_code
+
+
+class Command(BaseCommand):
+    help = ('Замеряет разрешение коротких кодов /s/<code> на синтетических '
+            'рецептах: без кэша (запрос по индексу) и из lru_cache. '
+            'Рецепты создаются в транзакции и откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1_000_000)
+        parser.add_argument('--lookups', type=int, default=20_000)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            codes = self.create_recipes(
+                options['recipes'], options['lookups'],
+                options['batch_size'])
+            self.measure(codes)
+            transaction.set_rollback(True)
+        # Кэш не должен помнить откаченные рецепты.
+        resolve_short_code.cache_clear()
+
+    def create_recipes(self, count, lookups, batch_size):
+        """Создаёт рецепты пачками; возвращает коды случайной выборки."""
+        author = SiteUser.objects.create(
+            email='benchmark@example.invalid', username='benchmark')
+        sample = set(random.sample(range(count), min(lookups, count)))
+        codes, used = [], set()
+        for start in range(0, count, batch_size):
+            recipes = []
+            for number in range(start, min(start + batch_size, count)):
+                code = generate_short_code()
+                while code in used:
+                    code = generate_short_code()
+                used.add(code)
+                if number in sample:
+                    codes.append(code)
+                recipes.append(Recipe(
+                    author=author, name=f'Рецепт {number}', text='Текст',
+                    cooking_time=10, image='recipes/images/benchmark.png',
+                    short_code=code))
+            Recipe.objects.bulk_create(recipes)
+        self.stdout.write(f'Рецептов: {count}, кодов в выборке: '
+                          f'{len(codes)}')
+        random.shuffle(codes)
+        return codes
+
+    def measure(self, codes):
+        resolve_short_code.cache_clear()
+        for name in ('Без кэша', 'Из кэша'):
+            started = time.perf_counter()
+            for code in codes:
+                resolve_short_code(code)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{name}: {len(codes) / elapsed:,.0f} кодов/с, '
+                f'{elapsed / len(codes) * 1e6:.1f} мкс на код')
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.constants import MINHASH_BATCH_SIZE
+from core.minhash import build_signatures
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает MinHash-подписи всех рецептов для поиска '
+            'дубликатов. Нужна после загрузки данных и изменения '
+            'параметров MINHASH_*.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=MINHASH_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = build_signatures(
+            batch_size=options['batch_size'],
+            progress=lambda done, count: self.stdout.write(
+                f'Обработано рецептов: {done}/{count}'),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {total} подписей за '
+            f'{time.perf_counter() - started:.1f} с.'))
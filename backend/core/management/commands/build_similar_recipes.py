@@ -0,0 +1,37 @@
+import resource
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from core.constants import SIMILAR_RECIPES_CHUNK_SIZE, SIMILAR_RECIPES_TOP_K
+from core.similarity import build_similar_recipes
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает похожие рецепты. '
+            'Предназначена для периодического запуска (cron).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int,
+                            default=SIMILAR_RECIPES_TOP_K)
+        parser.add_argument('--chunk-size', type=int,
+                            default=SIMILAR_RECIPES_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        tracemalloc.start()
+        started = time.perf_counter()
+        total = build_similar_recipes(
+            top_k=options['top_k'],
+            chunk_size=options['chunk_size'],
+            progress=lambda done, count: self.stdout.write(
+                f'Обработано рецептов: {done}/{count}'),
+        )
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {total} пар за {elapsed:.1f} с, пик памяти Python '
+            f'{peak / 2 ** 20:.1f} МБ, максимальный RSS '
+            f'{max_rss / 1024:.1f} МБ.'))
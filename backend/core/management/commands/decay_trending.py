@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from core.constants import TRENDING_HALF_LIFE_HOURS
+from core.trending import decay_trending_scores, rebuild_trending_scores
+
+
+class Command(BaseCommand):
+    help = ('Применяет затухание к популярности рецептов. Предназначена '
+            'для периодического запуска (cron) с интервалом --hours.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=1,
+                            help='Сколько часов прошло с прошлого запуска.')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Пересчитать оценки по избранному и '
+                                 'корзинам заново.')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            total = rebuild_trending_scores()
+            self.stdout.write(f'Пересчитано рецептов: {total}')
+        factor = 0.5 ** (options['hours'] / TRENDING_HALF_LIFE_HOURS)
+        changed = decay_trending_scores(factor)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: множитель {factor:.4f}, изменено рецептов: {changed}.'))
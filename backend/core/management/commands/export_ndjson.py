@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from core.ndjson import export_ndjson
+
+
+class Command(BaseCommand):
+    help = ('Выгружает пользователей, ингредиенты, рецепты, избранное, '
+            'корзины и подписки в NDJSON. Прерванная выгрузка '
+            'продолжается при повторном запуске с тем же путём.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--gzip', action='store_true',
+                            help='Сжать файл gzip.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        total = export_ndjson(
+            options['path'],
+            compress=options['gzip'],
+            chunk_size=options['chunk_size'],
+            progress=lambda label, count: self.stdout.write(
+                f'{label}: выгружено записей {count}'),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово, выгружено записей: {total}.'))
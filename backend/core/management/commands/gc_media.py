@@ -0,0 +1,39 @@
+import os
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from core.constants import AVATAR_UPLOAD_PATH, RECIPE_IMAGE_UPLOAD_PATH
+from core.media import is_recently_written, referenced_names
+
+
+class Command(BaseCommand):
+    help = ('Удаляет медиафайлы, на которые не ссылается ни одна запись. '
+            'Предназначена для периодического запуска (cron).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать, что будет удалено.')
+
+    def handle(self, *args, **options):
+        referenced = referenced_names()
+        removed = freed = 0
+        for directory in (RECIPE_IMAGE_UPLOAD_PATH, AVATAR_UPLOAD_PATH):
+            root = default_storage.path(directory)
+            for path, _, files in os.walk(root):
+                for filename in files:
+                    full_path = os.path.join(path, filename)
+                    name = os.path.relpath(
+                        full_path, default_storage.location).replace(
+                        os.sep, '/')
+                    if name in referenced or is_recently_written(name):
+                        continue
+                    size = os.path.getsize(full_path)
+                    if options['dry_run']:
+                        self.stdout.write(f'Будет удалён: {name}')
+                    else:
+                        default_storage.delete(name)
+                    removed += 1
+                    freed += size
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: файлов {removed}, {freed / 2 ** 20:.1f} МБ.'))
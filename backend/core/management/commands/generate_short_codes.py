@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from core.short_codes import generate_short_code
+
+
+class Command(BaseCommand):
+    help = 'Генерирует короткие коды для рецептов, у которых их нет.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total = 0
+        while True:
+            recipes = list(
+                Recipe.objects.filter(short_code__isnull=True)
+                .order_by('pk').only('pk')[:batch_size]
+            )
+            if not recipes:
+                break
+            codes = self._unique_codes(len(recipes))
+            for recipe, code in zip(recipes, codes):
+                recipe.short_code = code
+            Recipe.objects.bulk_update(recipes, ['short_code'])
+            total += len(recipes)
+            self.stdout.write(f'Обработано рецептов: {total}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово, коды созданы для {total} рецептов.'))
+
+    @staticmethod
+    def _unique_codes(count):
+        codes = set()
+        while len(codes) < count:
+            candidates = {generate_short_code()
+                          for _ in range(count - len(codes))} - codes
+            taken = set(Recipe.all_objects.filter(
+                short_code__in=candidates
+            ).values_list('short_code', flat=True))
+            codes |= candidates - taken
+        return list(codes)
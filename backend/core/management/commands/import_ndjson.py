@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from core.minhash import build_signatures
+from core.ndjson import import_ndjson
+
+
+class Command(BaseCommand):
+    help = ('Загружает NDJSON из export_ndjson (в том числе сжатый gzip) '
+            'с сохранением первичных ключей. Прерванная загрузка '
+            'продолжается при повторном запуске.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        counts = import_ndjson(
+            options['path'],
+            chunk_size=options['chunk_size'],
+            progress=lambda label, line: self.stdout.write(
+                f'{label}: обработано строк {line}'),
+            on_conflict=lambda label, pk, error: self.stderr.write(
+                f'{label}: запись pk={pk} не загружена: {error}'),
+        )
+        # bulk_create не отправляет сигналы: подписи для поиска дубликатов
+        # считаются здесь, в том числе после прерванной загрузки.
+        build_signatures(
+            missing_only=True,
+            progress=lambda done, count: self.stdout.write(
+                f'Подписи рецептов: {done}/{count}'))
+        message = (f'Готово, загружено записей: {counts["inserted"]}, '
+                   f'уже были в базе: {counts["existing"]}')
+        if counts['conflicts']:
+            self.stdout.write(self.style.WARNING(
+                f'{message}, не загружено из-за конфликтов: '
+                f'{counts["conflicts"]}.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{message}.'))
@@ -0,0 +1,145 @@
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Выполняется в отдельном интерпретаторе: в текущем процессе всё уже
+# импортировано. Печатает JSON с замерами по этапам запуска воркера и
+# приростом RSS при загрузке каждого пакета верхнего уровня.
+CHILD_SCRIPT = '''
+import json, os, sys, time
+
+PAGE_KB = os.sysconf('SC_PAGE_SIZE') // 1024
+
+
+def rss_kb():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * PAGE_KB
+
+
+class Loader:
+    def __init__(self, name, loader, probe):
+        self.name, self.loader, self.probe = name, loader, probe
+
+    def __getattr__(self, attr):
+        return getattr(self.loader, attr)
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        stack = self.probe.stack
+        stack.append(0)
+        before = rss_kb()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            total = rss_kb() - before
+            nested = stack.pop()
+            # Без пакетов, загруженных по ходу: они учтены отдельно.
+            self.probe.sizes[self.name] = total - nested
+            if stack:
+                stack[-1] += total
+
+
+class Probe:
+    def __init__(self):
+        self.stack, self.sizes = [], {}
+
+    def find_spec(self, name, path=None, target=None):
+        if '.' in name:
+            return None
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+            spec.loader = Loader(name, spec.loader, self)
+        return spec
+
+
+probe = Probe()
+sys.meta_path.insert(0, probe)
+phases = []
+started = time.perf_counter()
+
+
+def mark(name):
+    phases.append({'phase': name,
+                   'seconds': time.perf_counter() - started,
+                   'rss_kb': rss_kb()})
+
+
+mark('interpreter')
+import django
+django.setup()
+mark('django.setup')
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+mark('wsgi')
+from django.urls import get_resolver
+get_resolver().url_patterns
+mark('urls')
+print(json.dumps({'phases': phases, 'packages': probe.sizes}))
+'''
+
+IMPORTTIME_LINE = re.compile(
+    r'import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)')
+
+
+class Command(BaseCommand):
+    help = ('Замеряет запуск воркера в отдельном процессе: время и RSS по '
+            'этапам, время импорта и прирост RSS по пакетам.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=15,
+                            help='Сколько пакетов показывать.')
+
+    def run_child(self, importtime):
+        command = [sys.executable]
+        if importtime:
+            # Замер RSS искажает время импорта, поэтому процессов два.
+            command += ['-X', 'importtime']
+        command += ['-c', CHILD_SCRIPT]
+        result = subprocess.run(
+            command, capture_output=True, text=True, check=True,
+            cwd=settings.BASE_DIR, env=os.environ.copy())
+        return json.loads(result.stdout.strip().splitlines()[-1]), \
+            result.stderr
+
+    def handle(self, *args, **options):
+        top = options['top']
+        data, stderr = self.run_child(importtime=True)
+        self.stdout.write('Этапы запуска (нарастающим итогом):')
+        for phase in data['phases']:
+            self.stdout.write(
+                f'  {phase["phase"]:<12} {phase["seconds"] * 1000:8.1f} мс '
+                f'{phase["rss_kb"] / 1024:8.1f} МБ RSS')
+
+        import_times = defaultdict(int)
+        for line in stderr.splitlines():
+            match = IMPORTTIME_LINE.match(line)
+            if match:
+                # Собственное время модуля, чтобы не считать вложенные
+                # импорты дважды.
+                package = match.group(4).split('.')[0]
+                import_times[package] += int(match.group(1))
+        self.stdout.write(f'Время импорта, топ {top} пакетов:')
+        for package, micros in sorted(
+                import_times.items(), key=lambda item: -item[1])[:top]:
+            self.stdout.write(f'  {package:<24} {micros / 1000:8.1f} мс')
+
+        data, _ = self.run_child(importtime=False)
+        self.stdout.write(f'Прирост RSS при загрузке, топ {top} пакетов:')
+        for package, size in sorted(
+                data['packages'].items(), key=lambda item: -item[1])[:top]:
+            self.stdout.write(f'  {package:<24} {size / 1024:8.1f} МБ')
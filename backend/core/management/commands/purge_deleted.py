@@ -0,0 +1,36 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from core.constants import DELETION_BATCH_SIZE
+from core.deletion import purge_recipes, purge_user
+from core.models import Recipe, SiteUser
+
+
+class Command(BaseCommand):
+    help = ('Удаляет данные пользователей и рецептов, помеченных на '
+            'удаление, если фоновая задача не успела или прервалась.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=DELETION_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        deleted = Counter()
+
+        def progress(label, count):
+            deleted[label] += count
+            self.stdout.write(f'  {label}: {deleted[label]}')
+
+        user_ids = list(SiteUser.all_objects.filter(
+            is_deleted=True).values_list('pk', flat=True))
+        for user_id in user_ids:
+            self.stdout.write(f'Пользователь {user_id}:')
+            purge_user(user_id, batch_size, progress)
+        self.stdout.write('Рецепты:')
+        purge_recipes(Recipe.all_objects.filter(is_deleted=True),
+                      batch_size, progress)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: пользователей {len(user_ids)}, '
+            f'строк {sum(deleted.values())}.'))
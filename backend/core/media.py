@@ -0,0 +1,58 @@
+"""Учёт ссылок на медиафайлы из базы и удаление ненужных файлов."""
+import os
+import time
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+
+from .constants import MEDIA_DELETE_GRACE_SECONDS
+
+# Поля, через которые записи ссылаются на файлы хранилища.
+FILE_REFERENCES = (
+    ('core.recipe', 'image'),
+    ('core.siteuser', 'avatar'),
+)
+
+
+def count_references(name):
+    """Число записей, ссылающихся на файл `name`."""
+    total = 0
+    for label, field in FILE_REFERENCES:
+        model = apps.get_model(label)
+        total += model._base_manager.filter(**{field: name}).count()
+    return total
+
+
+def referenced_names():
+    """Множество имён всех файлов, на которые есть ссылки."""
+    names = set()
+    for label, field in FILE_REFERENCES:
+        model = apps.get_model(label)
+        names.update(
+            model._base_manager.exclude(**{field: ''})
+            .exclude(**{f'{field}__isnull': True})
+            .values_list(field, flat=True).distinct().iterator())
+    return names
+
+
+def is_recently_written(name, storage=default_storage,
+                        grace=MEDIA_DELETE_GRACE_SECONDS):
+    try:
+        modified = os.path.getmtime(storage.path(name))
+    except FileNotFoundError:
+        return False
+    return time.time() - modified < grace
+
+
+def release_file(name, storage=default_storage):
+    """
+    Удаляет файл, если на него больше никто не ссылается.
+
+    Недавно записанные файлы не трогаются: возможно, запрос, который
+    только что получил это имя, ещё не сохранил ссылку. Их позже
+    удалит команда gc_media.
+    """
+    if not name or count_references(name) or is_recently_written(name):
+        return False
+    storage.delete(name)
+    return True
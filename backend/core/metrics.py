@@ -0,0 +1,271 @@
+"""
+Метрики процесса в текстовом формате Prometheus.
+
+Каждый поток пишет в собственный словарь, поэтому учёт обходится без
+блокировок; словари складываются только при выдаче /metrics. Значения
+относятся к одному процессу gunicorn: какой из воркеров ответит,
+видно по метке pid у process_resident_memory_bytes.
+"""
+import hmac
+import os
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.urls import Resolver404, resolve
+
+from .constants import METRICS_LATENCY_BUCKETS
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+class _ThreadShard(threading.local):
+    """Словарь значений потока; __init__ вызывается в каждом потоке."""
+
+    def __init__(self, shards, lock):
+        self.values = {}
+        # Блокировка берётся один раз за время жизни потока.
+        with lock:
+            shards.append(self.values)
+
+
+class Registry:
+    """Набор метрик и словари значений по потокам."""
+
+    def __init__(self):
+        self.metrics = {}
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        self.local = _ThreadShard(self._shards, self._shards_lock)
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+
+    def collect(self):
+        """Сумма значений всех потоков по ключу (имя, метки)."""
+        with self._shards_lock:
+            shards = list(self._shards)
+        totals = {}
+        for shard in shards:
+            # copy() атомарна под GIL, даже если поток сейчас пишет.
+            for key, value in shard.copy().items():
+                if isinstance(value, list):
+                    total = totals.setdefault(key, [0] * len(value))
+                    for index, item in enumerate(value):
+                        total[index] += item
+                else:
+                    totals[key] = totals.get(key, 0) + value
+        samples = defaultdict(list)
+        for (name, labels), value in totals.items():
+            samples[name].append((labels, value))
+        return samples
+
+    def render(self):
+        samples = self.collect()
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append(f'# HELP {name} {metric.help}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            lines.extend(metric.lines(samples.get(name, ())))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def _escape(value):
+    return (str(value).replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n'))
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    return repr(float(value)).replace('inf', 'Inf')
+
+
+class Metric:
+    type = 'untyped'
+
+    def __init__(self, name, help, labels=(), registry=registry):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.registry = registry
+        registry.register(self)
+
+    def lines(self, samples):
+        for labels, value in sorted(samples):
+            yield (f'{self.name}{_labels(self.label_names, labels)} '
+                   f'{_number(value)}')
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, *labels, value=1):
+        shard = self.registry.local.values
+        key = (self.name, labels)
+        shard[key] = shard.get(key, 0) + value
+
+
+class Histogram(Metric):
+    """Гистограмма; в словаре потока — счётчики корзин, сумма и число."""
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=METRICS_LATENCY_BUCKETS,
+                 registry=registry):
+        super().__init__(name, help, labels, registry)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        shard = self.registry.local.values
+        key = (self.name, labels)
+        counts = shard.get(key)
+        if counts is None:
+            counts = shard[key] = [0] * (len(self.buckets) + 3)
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-2] += value
+        counts[-1] += 1
+
+    def lines(self, samples):
+        bounds = [*map(_number, self.buckets), '+Inf']
+        for labels, counts in sorted(samples):
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                yield (f'{self.name}_bucket'
+                       f'{_labels(self.label_names, labels, [("le", bound)])}'
+                       f' {cumulative}')
+            label_text = _labels(self.label_names, labels)
+            yield f'{self.name}_sum{label_text} {_number(counts[-2])}'
+            yield f'{self.name}_count{label_text} {counts[-1]}'
+
+
+class Gauge(Metric):
+    """
+    Значение, которое вычисляется при выдаче метрик.
+
+    `collect` возвращает число или, если заданы метки, словарь
+    «кортеж значений меток → число».
+    """
+    type = 'gauge'
+
+    def __init__(self, name, help, collect, labels=(), registry=registry):
+        super().__init__(name, help, labels, registry)
+        self.collect = collect
+
+    def lines(self, samples):
+        value = self.collect()
+        if not isinstance(value, dict):
+            value = {(): value}
+        return super().lines(value.items())
+
+
+class CounterFunc(Gauge):
+    """Счётчик, который ведёт сам наблюдаемый объект (например, lru_cache)."""
+    type = 'counter'
+
+
+request_duration = Histogram(
+    'http_request_duration_seconds',
+    'Время обработки запроса по представлению и действию DRF.',
+    ('view', 'action', 'method'))
+requests_total = Counter(
+    'http_requests_total', 'Ответы по представлению и коду статуса.',
+    ('view', 'action', 'status'))
+db_queries = Counter(
+    'db_queries_total', 'SQL-запросы по алиасу базы.', ('alias',))
+db_query_seconds = Counter(
+    'db_query_seconds_total', 'Время выполнения SQL-запросов.', ('alias',))
+db_connections_opened = Counter(
+    'db_connections_opened_total', 'Открытые процессом соединения с базой.',
+    ('alias',))
+cache_requests = Counter(
+    'cache_requests_total',
+    'Обращения к кэшам приложения; result — hit, miss и т. п.',
+    ('cache', 'result'))
+
+_connections = weakref.WeakSet()
+_connections_lock = threading.Lock()
+
+
+def _open_connections():
+    with _connections_lock:
+        wrappers = list(_connections)
+    counts = defaultdict(int)
+    for wrapper in wrappers:
+        if wrapper.connection is not None:
+            counts[(wrapper.alias,)] += 1
+    return counts
+
+
+def _rss():
+    with open('/proc/self/statm') as statm:
+        return {(os.getpid(),): int(statm.read().split()[1]) * PAGE_SIZE}
+
+
+Gauge('db_connections_open', 'Открытые сейчас соединения с базой.',
+      _open_connections, ('alias',))
+Gauge('process_resident_memory_bytes', 'RSS процесса.', _rss, ('pid',))
+
+
+def _record_query(execute, sql, params, many, context):
+    alias = context['connection'].alias
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        db_queries.inc(alias)
+        db_query_seconds.inc(alias, value=time.perf_counter() - started)
+
+
+def instrument_connection(sender, connection, **kwargs):
+    """Обработчик connection_created: учёт соединения и его запросов."""
+    db_connections_opened.inc(connection.alias)
+    with _connections_lock:
+        _connections.add(connection)
+    # Обёртка у объекта соединения остаётся и после переподключения.
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def view_labels(request):
+    """Имя представления и действие DRF для меток запроса."""
+    match = request.resolver_match
+    if match is None:
+        # Ответ из кэша страниц отдан до разбора адреса.
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return 'unmatched', ''
+    func = match.func
+    view = getattr(func, 'cls', func)
+    actions = getattr(func, 'actions', None) or {}
+    return (getattr(view, '__name__', match.view_name),
+            actions.get(request.method.lower(), ''))
+
+
+def is_metrics_allowed(request):
+    """
+    Метрики видят адреса из METRICS_ALLOWED_IPS, запросы с заголовком
+    `Authorization: Bearer <METRICS_TOKEN>` и сотрудники.
+    """
+    if request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS:
+        return True
+    token = settings.METRICS_TOKEN
+    if token and hmac.compare_digest(
+            request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    user = getattr(request, 'user', None)
+    return bool(user and user.is_staff)
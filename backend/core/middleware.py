@@ -0,0 +1,311 @@
+import gzip
+import hashlib
+import logging
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from . import metrics, page_cache
+from .constants import (COMPRESSION_BROTLI_QUALITY, COMPRESSION_CACHE_SECONDS,
+                        COMPRESSION_GZIP_LEVEL, COMPRESSION_MIN_SIZE,
+                        PAGE_CACHE_POLL_SECONDS, PAGE_CACHE_WAIT_SECONDS,
+                        REPLICA_PIN_SECONDS)
+from .db_router import PIN_CACHE_KEY, replica_reads_var
+from .log import request_id_var
+from .view_counts import VIEWED_RECIPE_ATTR, record_view
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SAFE_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript',
+                      'application/xml')
+COMPRESSED_CACHE_KEY = 'compressed:{encoding}:{digest}'
+
+logger = logging.getLogger('core.request')
+
+REQUEST_ID_MAX_LENGTH = 64
+
+
+class RequestLogMiddleware:
+    """Присваивает запросу идентификатор и логирует время его обработки."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_id = (request.headers.get('X-Request-ID')
+                      or uuid.uuid4().hex)[:REQUEST_ID_MAX_LENGTH]
+        token = request_id_var.set(request_id)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+            response['X-Request-ID'] = request_id
+            logger.info(
+                '%s %s %s', request.method, request.path,
+                response.status_code,
+                extra={
+                    'method': request.method,
+                    'path': request.path,
+                    'status': response.status_code,
+                    'duration_ms': round(
+                        (time.perf_counter() - started) * 1000, 2),
+                }
+            )
+            return response
+        finally:
+            request_id_var.reset(token)
+
+
+class MetricsMiddleware:
+    """Учитывает время и статус ответов для /metrics (core/metrics.py)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        view, action = metrics.view_labels(request)
+        metrics.request_duration.observe(
+            time.perf_counter() - started, view, action, request.method)
+        metrics.requests_total.inc(view, action, str(response.status_code))
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Разрешает чтение с реплик для безопасных запросов.
+
+    Клиент, чей небезопасный запрос завершился успешно, на
+    REPLICA_PIN_SECONDS закрепляется за основной базой, чтобы сразу
+    видеть свои изменения. Клиент
+    определяется по заголовку Authorization, cookie сессии или адресу.
+    Закрепление хранится в кэше по умолчанию, поэтому с DB_REPLICAS он
+    должен быть общим для процессов (проверяется при запуске).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    @staticmethod
+    def client_key(request):
+        client = (request.headers.get('Authorization')
+                  or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+                  or request.META.get('REMOTE_ADDR', ''))
+        return PIN_CACHE_KEY.format(
+            client=hashlib.md5(client.encode()).hexdigest())
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        key = self.client_key(request)
+        if request.method not in SAFE_METHODS:
+            response = self.get_response(request)
+            if response.status_code < 400:
+                cache.set(key, 1, REPLICA_PIN_SECONDS)
+            return response
+        token = replica_reads_var.set(cache.get(key) is None)
+        try:
+            return self.get_response(request)
+        finally:
+            replica_reads_var.reset(token)
+
+
+def _compress_gzip(body):
+    # mtime=0 делает результат одинаковым для одинакового тела.
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def _compress_brotli(body):
+    return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+
+
+# В порядке предпочтения; brotli — только если пакет установлен.
+COMPRESSORS = {'gzip': _compress_gzip}
+if brotli is not None:
+    COMPRESSORS = {'br': _compress_brotli, **COMPRESSORS}
+
+
+def choose_encoding(accept_encoding):
+    """Лучшее доступное сжатие из заголовка Accept-Encoding или None."""
+    weights = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name.strip().lower()] = quality
+    default = weights.get('*', 0.0)
+    candidates = [(weights.get(name, default), -index, name)
+                  for index, name in enumerate(COMPRESSORS)]
+    quality, _, name = max(candidates)
+    return name if quality > 0 else None
+
+
+class CompressionMiddleware:
+    """
+    Сжимает ответы gzip или brotli по заголовку Accept-Encoding.
+
+    Ответы меньше COMPRESSION_MIN_SIZE байт, потоковые и уже сжатые не
+    трогаются. Сжатые тела ответов анонимным пользователям хранятся в
+    кэше по хэшу исходного тела, поэтому одинаковые страницы каталога
+    сжимаются один раз, а не на каждый запрос.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        content_type = response.get('Content-Type', '')
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < COMPRESSION_MIN_SIZE:
+            return response
+        encoding = choose_encoding(
+            request.headers.get('Accept-Encoding', ''))
+        if encoding is None:
+            return response
+        if self.is_shared(request, response):
+            compressed = self.cached_compress(response.content, encoding)
+        else:
+            compressed = COMPRESSORS[encoding](response.content)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            # Тело изменилось, байтовое совпадение больше не гарантируется.
+            response['ETag'] = f'W/{etag}'
+        return response
+
+    @staticmethod
+    def is_shared(request, response):
+        """Одинаков ли ответ для всех анонимных клиентов."""
+        return (request.method == 'GET'
+                and response.status_code == 200
+                and 'Authorization' not in request.headers
+                and settings.SESSION_COOKIE_NAME not in request.COOKIES
+                and not response.cookies
+                and 'private' not in response.get('Cache-Control', '')
+                and 'no-store' not in response.get('Cache-Control', ''))
+
+    @staticmethod
+    def cached_compress(body, encoding):
+        key = COMPRESSED_CACHE_KEY.format(
+            encoding=encoding, digest=hashlib.sha1(body).hexdigest())
+        compressed = cache.get(key)
+        if compressed is None:
+            metrics.cache_requests.inc('compression', 'miss')
+            compressed = COMPRESSORS[encoding](body)
+            cache.set(key, compressed, COMPRESSION_CACHE_SECONDS)
+        else:
+            metrics.cache_requests.inc('compression', 'hit')
+        return compressed
+
+
+class PageCacheMiddleware:
+    """
+    Отдаёт анонимным пользователям сохранённые ответы без обращения к базе.
+
+    Кэшируются только GET-запросы без Authorization и cookie сессии и
+    только ответы, которым представление назначило теги через
+    core.page_cache.set_cache_tags. Ответ устаревает через
+    PAGE_CACHE_SECONDS или при изменении данных любого из его тегов.
+    Устаревший ответ пересобирает один запрос, остальные тем временем
+    получают старую версию; если старой нет, они недолго ждут новую.
+    """
+
+    CACHEABLE_STATUSES = frozenset({200, 301, 302})
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        cache = page_cache.get_page_cache()
+        if cache is None or not self.is_anonymous_read(request):
+            return self.get_response(request)
+        digest = page_cache.page_digest(request)
+        entry = page_cache.load_entry(cache, digest)
+        if entry == page_cache.BYPASS:
+            metrics.cache_requests.inc('page', 'bypass')
+            return self.get_response(request)
+        if entry is not None and entry.is_fresh(cache):
+            return self.build_response(entry, 'HIT')
+        locked = page_cache.acquire_lock(cache, digest)
+        if not locked:
+            if entry is not None:
+                return self.build_response(entry, 'STALE')
+            entry = self.wait_for_entry(cache, digest)
+            if entry is not None and entry != page_cache.BYPASS:
+                return self.build_response(entry, 'HIT')
+        try:
+            started_ns = time.time_ns()
+            response = self.get_response(request)
+            tags = getattr(response, page_cache.CACHE_TAGS_ATTR, None)
+            if tags is not None and self.is_cacheable(response):
+                page_cache.store_entry(cache, digest, page_cache.PageEntry(
+                    response.status_code,
+                    [(name, value) for name, value in response.items()],
+                    response.content, tags, started_ns,
+                    getattr(response, VIEWED_RECIPE_ATTR, None)))
+                response['X-Page-Cache'] = 'MISS'
+                metrics.cache_requests.inc('page', 'miss')
+            else:
+                page_cache.store_entry(cache, digest, page_cache.BYPASS)
+            return response
+        finally:
+            if locked:
+                page_cache.release_lock(cache, digest)
+
+    @staticmethod
+    def is_anonymous_read(request):
+        return (request.method == 'GET'
+                and 'Authorization' not in request.headers
+                and settings.SESSION_COOKIE_NAME not in request.COOKIES)
+
+    def is_cacheable(self, response):
+        cache_control = response.get('Cache-Control', '')
+        return (not response.streaming
+                and response.status_code in self.CACHEABLE_STATUSES
+                and not response.cookies
+                and 'private' not in cache_control
+                and 'no-store' not in cache_control)
+
+    @staticmethod
+    def wait_for_entry(cache, digest):
+        deadline = time.monotonic() + PAGE_CACHE_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(PAGE_CACHE_POLL_SECONDS)
+            entry = page_cache.load_entry(cache, digest)
+            if entry is not None:
+                return entry
+            if not page_cache.is_locked(cache, digest):
+                break
+        return None
+
+    @staticmethod
+    def build_response(entry, state):
+        if entry.viewed_recipe_id is not None:
+            record_view(entry.viewed_recipe_id)
+        response = HttpResponse(entry.content, status=entry.status,
+                                headers=dict(entry.headers))
+        response['X-Page-Cache'] = state
+        metrics.cache_requests.inc('page', state.lower())
+        return response
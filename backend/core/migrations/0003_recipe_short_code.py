@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 08:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_alter_favorite_recipe_alter_favorite_user_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='short_code',
+            field=models.CharField(blank=True, editable=False, max_length=7, null=True, unique=True, verbose_name='Короткий код'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-19 08:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_recipe_trending_score'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(db_index=True, upload_to='recipes/images/', verbose_name='Изображение'),
+        ),
+        migrations.AlterField(
+            model_name='siteuser',
+            name='avatar',
+            field=models.ImageField(blank=True, db_index=True, null=True, upload_to='avatar/icons/', verbose_name='Аватарка'),
+        ),
+    ]
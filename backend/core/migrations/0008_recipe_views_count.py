@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 09:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_media_file_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='views_count',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name='Просмотры'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-19 09:11
+
+import core.models
+import django.contrib.auth.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_recipe_views_count'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='siteuser',
+            managers=[
+                ('objects', core.models.SiteUserManager()),
+                ('all_objects', django.contrib.auth.models.UserManager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='is_deleted',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Удалён'),
+        ),
+        migrations.AddField(
+            model_name='siteuser',
+            name='is_deleted',
+            field=models.BooleanField(default=False, editable=False, help_text='Данные пользователя удаляются в фоне.', verbose_name='Удалён'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2 on 2026-10-19 09:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_soft_delete'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSignature',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='core.recipe', verbose_name='Рецепт')),
+                ('minhash', models.BinaryField(verbose_name='Подпись')),
+            ],
+            options={
+                'verbose_name': 'Подпись рецепта',
+                'verbose_name_plural': 'Подписи рецептов',
+            },
+        ),
+        migrations.CreateModel(
+            name='RecipeSignatureBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField(verbose_name='Полоса')),
+                ('bucket', models.BigIntegerField(verbose_name='Хэш полосы')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='signature_bands', to='core.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Полоса подписи рецепта',
+                'verbose_name_plural': 'Полосы подписей рецептов',
+                'indexes': [models.Index(fields=['band', 'bucket'], name='signature_band_bucket_idx')],
+                'constraints': [models.UniqueConstraint(fields=('recipe', 'band'), name='unique_recipe_signature_band')],
+            },
+        ),
+    ]
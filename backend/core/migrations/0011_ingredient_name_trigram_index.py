@@ -0,0 +1,31 @@
+from django.db import migrations
+
+INDEX_NAME = 'ingredient_name_trgm_idx'
+
+
+def create_trigram_index(apps, schema_editor):
+    # На других СУБД поиск с опечатками идёт по индексу в памяти
+    # (core/ingredient_search.py).
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON core_ingredient '
+        f'USING gin (UPPER(name) gin_trgm_ops)')
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_recipe_signature'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-19 09:43
+
+import django.contrib.auth.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_ingredient_name_trigram_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='siteuser',
+            name='username',
+            field=models.CharField(max_length=150, unique=True, validators=[django.contrib.auth.validators.UnicodeUsernameValidator()], verbose_name='Никнейм'),
+        ),
+    ]
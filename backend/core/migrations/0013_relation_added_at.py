@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-19 09:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_alter_siteuser_username'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='favorite',
+            name='added_at',
+            field=models.DateTimeField(auto_now_add=True, null=True, verbose_name='Дата добавления'),
+        ),
+        migrations.AddField(
+            model_name='shopcart',
+            name='added_at',
+            field=models.DateTimeField(auto_now_add=True, null=True, verbose_name='Дата добавления'),
+        ),
+    ]
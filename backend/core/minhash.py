@@ -0,0 +1,176 @@
+"""
+Поиск почти одинаковых рецептов по MinHash-подписям.
+
+Признаки рецепта — его ингредиенты и триграммы названия. Доля
+совпавших значений двух подписей оценивает коэффициент Жаккара их
+множеств признаков, а полосы подписи (LSH) хранятся с индексом:
+кандидаты находятся поиском по индексу, а не сравнением со всеми
+рецептами.
+"""
+import zlib
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+
+from .constants import (MINHASH_BANDS, MINHASH_BATCH_SIZE, MINHASH_NUM_PERM,
+                        MINHASH_SEED, MINHASH_SHINGLE_SIZE,
+                        NEAR_DUPLICATE_LIMIT, NEAR_DUPLICATE_THRESHOLD)
+from .models import (Recipe, RecipeIngredient, RecipeSignature,
+                     RecipeSignatureBand)
+
+# Простое число Мерсенна: произведение a * x не выходит за 64 бита.
+PRIME = 2**31 - 1
+
+_random = np.random.default_rng(MINHASH_SEED)
+_A = _random.integers(1, PRIME, MINHASH_NUM_PERM, dtype=np.uint64)
+_B = _random.integers(0, PRIME, MINHASH_NUM_PERM, dtype=np.uint64)
+_BAND_WEIGHTS = _random.integers(
+    1, 2**63, MINHASH_NUM_PERM // MINHASH_BANDS, dtype=np.uint64) | 1
+
+_PAIR_DTYPE = [('row', np.int64), ('feature', np.int64)]
+
+
+def _shingle_hashes(name, size=MINHASH_SHINGLE_SIZE):
+    text = ' '.join(name.lower().split())
+    shingles = {text[i:i + size]
+                for i in range(max(len(text) - size, 0) + 1)}
+    # Совпадение хэша триграммы с id ингредиента возможно, но на оценку
+    # сходства почти не влияет.
+    return [zlib.crc32(shingle.encode()) for shingle in shingles]
+
+
+def minhash(rows, features, n_rows):
+    """
+    Подписи (n_rows, MINHASH_NUM_PERM) по парам (строка, признак).
+
+    Каждая из MINHASH_NUM_PERM хэш-функций (a * x + b) mod PRIME
+    считается сразу для всех признаков, минимум по строке — через
+    reduceat по отсортированным строкам.
+    """
+    signatures = np.full((n_rows, MINHASH_NUM_PERM), PRIME, dtype=np.uint32)
+    if not rows.size:
+        return signatures
+    order = np.argsort(rows, kind='stable')
+    rows = rows[order]
+    values = np.outer(features[order].astype(np.uint64) % PRIME, _A)
+    values = (values + _B) % PRIME
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    signatures[rows[starts]] = np.minimum.reduceat(values, starts, axis=0)
+    return signatures
+
+
+def band_buckets(signatures):
+    """Хэш каждой из MINHASH_BANDS полос подписи как int64."""
+    bands = signatures.astype(np.uint64).reshape(
+        len(signatures), MINHASH_BANDS, -1)
+    # Переполнение uint64 здесь ожидаемо: это умножение по модулю 2**64.
+    return (bands * _BAND_WEIGHTS).sum(axis=2).view(np.int64)
+
+
+def compute_signatures(recipe_ids):
+    """Подписи рецептов из упорядоченного массива recipe_ids."""
+    ids = recipe_ids.tolist()
+    pairs = np.fromiter(
+        RecipeIngredient.objects.filter(recipe_id__in=ids).order_by()
+        .values_list('recipe_id', 'ingredient_id').iterator(),
+        dtype=_PAIR_DTYPE)
+    rows = [np.searchsorted(recipe_ids, pairs['row'])]
+    features = [pairs['feature']]
+    for recipe_id, name in Recipe.all_objects.filter(
+            pk__in=ids).order_by().values_list('pk', 'name').iterator():
+        hashes = _shingle_hashes(name)
+        rows.append(np.full(len(hashes), np.searchsorted(
+            recipe_ids, recipe_id), dtype=np.int64))
+        features.append(np.array(hashes, dtype=np.int64))
+    return minhash(np.concatenate(rows), np.concatenate(features),
+                   recipe_ids.size)
+
+
+def update_signatures(recipe_ids):
+    """Пересчитывает и сохраняет подписи; возвращает их по порядку id."""
+    recipe_ids = np.unique(np.asarray(recipe_ids, dtype=np.int64))
+    signatures = compute_signatures(recipe_ids)
+    buckets = band_buckets(signatures)
+    ids = recipe_ids.tolist()
+    with transaction.atomic():
+        RecipeSignature.objects.bulk_create(
+            [RecipeSignature(recipe_id=recipe_id,
+                             minhash=signature.astype('<u4').tobytes())
+             for recipe_id, signature in zip(ids, signatures)],
+            update_conflicts=True, unique_fields=['recipe'],
+            update_fields=['minhash'])
+        RecipeSignatureBand.objects.bulk_create(
+            [RecipeSignatureBand(recipe_id=recipe_id, band=band,
+                                 bucket=bucket)
+             for recipe_id, row in zip(ids, buckets.tolist())
+             for band, bucket in enumerate(row)],
+            update_conflicts=True, unique_fields=['recipe', 'band'],
+            update_fields=['bucket'])
+    return signatures
+
+
+def build_signatures(batch_size=MINHASH_BATCH_SIZE, progress=None,
+                     missing_only=False):
+    """
+    Пересчитывает подписи рецептов пачками; возвращает их число.
+
+    С missing_only — только рецептов без подписи, например загруженных
+    через bulk_create, который не отправляет сигналы.
+    """
+    recipes = Recipe.objects.order_by('pk')
+    if missing_only:
+        recipes = recipes.filter(signature__isnull=True)
+    recipe_ids = np.fromiter(
+        recipes.values_list('pk', flat=True).iterator(chunk_size=10000),
+        dtype=np.int64)
+    for start in range(0, recipe_ids.size, batch_size):
+        update_signatures(recipe_ids[start:start + batch_size])
+        if progress:
+            progress(min(start + batch_size, recipe_ids.size),
+                     recipe_ids.size)
+    return recipe_ids.size
+
+
+def near_duplicates(recipe_id, signature=None,
+                    threshold=NEAR_DUPLICATE_THRESHOLD,
+                    limit=NEAR_DUPLICATE_LIMIT):
+    """
+    Почти одинаковые рецепты: список (id, сходство) по убыванию.
+
+    Кандидаты — рецепты, у которых совпала хотя бы одна полоса; сходство
+    затем оценивается по полным подписям.
+    """
+    if signature is None:
+        stored = RecipeSignature.objects.filter(
+            recipe_id=recipe_id).values_list('minhash', flat=True).first()
+        if stored is None:
+            return []
+        signature = np.frombuffer(stored, dtype='<u4')
+    condition = Q()
+    for band, bucket in enumerate(band_buckets(signature[None])[0].tolist()):
+        condition |= Q(band=band, bucket=bucket)
+    candidates = RecipeSignatureBand.objects.filter(condition).exclude(
+        recipe_id=recipe_id).values('recipe_id')
+    rows = list(RecipeSignature.objects.filter(
+        recipe_id__in=candidates, recipe__is_deleted=False
+    ).values_list('recipe_id', 'minhash'))
+    if not rows:
+        return []
+    ids = np.array([row[0] for row in rows])
+    others = np.frombuffer(b''.join(row[1] for row in rows),
+                           dtype='<u4').reshape(len(rows), -1)
+    similarity = (others == signature).mean(axis=1)
+    order = np.argsort(-similarity, kind='stable')
+    order = order[similarity[order] >= threshold][:limit]
+    return list(zip(ids[order].tolist(), similarity[order].tolist()))
+
+
+def has_duplicate_candidates():
+    """Условие для рецептов, у которых есть кандидат в дубликаты."""
+    shared = RecipeSignatureBand.objects.filter(
+        band=OuterRef('band'), bucket=OuterRef('bucket'),
+        recipe__is_deleted=False,
+    ).exclude(recipe_id=OuterRef('recipe_id'))
+    return Exists(RecipeSignatureBand.objects.filter(
+        recipe_id=OuterRef('pk')).filter(Exists(shared)))
@@ -1,5 +1,5 @@
 from django.contrib.auth import get_user_model
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.core.validators import MinValueValidator
 from django.db import models
 
@@ -7,12 +7,28 @@ from .constants import (AVATAR_UPLOAD_PATH,
                         INGREDIENT_MEASUREMENT_UNIT_MAX_LENGTH,
                         INGREDIENT_NAME_MAX_LENGTH,
                         RECIPE_COOKING_TIME_MIN_VALUE,
-                        RECIPE_IMAGE_UPLOAD_PATH,
+                        RECIPE_FRONTEND_URL, RECIPE_IMAGE_UPLOAD_PATH,
                         RECIPE_INGREDIENT_AMOUNT_MIN_VALUE,
-                        RECIPE_NAME_MAX_LENGTH, USER_EMAIL_MAX_LENGTH,
-                        USER_FIRST_NAME_MAX_LENGTH, USER_LAST_NAME_MAX_LENGTH,
-                        USER_USERNAME_MAX_LENGTH)
+                        RECIPE_NAME_MAX_LENGTH, RECIPE_SHORT_CODE_LENGTH,
+                        USER_EMAIL_MAX_LENGTH, USER_FIRST_NAME_MAX_LENGTH,
+                        USER_LAST_NAME_MAX_LENGTH, USER_USERNAME_MAX_LENGTH)
 from django.contrib.auth.validators import UnicodeUsernameValidator
+from .short_codes import generate_short_code
+
+
+class NotDeletedMixin:
+    """Скрывает записи, помеченные на удаление (см. core/deletion.py)."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
+class SiteUserManager(NotDeletedMixin, UserManager):
+    pass
+
+
+class RecipeManager(NotDeletedMixin, models.Manager):
+    pass
 
 
 class SiteUser(AbstractUser):
@@ -22,6 +38,7 @@ class SiteUser(AbstractUser):
         upload_to=AVATAR_UPLOAD_PATH,
         blank=True,
         null=True,
+        db_index=True,
         verbose_name='Аватарка',
     )
     email = models.EmailField(
@@ -43,6 +60,21 @@ class SiteUser(AbstractUser):
         max_length=USER_LAST_NAME_MAX_LENGTH,
         verbose_name='Фамилия',
     )
+    is_popular = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Лента строится при чтении',
+        help_text='Рецепты автора не рассылаются подписчикам при публикации.',
+    )
+    is_deleted = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Удалён',
+        help_text='Данные пользователя удаляются в фоне.',
+    )
+
+    objects = SiteUserManager()
+    all_objects = UserManager()
 
     class Meta:
         verbose_name = 'Пользователь'
@@ -97,6 +129,7 @@ class Recipe(models.Model):
     )
     image = models.ImageField(
         upload_to=RECIPE_IMAGE_UPLOAD_PATH,
+        db_index=True,
         verbose_name='Изображение',
     )
     text = models.TextField(
@@ -110,17 +143,55 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации',
     )
+    short_code = models.CharField(
+        max_length=RECIPE_SHORT_CODE_LENGTH,
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Короткий код',
+    )
+    trending_score = models.FloatField(
+        default=0,
+        editable=False,
+        verbose_name='Популярность',
+    )
+    views_count = models.PositiveBigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Просмотры',
+    )
+    is_deleted = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Удалён',
+    )
+
+    objects = RecipeManager()
+    all_objects = models.Manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['-trending_score', '-pub_date'],
+                         name='recipe_trending_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if not self.short_code and not kwargs.get('update_fields'):
+            self.short_code = generate_short_code()
+            while Recipe.all_objects.filter(
+                    short_code=self.short_code).exists():
+                self.short_code = generate_short_code()
+        super().save(*args, **kwargs)
+
     def get_absolute_url(self):
-        return f'/recipes/{self.pk}'
+        return RECIPE_FRONTEND_URL.format(pk=self.pk)
 
 
 class BaseUserRecipeRelation(models.Model):
@@ -134,6 +205,13 @@ class BaseUserRecipeRelation(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Рецепт',
     )
+    # Нужна, чтобы при отмене вычесть из популярности затухший вклад.
+    # У записей, созданных до появления поля, пусто.
+    added_at = models.DateTimeField(
+        auto_now_add=True,
+        null=True,
+        verbose_name='Дата добавления',
+    )
 
     class Meta:
         abstract = True
@@ -235,3 +313,140 @@ class RecipeIngredient(models.Model):
 
     def __str__(self):
         return f'{self.amount} {self.ingredient} в {self.recipe.name}'
+
+
+class SimilarRecipe(models.Model):
+    """Заранее рассчитанный похожий рецепт (см. core/similarity.py)."""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_recipes',
+        verbose_name='Рецепт',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_for',
+        verbose_name='Похожий рецепт',
+    )
+    score = models.FloatField(
+        verbose_name='Сходство',
+    )
+    rank = models.PositiveSmallIntegerField(
+        verbose_name='Место',
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'rank'],
+                name='unique_similar_recipe_rank',
+            ),
+        ]
+        ordering = ['recipe', 'rank']
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+
+    def __str__(self):
+        return f'{self.recipe_id} ~ {self.similar_id}'
+
+
+class RecipeSignature(models.Model):
+    """MinHash-подпись рецепта для поиска дубликатов (core/minhash.py)."""
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='signature',
+        verbose_name='Рецепт',
+    )
+    minhash = models.BinaryField(
+        verbose_name='Подпись',
+    )
+
+    class Meta:
+        verbose_name = 'Подпись рецепта'
+        verbose_name_plural = 'Подписи рецептов'
+
+    def __str__(self):
+        return str(self.recipe_id)
+
+
+class RecipeSignatureBand(models.Model):
+    """Хэш полосы MinHash-подписи: индекс LSH для поиска кандидатов."""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='signature_bands',
+        verbose_name='Рецепт',
+    )
+    band = models.PositiveSmallIntegerField(
+        verbose_name='Полоса',
+    )
+    bucket = models.BigIntegerField(
+        verbose_name='Хэш полосы',
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'band'],
+                name='unique_recipe_signature_band',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['band', 'bucket'],
+                name='signature_band_bucket_idx',
+            ),
+        ]
+        verbose_name = 'Полоса подписи рецепта'
+        verbose_name_plural = 'Полосы подписей рецептов'
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.band}'
+
+
+class FeedEntry(models.Model):
+    """Рецепт автора, на которого подписан пользователь, в его ленте."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пользователь',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации',
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_entry',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date'],
+                name='feed_user_pub_date_idx',
+            ),
+        ]
+        ordering = ['-pub_date']
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи лент'
+
+    def __str__(self):
+        return f'{self.user_id} <- {self.recipe_id}'
@@ -0,0 +1,215 @@
+"""Потоковый экспорт и импорт данных в формате NDJSON."""
+import datetime
+import gzip
+import json
+import os
+from contextlib import contextmanager, suppress
+
+from django.apps import apps
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, connection, transaction
+
+# Порядок важен: модель идёт после всех, на которые ссылается.
+EXPORT_MODELS = (
+    'core.siteuser',
+    'core.ingredient',
+    'core.recipe',
+    'core.recipeingredient',
+    'core.favorite',
+    'core.shopcart',
+    'core.subscription',
+)
+
+
+class _Encoder(DjangoJSONEncoder):
+    """Сохраняет микросекунды, которые DjangoJSONEncoder отбрасывает."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _columns(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def _read_checkpoint(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def _write_checkpoint(path, state):
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w') as file:
+        json.dump(state, file)
+    os.replace(temp_path, path)
+
+
+def export_ndjson(path, compress=False, chunk_size=2000, progress=None):
+    """
+    Пишет все строки EXPORT_MODELS в `path`, по одной JSON-строке на запись.
+
+    Данные пишутся в `path.part`, после каждой пачки сохраняется
+    контрольная точка, поэтому прерванный экспорт продолжается с неё.
+    При сжатии каждая пачка — отдельный член gzip: файл читается
+    обычным gzip, а недописанный хвост просто отрезается.
+    """
+    part_path = f'{path}.part'
+    checkpoint_path = f'{path}.checkpoint'
+    state = _read_checkpoint(checkpoint_path)
+    if state is None or not os.path.exists(part_path):
+        state = {'model': 0, 'last_pk': None, 'offset': 0}
+    encode = gzip.compress if compress else (lambda data: data)
+    total = 0
+    with open(part_path, 'r+b' if state['offset'] else 'wb') as file:
+        file.seek(state['offset'])
+        file.truncate()
+        for index in range(state['model'], len(EXPORT_MODELS)):
+            label = EXPORT_MODELS[index]
+            model = apps.get_model(label)
+            queryset = model._base_manager.order_by('pk')
+            if index == state['model'] and state['last_pk'] is not None:
+                queryset = queryset.filter(pk__gt=state['last_pk'])
+            lines = []
+            last_pk = None
+            rows = queryset.values(*_columns(model)).iterator(
+                chunk_size=chunk_size)
+            for row in rows:
+                lines.append(json.dumps({'model': label, 'fields': row},
+                                        cls=_Encoder,
+                                        ensure_ascii=False))
+                last_pk = row[model._meta.pk.attname]
+                if len(lines) >= chunk_size:
+                    total += _flush_lines(file, lines, encode)
+                    _write_checkpoint(checkpoint_path, {
+                        'model': index, 'last_pk': last_pk,
+                        'offset': file.tell()})
+                    if progress:
+                        progress(label, total)
+            total += _flush_lines(file, lines, encode)
+            _write_checkpoint(checkpoint_path, {
+                'model': index + 1, 'last_pk': None, 'offset': file.tell()})
+            if progress:
+                progress(label, total)
+    os.replace(part_path, path)
+    os.remove(checkpoint_path)
+    return total
+
+
+def _flush_lines(file, lines, encode):
+    if not lines:
+        return 0
+    file.write(encode(''.join(f'{line}\n' for line in lines).encode()))
+    file.flush()
+    os.fsync(file.fileno())
+    count = len(lines)
+    lines.clear()
+    return count
+
+
+@contextmanager
+def _keep_auto_now(models):
+    """Отключает auto_now/auto_now_add, чтобы сохранить даты из файла."""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _open_lines(path):
+    with open(path, 'rb') as file:
+        compressed = file.read(2) == b'\x1f\x8b'
+    opener = gzip.open if compressed else open
+    return opener(path, 'rt', encoding='utf-8')
+
+
+def import_ndjson(path, chunk_size=2000, progress=None, on_conflict=None):
+    """
+    Загружает файл из export_ndjson пачками bulk_create с сохранением pk.
+
+    После каждой пачки номер строки сохраняется в `path.checkpoint`;
+    повторный запуск пропускает уже загруженные строки, а строки с уже
+    существующими pk пропускаются. Строки, нарушающие другие
+    ограничения уникальности, не загружаются и передаются в
+    `on_conflict(label, pk, error)`. Возвращает словарь с числом
+    вставленных (inserted), уже существовавших (existing) и
+    конфликтующих (conflicts) записей.
+    """
+    checkpoint_path = f'{path}.checkpoint'
+    done = (_read_checkpoint(checkpoint_path) or {}).get('line', 0)
+    models = [apps.get_model(label) for label in EXPORT_MODELS]
+    buffer = []
+    buffer_model = None
+    counts = {'inserted': 0, 'existing': 0, 'conflicts': 0}
+
+    def flush(line_number):
+        manager = buffer_model._base_manager
+        with transaction.atomic():
+            existing = set(manager.filter(pk__in=[
+                obj.pk for obj in buffer]).values_list('pk', flat=True))
+            new = [obj for obj in buffer if obj.pk not in existing]
+            counts['existing'] += len(buffer) - len(new)
+            try:
+                with transaction.atomic():
+                    manager.bulk_create(new)
+                counts['inserted'] += len(new)
+            except IntegrityError:
+                # Пачку целиком вставить нельзя: ищем виноватые строки
+                # по одной, каждую в своей точке сохранения.
+                for obj in new:
+                    try:
+                        with transaction.atomic():
+                            manager.bulk_create([obj])
+                        counts['inserted'] += 1
+                    except IntegrityError as error:
+                        counts['conflicts'] += 1
+                        if on_conflict:
+                            on_conflict(buffer_model._meta.label_lower,
+                                        obj.pk, error)
+        _write_checkpoint(checkpoint_path, {'line': line_number})
+        buffer.clear()
+        if progress:
+            progress(buffer_model._meta.label_lower, line_number)
+
+    with _keep_auto_now(models), _open_lines(path) as lines:
+        for line_number, line in enumerate(lines, 1):
+            if line_number <= done or not line.strip():
+                continue
+            record = json.loads(line)
+            model = apps.get_model(record['model'])
+            if model is not buffer_model and buffer:
+                # Следующая модель ссылается на предыдущую, поэтому
+                # та должна быть записана целиком.
+                flush(line_number - 1)
+            buffer_model = model
+            buffer.append(model(**record['fields']))
+            if len(buffer) >= chunk_size:
+                flush(line_number)
+        if buffer:
+            flush(line_number)
+    _reset_sequences(models)
+    with suppress(FileNotFoundError):
+        os.remove(checkpoint_path)
+    return counts
+
+
+def _reset_sequences(models):
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
@@ -0,0 +1,129 @@
+"""Кэш целых ответов анонимным пользователям с инвалидацией по тегам."""
+import hashlib
+import time
+from urllib.parse import parse_qsl, urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .constants import (PAGE_CACHE_LOCK_SECONDS, PAGE_CACHE_SECONDS,
+                        PAGE_CACHE_STALE_SECONDS)
+
+PAGE_KEY = 'page:{digest}'
+LOCK_KEY = 'page-lock:{digest}'
+TAG_KEY = 'page-tag:{tag}'
+CACHE_TAGS_ATTR = 'page_cache_tags'
+# Хранится вместо ответа, который кэшировать нельзя, чтобы следующие
+# запросы по тому же адресу не ждали друг друга.
+BYPASS = 'bypass'
+
+RECIPES_TAG = 'recipes'
+INGREDIENTS_TAG = 'ingredients'
+TRENDING_TAG = 'trending'
+
+
+def recipe_tag(recipe_id):
+    return f'recipe:{recipe_id}'
+
+
+def user_tag(user_id):
+    return f'user:{user_id}'
+
+
+def get_page_cache():
+    """Кэш страниц или None, если PAGE_CACHE не задан."""
+    alias = settings.PAGE_CACHE
+    return caches[alias] if alias else None
+
+
+def set_cache_tags(response, *tags):
+    """Разрешает кэшировать ответ и перечисляет, от чего он зависит."""
+    setattr(response, CACHE_TAGS_ATTR, frozenset(tags))
+    return response
+
+
+def invalidate_tags(*tags):
+    """
+    Помечает устаревшими все ответы с любым из тегов.
+
+    Тег хранит время последнего изменения, поэтому ответ, который
+    начали строить до изменения, не будет сохранён как свежий. Внутри
+    транзакции отметка ставится после фиксации: иначе ответ, собранный
+    до неё из старых данных, выглядел бы новее изменения.
+    """
+    cache = get_page_cache()
+    if cache is None or not tags:
+        return
+    transaction.on_commit(lambda: cache.set_many(
+        {TAG_KEY.format(tag=tag): time.time_ns() for tag in tags}, None))
+
+
+def page_digest(request):
+    """Хэш нормализованных пути и параметров, языка и заголовка Accept."""
+    query = urlencode(sorted(parse_qsl(
+        request.META.get('QUERY_STRING', ''), keep_blank_values=True)))
+    # От Accept зависит формат ответа DRF: JSON или HTML-страница API.
+    accept = request.headers.get('Accept', '')
+    language = getattr(request, 'LANGUAGE_CODE', '')
+    return hashlib.sha1(
+        f'{request.path}?{query}#{language}#{accept}'.encode()).hexdigest()
+
+
+class PageEntry:
+    """Сохранённый ответ и момент, когда его начали строить."""
+
+    def __init__(self, status, headers, content, tags, started_ns,
+                 viewed_recipe_id=None):
+        self.status = status
+        self.headers = headers
+        self.content = content
+        self.tags = tags
+        self.started_ns = started_ns
+        # Просмотр рецепта, который засчитывается при каждой выдаче.
+        self.viewed_recipe_id = viewed_recipe_id
+
+    def is_fresh(self, cache):
+        """Не истёк ли срок и не менялись ли данные после сборки ответа."""
+        if time.time_ns() - self.started_ns > PAGE_CACHE_SECONDS * 10**9:
+            return False
+        keys = [TAG_KEY.format(tag=tag) for tag in self.tags]
+        changed = cache.get_many(keys)
+        missing = [key for key in keys if key not in changed]
+        if missing:
+            # Отметка вытеснена из кэша: время изменения неизвестно.
+            # Ответы, начатые после этой точки, снова будут свежими.
+            now = time.time_ns()
+            for key in missing:
+                cache.add(key, now, None)
+            return False
+        return all(value < self.started_ns for value in changed.values())
+
+
+def load_entry(cache, digest):
+    return cache.get(PAGE_KEY.format(digest=digest))
+
+
+def store_entry(cache, digest, entry):
+    if entry == BYPASS:
+        cache.set(PAGE_KEY.format(digest=digest), entry, PAGE_CACHE_SECONDS)
+        return
+    # Теги, которые ещё ни разу не менялись.
+    for tag in entry.tags:
+        cache.add(TAG_KEY.format(tag=tag), 0, None)
+    cache.set(PAGE_KEY.format(digest=digest), entry,
+              PAGE_CACHE_SECONDS + PAGE_CACHE_STALE_SECONDS)
+
+
+def acquire_lock(cache, digest):
+    """Только один запрос пересобирает ответ, остальные получают старый."""
+    return cache.add(LOCK_KEY.format(digest=digest), 1,
+                     PAGE_CACHE_LOCK_SECONDS)
+
+
+def release_lock(cache, digest):
+    cache.delete(LOCK_KEY.format(digest=digest))
+
+
+def is_locked(cache, digest):
+    return LOCK_KEY.format(digest=digest) in cache
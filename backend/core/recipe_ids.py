@@ -0,0 +1,125 @@
+"""Кэш идентификаторов существующих рецептов для коротких ссылок."""
+import threading
+import time
+
+from . import metrics
+from .constants import RECIPE_ID_SET_TTL
+from .models import Recipe
+from .tasks import enqueue
+
+
+class RecipeIdSet:
+    """
+    Битовая карта идентификаторов рецептов, хранящаяся в памяти процесса.
+
+    Карта загружается из базы при первом обращении и поддерживается
+    сигналами сохранения и удаления `Recipe`. Рецепты, созданные
+    в других процессах, сюда сразу не попадают, поэтому при промахе
+    вызывающий код сверяется с базой и добавляет найденный id через `add`.
+    Удаления в других процессах карта видит после перестроения: его
+    запускает фоновой задачей истечение RECIPE_ID_SET_TTL секунд, а поиск
+    тем временем идёт по старой карте.
+    """
+
+    def __init__(self, ttl=RECIPE_ID_SET_TTL):
+        self.ttl = ttl
+        self._bits = bytearray()
+        self._loaded = False
+        self._loaded_at = 0
+        self._refresh_pending = False
+        # Изменения, пришедшие во время перестроения; None — его нет.
+        self._changes = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _read():
+        bits = bytearray()
+        for pk in Recipe.objects.order_by().values_list(
+                'pk', flat=True).iterator(chunk_size=10000):
+            _set_bit(bits, pk)
+        return bits
+
+    def _load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            self._bits = self._read()
+            self._loaded, self._loaded_at = True, time.monotonic()
+
+    def rebuild(self):
+        with self._lock:
+            self._refresh_pending = False
+            self._changes = []
+        try:
+            # База читается без блокировки, чтобы не задерживать сигналы;
+            # изменения за это время применяются к новой карте.
+            bits = self._read()
+        except Exception:
+            with self._lock:
+                self._changes = None
+            raise
+        with self._lock:
+            for pk, present in self._changes:
+                (_set_bit if present else _clear_bit)(bits, pk)
+            self._bits, self._changes = bits, None
+            self._loaded_at = time.monotonic()
+
+    def __contains__(self, pk):
+        if not self._loaded:
+            self._load()
+        elif (time.monotonic() - self._loaded_at >= self.ttl
+                and not self._refresh_pending):
+            self._refresh_pending = True
+            enqueue(self.rebuild)
+        bits = self._bits
+        index = pk >> 3
+        return index < len(bits) and bool(bits[index] & (1 << (pk & 7)))
+
+    def add(self, pk):
+        self._change(pk, True)
+
+    def discard(self, pk):
+        self._change(pk, False)
+
+    def _change(self, pk, present):
+        if not self._loaded:
+            return
+        with self._lock:
+            (_set_bit if present else _clear_bit)(self._bits, pk)
+            if self._changes is not None:
+                self._changes.append((pk, present))
+
+    def clear(self):
+        with self._lock:
+            self._bits = bytearray()
+            self._loaded = False
+
+
+def _set_bit(bits, pk):
+    index = pk >> 3
+    if index >= len(bits):
+        bits.extend(bytes(index - len(bits) + 1))
+    bits[index] |= 1 << (pk & 7)
+
+
+def _clear_bit(bits, pk):
+    index = pk >> 3
+    if index < len(bits):
+        bits[index] &= ~(1 << (pk & 7)) & 0xFF
+
+
+live_recipe_ids = RecipeIdSet()
+metrics.Gauge('recipe_id_bitmap_bytes', 'Размер битовой карты id рецептов.',
+              lambda: len(live_recipe_ids._bits))
+
+
+def recipe_exists(pk):
+    """Проверяет существование рецепта, обращаясь к базе только при промахе."""
+    if pk in live_recipe_ids:
+        metrics.cache_requests.inc('recipe_ids', 'hit')
+        return True
+    metrics.cache_requests.inc('recipe_ids', 'miss')
+    if Recipe.objects.filter(pk=pk).exists():
+        live_recipe_ids.add(pk)
+        return True
+    return False
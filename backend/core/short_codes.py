@@ -0,0 +1,44 @@
+"""Короткие коды рецептов для ссылок вида /s/<code>."""
+import secrets
+from functools import lru_cache
+
+from . import metrics
+from .constants import (RECIPE_SHORT_CODE_ALPHABET,
+                        RECIPE_SHORT_CODE_CACHE_SIZE,
+                        RECIPE_SHORT_CODE_LENGTH)
+
+
+def generate_short_code():
+    """
+    Возвращает случайный base62-код.
+
+    Код всегда содержит хотя бы одну букву, чтобы не совпадать
+    со старыми ссылками по числовому id.
+    """
+    while True:
+        code = ''.join(secrets.choice(RECIPE_SHORT_CODE_ALPHABET)
+                       for _ in range(RECIPE_SHORT_CODE_LENGTH))
+        if not code.isdigit():
+            return code
+
+
+@lru_cache(maxsize=RECIPE_SHORT_CODE_CACHE_SIZE)
+def resolve_short_code(code):
+    """
+    Возвращает id рецепта по короткому коду.
+
+    Для неизвестного кода выбрасывает `Recipe.DoesNotExist`:
+    исключения `lru_cache` не кэширует, поэтому промахи не запоминаются.
+    """
+    from .models import Recipe
+
+    return Recipe.objects.values_list('pk', flat=True).get(short_code=code)
+
+
+metrics.Gauge('short_code_cache_entries', 'Коды в кэше коротких ссылок.',
+              lambda: resolve_short_code.cache_info().currsize)
+metrics.CounterFunc(
+    'short_code_cache_requests_total', 'Обращения к кэшу коротких ссылок.',
+    lambda: {('hit',): resolve_short_code.cache_info().hits,
+             ('miss',): resolve_short_code.cache_info().misses},
+    ('result',))
@@ -0,0 +1,117 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .constants import TRENDING_FAVORITE_WEIGHT, TRENDING_SHOPPING_CART_WEIGHT
+from .feed import add_author_to_feed, fan_out_recipe, remove_author_from_feed
+from .ingredient_search import ingredient_index
+from .media import release_file
+from .minhash import update_signatures
+from .metrics import instrument_connection
+from .models import (Favorite, Ingredient, Recipe, ShopCart, SiteUser,
+                     Subscription)
+from .page_cache import (INGREDIENTS_TAG, RECIPES_TAG, invalidate_tags,
+                         recipe_tag, user_tag)
+from .recipe_ids import live_recipe_ids
+from .tasks import enqueue
+from .trending import add_trending_score, decayed_weight
+
+TRENDING_WEIGHTS = {
+    Favorite: TRENDING_FAVORITE_WEIGHT,
+    ShopCart: TRENDING_SHOPPING_CART_WEIGHT,
+}
+FILE_FIELDS = {
+    Recipe: 'image',
+    SiteUser: 'avatar',
+}
+
+connection_created.connect(instrument_connection)
+
+
+@receiver(post_save, sender=Recipe)
+def remember_recipe_id(sender, instance, created, **kwargs):
+    if created:
+        live_recipe_ids.add(instance.pk)
+        enqueue(fan_out_recipe, instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_signature(sender, instance, update_fields=None, **kwargs):
+    # Задача выполнится после фиксации транзакции, когда ингредиенты
+    # рецепта (формы админки, сериализатор) уже сохранены.
+    if update_fields is None or 'name' in update_fields:
+        enqueue(update_signatures, [instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def forget_recipe_id(sender, instance, **kwargs):
+    live_recipe_ids.discard(instance.pk)
+
+
+@receiver(post_save, sender=Subscription)
+def add_subscription_to_feed(sender, instance, created, **kwargs):
+    if created:
+        enqueue(add_author_to_feed, instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def remove_subscription_from_feed(sender, instance, **kwargs):
+    enqueue(remove_author_from_feed, instance.user_id, instance.author_id)
+
+
+@receiver(post_init, sender=Recipe)
+@receiver(post_init, sender=SiteUser)
+def remember_stored_file(sender, instance, **kwargs):
+    value = instance.__dict__.get(FILE_FIELDS[sender])
+    instance._stored_file = getattr(value, 'name', value)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=SiteUser)
+def release_replaced_file(sender, instance, **kwargs):
+    name = getattr(instance, FILE_FIELDS[sender]).name
+    stored = getattr(instance, '_stored_file', None)
+    if stored and stored != name:
+        enqueue(release_file, stored)
+    instance._stored_file = name
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=SiteUser)
+def release_deleted_file(sender, instance, **kwargs):
+    name = getattr(instance, FILE_FIELDS[sender]).name
+    if name:
+        enqueue(release_file, name)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShopCart)
+def raise_trending_score(sender, instance, created, **kwargs):
+    if created:
+        add_trending_score(instance.recipe_id, TRENDING_WEIGHTS[sender])
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShopCart)
+def lower_trending_score(sender, instance, **kwargs):
+    add_trending_score(instance.recipe_id, -decayed_weight(
+        TRENDING_WEIGHTS[sender], instance.added_at))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe_pages(sender, instance, **kwargs):
+    invalidate_tags(recipe_tag(instance.pk), RECIPES_TAG)
+
+
+@receiver(post_save, sender=SiteUser)
+@receiver(post_delete, sender=SiteUser)
+def invalidate_user_pages(sender, instance, **kwargs):
+    invalidate_tags(user_tag(instance.pk))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_pages(sender, instance, **kwargs):
+    invalidate_tags(INGREDIENTS_TAG)
+    ingredient_index.invalidate()
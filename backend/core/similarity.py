@@ -0,0 +1,150 @@
+"""
+Похожие рецепты.
+
+Рецепт описывается двумя разреженными векторами признаков: набором
+ингредиентов (RecipeIngredient) и набором пользователей, добавивших
+его в избранное (Favorite). Сходство — взвешенная сумма косинусных
+мер по обоим векторам с весами TF-IDF. Рецепты обрабатываются блоками,
+так что потребление памяти зависит от размера блока, а не от числа
+рецептов; признаки, встречающиеся у слишком многих рецептов
+(соль, вода), отбрасываются — они почти не влияют на сходство,
+но порождают больше всего пар.
+"""
+import numpy as np
+from django.db import transaction
+
+from .constants import (SIMILAR_RECIPES_CHUNK_SIZE,
+                        SIMILAR_RECIPES_INGREDIENT_WEIGHT,
+                        SIMILAR_RECIPES_MAX_POSTING, SIMILAR_RECIPES_TOP_K)
+from .models import Favorite, Recipe, RecipeIngredient, SimilarRecipe
+
+_PAIR_DTYPE = [('row', np.int64), ('feature', np.int64)]
+
+
+def _compress(keys, values, weights, size):
+    order = np.argsort(keys, kind='stable')
+    pointers = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=size), out=pointers[1:])
+    return pointers, values[order], weights[order]
+
+
+class SparseFeatures:
+    """
+    Разреженная матрица «рецепт × признак» с нормированными строками.
+
+    Хранится сразу по строкам и по столбцам (как CSR и CSC), что
+    позволяет перемножать блок строк со всей матрицей без построения
+    плотных массивов.
+    """
+
+    def __init__(self, rows, features, n_rows, max_posting):
+        n_features = int(features.max()) + 1 if features.size else 0
+        frequency = np.bincount(features, minlength=n_features)
+        keep = frequency[features] <= max_posting
+        rows, features = rows[keep], features[keep]
+        weights = np.log1p(n_rows / frequency[features]).astype(np.float32)
+        norms = np.sqrt(np.bincount(
+            rows, weights=weights ** 2, minlength=n_rows)).astype(np.float32)
+        weights /= norms[rows]
+        self.row_ptr, self.row_features, self.row_weights = _compress(
+            rows, features, weights, n_rows)
+        self.feature_ptr, self.feature_rows, self.feature_weights = (
+            _compress(features, rows, weights, n_features))
+
+    def products(self, start, stop):
+        """
+        Скалярные произведения строк [start, stop) со всеми строками.
+
+        Возвращает ненулевые слагаемые в виде трёх массивов: строка блока,
+        строка-сосед и вклад общего признака.
+        """
+        lo, hi = self.row_ptr[start], self.row_ptr[stop]
+        sources = np.repeat(np.arange(start, stop),
+                            np.diff(self.row_ptr[start:stop + 1]))
+        features = self.row_features[lo:hi]
+        starts = self.feature_ptr[features]
+        counts = self.feature_ptr[features + 1] - starts
+        offsets = (np.arange(counts.sum())
+                   - np.repeat(np.cumsum(counts) - counts, counts)
+                   + np.repeat(starts, counts))
+        values = (np.repeat(self.row_weights[lo:hi], counts)
+                  * self.feature_weights[offsets])
+        return np.repeat(sources, counts), self.feature_rows[offsets], values
+
+
+def top_k_neighbors(matrices, n_rows, top_k, chunk_size):
+    """
+    Для каждого блока строк возвращает по `top_k` ближайших соседей.
+
+    `matrices` — пары (SparseFeatures, вес). Генерирует кортежи
+    (start, stop, строки, соседи, сходство, ранг).
+    """
+    for start in range(0, n_rows, chunk_size):
+        stop = min(start + chunk_size, n_rows)
+        keys, values = [], []
+        for matrix, weight in matrices:
+            sources, neighbors, products = matrix.products(start, stop)
+            other = sources != neighbors
+            keys.append((sources[other] - start) * n_rows + neighbors[other])
+            values.append(products[other] * weight)
+        keys, inverse = np.unique(np.concatenate(keys), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(values))
+        sources, neighbors = keys // n_rows + start, keys % n_rows
+        order = np.lexsort((-scores, sources))
+        sources, neighbors, scores = (
+            sources[order], neighbors[order], scores[order])
+        ranks = np.arange(sources.size) - np.searchsorted(sources, sources)
+        best = ranks < top_k
+        yield (start, stop, sources[best], neighbors[best], scores[best],
+               ranks[best])
+
+
+def _pairs(queryset):
+    pairs = np.fromiter(queryset.order_by().iterator(chunk_size=10000),
+                        dtype=_PAIR_DTYPE)
+    return pairs['row'], pairs['feature']
+
+
+def _features(queryset, recipe_ids):
+    recipes, features = _pairs(queryset)
+    rows = np.searchsorted(recipe_ids, recipes)
+    # Рецепты, созданные после загрузки списка id, пропускаем.
+    known = recipe_ids[np.minimum(rows, recipe_ids.size - 1)] == recipes
+    _, features = np.unique(features[known], return_inverse=True)
+    return SparseFeatures(rows[known], features, recipe_ids.size,
+                          SIMILAR_RECIPES_MAX_POSTING)
+
+
+def build_similar_recipes(top_k=SIMILAR_RECIPES_TOP_K,
+                          chunk_size=SIMILAR_RECIPES_CHUNK_SIZE,
+                          progress=None):
+    """Пересчитывает таблицу SimilarRecipe и возвращает число записей."""
+    recipe_ids = np.fromiter(
+        Recipe.objects.order_by('pk').values_list('pk', flat=True)
+        .iterator(chunk_size=10000), dtype=np.int64)
+    matrices = [
+        (_features(RecipeIngredient.objects.values_list(
+            'recipe_id', 'ingredient_id'), recipe_ids),
+         SIMILAR_RECIPES_INGREDIENT_WEIGHT),
+        (_features(Favorite.objects.values_list('recipe_id', 'user_id'),
+                   recipe_ids),
+         1 - SIMILAR_RECIPES_INGREDIENT_WEIGHT),
+    ]
+    total = 0
+    for start, stop, sources, neighbors, scores, ranks in top_k_neighbors(
+            matrices, recipe_ids.size, top_k, chunk_size):
+        with transaction.atomic():
+            SimilarRecipe.objects.filter(
+                recipe_id__in=recipe_ids[start:stop].tolist()).delete()
+            SimilarRecipe.objects.bulk_create([
+                SimilarRecipe(recipe_id=recipe_id, similar_id=similar_id,
+                              score=score, rank=rank)
+                for recipe_id, similar_id, score, rank in zip(
+                    recipe_ids[sources].tolist(),
+                    recipe_ids[neighbors].tolist(),
+                    scores.tolist(), ranks.tolist())
+            ])
+        total += sources.size
+        if progress:
+            progress(stop, recipe_ids.size)
+    return total
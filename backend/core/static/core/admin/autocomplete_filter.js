@@ -0,0 +1,15 @@
+'use strict';
+{
+    const $ = django.jQuery;
+
+    $(function() {
+        $('.autocomplete-filter select').on('change', function() {
+            const container = $(this).closest('.autocomplete-filter');
+            const params = new URLSearchParams(container.data('query-string'));
+            if (this.value) {
+                params.set(container.data('lookup'), this.value);
+            }
+            window.location.search = params.toString();
+        });
+    });
+}
@@ -0,0 +1,86 @@
+"""Файловое хранилище с именами по содержимому."""
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранит файл как `<каталог>/<ab>/<sha256><расширение>`.
+
+    Каталог и расширение берутся из имени, предложенного полем, а сам
+    файл — из хэша содержимого, поэтому повторная загрузка того же
+    изображения не пишет ничего нового. Запись идёт во временный файл
+    рядом и атомарно переименовывается, так что читатели никогда не
+    видят недописанный файл. Удалением файлов занимается core.media:
+    на один файл могут ссылаться несколько записей.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Итоговое имя определяется содержимым в _save().
+        return name
+
+    def _save(self, name, content):
+        directory, basename = os.path.split(name)
+        extension = os.path.splitext(basename)[1].lower()
+        final_name = None
+        if content.seekable():
+            # Загрузки из памяти (ContentFile из Base64ImageField) и
+            # временные файлы можно прочитать дважды: хэш считается
+            # до записи, и повторная загрузка не пишет на диск ничего.
+            digest = hashlib.sha256()
+            for chunk in content.chunks():
+                digest.update(chunk)
+            final_name = self._final_name(directory, digest, extension)
+            if self._reuse(final_name):
+                return final_name
+        full_directory = self.path(directory)
+        os.makedirs(full_directory, exist_ok=True)
+        digest = hashlib.sha256()
+        descriptor, temp_path = tempfile.mkstemp(
+            dir=full_directory, prefix='.upload-')
+        try:
+            with os.fdopen(descriptor, 'wb') as temp_file:
+                for chunk in content.chunks():
+                    if final_name is None:
+                        digest.update(chunk)
+                    temp_file.write(chunk)
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+            if final_name is None:
+                final_name = self._final_name(directory, digest, extension)
+            final_path = self.path(final_name)
+            # Тот же файл мог записать параллельный запрос.
+            if self._reuse(final_name):
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(temp_path, self.file_permissions_mode)
+                os.replace(temp_path, final_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return final_name
+
+    @staticmethod
+    def _final_name(directory, digest, extension):
+        hexdigest = digest.hexdigest()
+        return os.path.join(
+            directory, hexdigest[:2], f'{hexdigest}{extension}'
+        ).replace('\\', '/')
+
+    def _reuse(self, name):
+        """Есть ли уже файл name; если есть, обновляет его отметку времени."""
+        try:
+            # Свежая отметка времени защищает файл от удаления, пока
+            # новая ссылка на него ещё не сохранена в базе.
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            return False
+        return True
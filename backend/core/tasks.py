@@ -0,0 +1,107 @@
+"""
+Фоновое выполнение задач.
+
+Задачи ставятся в очередь после фиксации текущей транзакции. Реализация
+очереди задаётся настройкой TASK_QUEUE_BACKEND: по умолчанию это поток
+внутри процесса, а ImmediateTaskQueue выполняет задачи сразу
+(для management-команд и отладки). Внешний брокер подключается
+отдельным классом с тем же методом `put`.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils.module_loading import import_string
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _run(func, args, kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Ошибка фоновой задачи %s', func.__qualname__)
+    finally:
+        close_old_connections()
+
+
+class ImmediateTaskQueue:
+    """Выполняет задачу сразу в вызывающем потоке."""
+
+    def put(self, func, args, kwargs):
+        _run(func, args, kwargs)
+
+
+class ThreadTaskQueue:
+    """Выполняет задачи по очереди в фоновом потоке текущего процесса."""
+
+    def __init__(self):
+        self._queue = None
+        self._pid = None
+        self._lock = threading.Lock()
+        atexit.register(self.join)
+
+    def _ensure_worker(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # После fork поток родителя не существует — запускаем свой.
+            self._queue = queue.Queue()
+            threading.Thread(
+                target=self._work, args=(self._queue,),
+                name='task-queue', daemon=True
+            ).start()
+            self._pid = os.getpid()
+
+    @staticmethod
+    def _work(tasks):
+        while True:
+            func, args, kwargs = tasks.get()
+            try:
+                _run(func, args, kwargs)
+            finally:
+                tasks.task_done()
+
+    def put(self, func, args, kwargs):
+        self._ensure_worker()
+        self._queue.put((func, args, kwargs))
+
+    def qsize(self):
+        return self._queue.qsize() if self._pid == os.getpid() else 0
+
+    def join(self):
+        """Дожидается выполнения уже поставленных задач."""
+        if self._pid == os.getpid():
+            self._queue.join()
+
+
+_task_queue = None
+
+
+def get_task_queue():
+    global _task_queue
+    if _task_queue is None:
+        _task_queue = import_string(settings.TASK_QUEUE_BACKEND)()
+    return _task_queue
+
+
+def _queue_size():
+    qsize = getattr(_task_queue, 'qsize', None)
+    return qsize() if qsize else 0
+
+
+metrics.Gauge('task_queue_size', 'Задачи в очереди процесса.', _queue_size)
+
+
+def enqueue(func, *args, **kwargs):
+    """Ставит задачу в очередь после фиксации текущей транзакции."""
+    task_queue = get_task_queue()
+    transaction.on_commit(lambda: task_queue.put(func, args, kwargs))
@@ -0,0 +1,35 @@
+import json
+from unittest import mock
+
+from django.db import connections
+from django.test import SimpleTestCase
+
+from core.admin_utils import EstimatedCountPaginator
+from core.constants import ADMIN_EXACT_COUNT_LIMIT
+
+
+class EstimatedCountPaginatorTest(SimpleTestCase):
+    """Оценка числа строк по плану EXPLAIN (FORMAT JSON) PostgreSQL."""
+
+    def paginate(self, explain_output, exact=10):
+        queryset = mock.Mock(db='default', ordered=True)
+        queryset.explain.return_value = explain_output
+        queryset.count.return_value = exact
+        with mock.patch.object(connections['default'], 'vendor',
+                               'postgresql'):
+            return EstimatedCountPaginator(queryset, 100).count
+
+    def plan(self, rows):
+        return {'Plan': {'Node Type': 'Seq Scan', 'Plan Rows': rows}}
+
+    def test_plan_object(self):
+        # Так план возвращает QuerySet.explain на psycopg.
+        rows = ADMIN_EXACT_COUNT_LIMIT * 10
+        self.assertEqual(self.paginate(json.dumps(self.plan(rows))), rows)
+
+    def test_plan_list(self):
+        rows = ADMIN_EXACT_COUNT_LIMIT * 10
+        self.assertEqual(self.paginate(json.dumps([self.plan(rows)])), rows)
+
+    def test_small_estimate_counts_exactly(self):
+        self.assertEqual(self.paginate(json.dumps(self.plan(5)), exact=7), 7)
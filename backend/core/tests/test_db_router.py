@@ -0,0 +1,130 @@
+import os
+import sqlite3
+import tempfile
+from unittest import mock
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.test import (SimpleTestCase, TransactionTestCase,
+                         override_settings)
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.db_router import replica_health
+from core.models import Favorite, Recipe, SiteUser
+from core.tests.utils import run_tasks_immediately
+
+REPLICA = 'replica_test'
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRoutingTest(TransactionTestCase):
+    """
+    Реплика — отдельный файл SQLite, копия основной базы на момент
+    начала теста: всё, что записано после, видно только в основной.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(directory.cleanup)
+        cls.replica_path = os.path.join(directory.name, 'replica.sqlite3')
+        connections.settings[REPLICA] = {
+            **connections.settings['default'], 'NAME': cls.replica_path}
+        cls.addClassCleanup(cls.drop_replica)
+        cls.databases = cls.databases | {REPLICA}
+
+    @classmethod
+    def drop_replica(cls):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+
+    def setUp(self):
+        cache.clear()
+        run_tasks_immediately(self)
+        self.author = SiteUser.objects.create(
+            email='cook@example.com', username='cook')
+        self.old = self.create_recipe('Старый')
+        self.make_replica()
+        self.new = self.create_recipe('Новый')
+        replica_health._checked_at.clear()
+        replica_health._healthy.clear()
+
+    def create_recipe(self, name):
+        return Recipe.objects.create(
+            author=self.author, name=name, text='Текст', cooking_time=10,
+            image='recipes/images/image.png')
+
+    def make_replica(self):
+        connections[REPLICA].close()
+        primary = connections['default']
+        primary.ensure_connection()
+        target = sqlite3.connect(self.replica_path)
+        primary.connection.backup(target)
+        target.close()
+
+    def names(self, client):
+        response = client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        return {recipe['name'] for recipe in response.data['results']}
+
+    def authorized_client(self):
+        client = APIClient()
+        token = Token.objects.create(user=self.author)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
+
+    def test_safe_reads_use_replica(self):
+        self.assertEqual(self.names(APIClient()), {'Старый'})
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(Recipe.objects.count(), 2)
+
+    def test_writer_is_pinned_to_primary(self):
+        client = self.authorized_client()
+        self.assertEqual(self.names(client), {'Старый'})
+        response = client.post(f'/api/recipes/{self.new.pk}/favorite/')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Favorite.objects.using('default').exists())
+        self.assertFalse(Favorite.objects.using(REPLICA).exists())
+        # Писавший клиент видит свои изменения, остальные — реплику.
+        self.assertEqual(self.names(client), {'Старый', 'Новый'})
+        self.assertEqual(self.names(APIClient()), {'Старый'})
+        cache.clear()
+        self.assertEqual(self.names(client), {'Старый'})
+
+    def test_failed_write_does_not_pin(self):
+        client = self.authorized_client()
+        response = client.post('/api/recipes/0/favorite/')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.names(client), {'Старый'})
+
+    def test_unhealthy_replica_falls_back_to_primary(self):
+        with mock.patch.object(replica_health, 'measure_lag',
+                               return_value=None), \
+                self.assertLogs('core.db_router', 'WARNING'):
+            self.assertEqual(self.names(APIClient()), {'Старый', 'Новый'})
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        with mock.patch.object(replica_health, 'measure_lag',
+                               return_value=replica_health.max_lag + 1), \
+                self.assertLogs('core.db_router', 'WARNING'):
+            self.assertEqual(self.names(APIClient()), {'Старый', 'Новый'})
+
+
+class ReplicaCacheSettingsTest(SimpleTestCase):
+
+    @override_settings(DATABASE_REPLICAS=[REPLICA])
+    def test_local_memory_cache_fails_at_startup(self):
+        with self.assertRaises(ImproperlyConfigured):
+            apps.get_app_config('core').ready()
+
+    @override_settings(DATABASE_REPLICAS=[REPLICA], CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://redis:6379/0'}})
+    def test_redis_cache_is_accepted(self):
+        apps.get_app_config('core').ready()
@@ -0,0 +1,163 @@
+from collections import defaultdict
+
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from core.deletion import (purge_recipe, purge_recipes, purge_user,
+                           soft_delete_recipe, soft_delete_user)
+from core.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                         ShopCart, SiteUser, Subscription)
+
+
+def create_recipes(author, count, ingredients=()):
+    recipes = [Recipe.objects.create(
+        author=author, name=f'Рецепт {number}', text='Текст',
+        cooking_time=10, image='recipes/images/missing.png')
+        for number in range(count)]
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+        for recipe in recipes for ingredient in ingredients)
+    return recipes
+
+
+class SoftDeleteTest(APITestCase):
+    """Первый шаг: запись сразу скрыта, данные удаляет фоновая задача."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = SiteUser.objects.create_user(
+            email='cook@example.com', username='cook', password='x')
+        cls.reader = SiteUser.objects.create(
+            email='reader@example.com', username='reader')
+        cls.recipes = create_recipes(cls.author, 2)
+
+    def test_deleted_user_and_recipes_are_hidden(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            soft_delete_user(self.author)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(
+            self.client.get(f'/api/users/{self.author.pk}/').status_code,
+            404)
+        users = self.client.get('/api/users/').data['results']
+        self.assertEqual([user['id'] for user in users], [self.reader.pk])
+        self.assertEqual(self.client.get('/api/recipes/').data['count'], 0)
+        self.assertEqual(self.client.get(
+            f'/api/recipes/{self.recipes[0].pk}/').status_code, 404)
+        # Строки остаются до фоновой очистки.
+        self.assertEqual(Recipe.all_objects.filter(
+            author=self.author).count(), 2)
+
+    def test_user_is_anonymized(self):
+        soft_delete_user(self.author)
+        user = SiteUser.all_objects.get(pk=self.author.pk)
+        self.assertTrue(user.is_deleted)
+        self.assertFalse(user.is_active)
+        self.assertEqual(user.email,
+                         f'deleted-{user.pk}@deleted.invalid')
+        self.assertEqual(user.username, f'deleted-{user.pk}')
+        self.assertFalse(user.has_usable_password())
+        # Email и никнейм свободны для новой регистрации.
+        SiteUser.objects.create(email='cook@example.com', username='cook')
+
+    def test_delete_recipe_through_api(self):
+        token = Token.objects.create(user=self.author)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        recipe = self.recipes[0]
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.delete(f'/api/recipes/{recipe.pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(len(callbacks), 1)
+        self.assertTrue(Recipe.all_objects.get(pk=recipe.pk).is_deleted)
+        self.assertEqual(self.client.get(
+            f'/api/recipes/{recipe.pk}/').status_code, 404)
+
+    def test_admin_lists_marked_rows(self):
+        admin = SiteUser.objects.create_superuser(
+            email='admin@example.com', username='admin', password='x')
+        soft_delete_user(self.author)
+        self.client.force_login(admin)
+        response = self.client.get('/admin/core/siteuser/')
+        self.assertContains(response, f'deleted-{self.author.pk}')
+        response = self.client.get('/admin/core/recipe/?is_deleted__exact=1')
+        self.assertContains(response, 'Рецепт 1')
+
+
+class PurgeTest(TestCase):
+    """Второй шаг: удаление зависимых строк пачками с отчётом."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.reader, cls.other = SiteUser.objects.bulk_create(
+            SiteUser(email=f'{name}@example.com', username=name)
+            for name in ('cook', 'reader', 'other'))
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(2))
+        cls.recipes = create_recipes(cls.author, 3, cls.ingredients)
+        cls.live = create_recipes(cls.other, 1)[0]
+        Favorite.objects.bulk_create(
+            Favorite(user=cls.reader, recipe=recipe)
+            for recipe in cls.recipes)
+        ShopCart.objects.create(user=cls.author, recipe=cls.live)
+        Favorite.objects.create(user=cls.author, recipe=cls.live)
+        Subscription.objects.create(user=cls.reader, author=cls.author)
+        Subscription.objects.create(user=cls.author, author=cls.other)
+
+    def purge(self, function, *args):
+        reports = defaultdict(list)
+        function(*args, batch_size=2,
+                 progress=lambda label, count: reports[label].append(count))
+        return dict(reports)
+
+    def test_purge_recipes_in_batches(self):
+        Recipe.all_objects.filter(author=self.author).update(is_deleted=True)
+        reports = self.purge(
+            purge_recipes, Recipe.all_objects.filter(is_deleted=True))
+        self.assertEqual(reports, {
+            # Пачки рецептов по 2 и их строки пачками по 2.
+            'core.recipeingredient': [2, 2, 2],
+            'core.favorite': [2, 1],
+            'core.recipe': [2, 1],
+        })
+        self.assertFalse(Recipe.all_objects.filter(
+            author=self.author).exists())
+        self.assertEqual(RecipeIngredient.objects.count(), 0)
+        self.assertEqual(Favorite.objects.filter(
+            user=self.reader).count(), 0)
+        self.assertTrue(Recipe.objects.filter(pk=self.live.pk).exists())
+
+    def test_purge_recipe_skips_live_recipe(self):
+        self.assertEqual(self.purge(purge_recipe, self.recipes[0].pk), {})
+        self.assertEqual(Recipe.objects.count(), 4)
+
+    def test_purge_user(self):
+        soft_delete_user(self.author)
+        reports = self.purge(purge_user, self.author.pk)
+        self.assertEqual(reports, {
+            'core.recipeingredient': [2, 2, 2],
+            'core.favorite': [2, 1, 1],
+            'core.recipe': [2, 1],
+            'core.shopcart': [1],
+            'core.subscription': [1, 1],
+            'core.siteuser': [1],
+        })
+        self.assertFalse(SiteUser.all_objects.filter(
+            pk=self.author.pk).exists())
+        self.assertEqual(list(Subscription.objects.all()), [])
+        self.assertTrue(Recipe.objects.filter(pk=self.live.pk).exists())
+        self.assertFalse(Favorite.objects.filter(recipe=self.live).exists())
+
+    def test_purge_user_ignores_live_user(self):
+        self.assertEqual(self.purge(purge_user, self.author.pk), {})
+        self.assertTrue(SiteUser.objects.filter(pk=self.author.pk).exists())
+
+    def test_purge_after_soft_delete_recipe(self):
+        recipe = self.recipes[0]
+        soft_delete_recipe(recipe)
+        reports = self.purge(purge_recipe, recipe.pk)
+        self.assertEqual(reports, {
+            'core.recipeingredient': [2],
+            'core.favorite': [1],
+            'core.recipe': [1],
+        })
@@ -0,0 +1,164 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from core.deletion import purge_recipe, soft_delete_recipe
+from core.models import FeedEntry, Recipe, SiteUser, Subscription
+from core.tests.utils import run_tasks_immediately
+
+
+def create_recipe(author, name):
+    return Recipe.objects.create(
+        author=author, name=name, text='Текст', cooking_time=10,
+        image='recipes/images/image.png')
+
+
+class FeedTest(APITestCase):
+    """Лента: рассылка при публикации и подмешивание популярных авторов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader, cls.cook, cls.baker, cls.fan = (
+            SiteUser.objects.create(email=f'{name}@example.com',
+                                    username=name)
+            for name in ('reader', 'cook', 'baker', 'fan'))
+        cls.token = Token.objects.create(user=cls.reader)
+
+    def setUp(self):
+        run_tasks_immediately(self)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def subscribe(self, user, author):
+        with self.captureOnCommitCallbacks(execute=True):
+            Subscription.objects.create(user=user, author=author)
+
+    def publish(self, author, name):
+        with self.captureOnCommitCallbacks(execute=True):
+            return create_recipe(author, name)
+
+    def feed(self, **params):
+        response = self.client.get('/api/recipes/feed/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def names(self, **params):
+        return [recipe['name'] for recipe in self.feed(**params)['results']]
+
+    def test_new_recipe_is_fanned_out(self):
+        self.subscribe(self.reader, self.cook)
+        recipe = self.publish(self.cook, 'Борщ')
+        self.publish(self.baker, 'Хлеб')
+        self.assertEqual(list(FeedEntry.objects.values_list(
+            'user', 'recipe', 'author')),
+            [(self.reader.pk, recipe.pk, self.cook.pk)])
+        data = self.feed()
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(data['results'][0]['id'], recipe.pk)
+        self.assertEqual(data['results'][0]['author']['id'], self.cook.pk)
+
+    def test_subscription_copies_recent_recipes(self):
+        for name in ('Суп', 'Каша', 'Пирог'):
+            self.publish(self.cook, name)
+        with mock.patch('core.feed.FEED_BACKFILL_DEPTH', 2):
+            self.subscribe(self.reader, self.cook)
+        self.assertEqual(self.names(), ['Пирог', 'Каша'])
+
+    def test_unsubscribe_removes_entries(self):
+        self.subscribe(self.reader, self.cook)
+        self.subscribe(self.reader, self.baker)
+        self.publish(self.cook, 'Борщ')
+        self.publish(self.baker, 'Хлеб')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(
+                f'/api/users/{self.cook.pk}/subscribe/')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(FeedEntry.objects.filter(author=self.cook).exists())
+        self.assertEqual(self.names(), ['Хлеб'])
+
+    def test_deleted_recipe_leaves_feed(self):
+        self.subscribe(self.reader, self.cook)
+        recipe = self.publish(self.cook, 'Борщ')
+        self.publish(self.cook, 'Щи')
+        with self.captureOnCommitCallbacks():
+            soft_delete_recipe(recipe)
+        # Сразу не виден, а запись ленты удаляет фоновая очистка.
+        self.assertEqual(self.names(), ['Щи'])
+        purge_recipe(recipe.pk)
+        self.assertFalse(FeedEntry.objects.filter(recipe=recipe).exists())
+        self.assertEqual(self.feed()['count'], 1)
+
+    def test_popular_author_is_merged_on_read(self):
+        self.subscribe(self.reader, self.cook)
+        self.subscribe(self.reader, self.baker)
+        self.subscribe(self.fan, self.baker)
+        with mock.patch('core.feed.FEED_FANOUT_MAX_FOLLOWERS', 1):
+            self.publish(self.cook, 'Борщ')
+            self.publish(self.baker, 'Хлеб')
+            self.publish(self.cook, 'Щи')
+        self.baker.refresh_from_db()
+        self.assertTrue(self.baker.is_popular)
+        self.assertFalse(FeedEntry.objects.filter(author=self.baker).exists())
+        # Рецепты из записей ленты и популярного автора — по дате.
+        self.assertEqual(self.names(), ['Щи', 'Хлеб', 'Борщ'])
+        self.assertEqual(self.names(limit=2, page=2), ['Борщ'])
+        self.assertEqual(self.feed(limit=2)['count'], 3)
+
+    def test_subscribing_to_popular_author_copies_nothing(self):
+        self.publish(self.baker, 'Хлеб')
+        SiteUser.objects.filter(pk=self.baker.pk).update(is_popular=True)
+        self.subscribe(self.reader, self.baker)
+        self.assertFalse(FeedEntry.objects.exists())
+        self.assertEqual(self.names(), ['Хлеб'])
+
+    def test_feed_requires_authentication(self):
+        self.client.credentials()
+        self.assertEqual(
+            self.client.get('/api/recipes/feed/').status_code, 401)
+
+
+class BackfillFeedTest(TestCase):
+    """backfill_feed заполняет ленты по подпискам без сигналов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader, cls.fan, cls.cook, cls.baker = (
+            SiteUser.objects.bulk_create(
+                SiteUser(email=f'{name}@example.com', username=name)
+                for name in ('reader', 'fan', 'cook', 'baker')))
+        cls.soup, cls.bread = Recipe.objects.bulk_create(
+            Recipe(author=author, name=name, text='Текст', cooking_time=10,
+                   image='recipes/images/image.png')
+            for author, name in ((cls.cook, 'Суп'), (cls.baker, 'Хлеб')))
+        Subscription.objects.bulk_create(
+            Subscription(user=user, author=author) for user, author in (
+                (cls.reader, cls.cook), (cls.reader, cls.baker),
+                (cls.fan, cls.baker)))
+        SiteUser.objects.filter(pk=cls.cook.pk).update(is_popular=True)
+
+    def test_backfill(self):
+        with mock.patch('core.management.commands.backfill_feed.'
+                        'FEED_FANOUT_MAX_FOLLOWERS', 1):
+            call_command('backfill_feed', stdout=StringIO())
+        popular = SiteUser.objects.filter(
+            is_popular=True).values_list('pk', flat=True)
+        self.assertEqual(list(popular), [self.baker.pk])
+        self.assertEqual(
+            list(FeedEntry.objects.values_list('user', 'recipe')),
+            [(self.reader.pk, self.soup.pk)])
+
+    def test_backfill_is_repeatable(self):
+        for _ in range(2):
+            call_command('backfill_feed', stdout=StringIO())
+        self.assertEqual(FeedEntry.objects.count(), 3)
+
+    def test_benchmark(self):
+        out, err = StringIO(), StringIO()
+        call_command('benchmark_feed', authors=5, recipes=3, popular=2,
+                     repeat=1, stdout=out, stderr=err)
+        self.assertEqual(err.getvalue(), '')
+        self.assertIn('записей ленты: 15', out.getvalue())
+        self.assertEqual(Recipe.objects.count(), 2)
@@ -0,0 +1,95 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from core.ingredient_search import (IngredientIndex, ingredient_index,
+                                    search_ingredients)
+from core.models import Ingredient
+from core.tasks import ImmediateTaskQueue
+
+
+class InMemorySearchTest(TestCase):
+    """Поиск по индексу триграмм в памяти (SQLite)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г') for name in (
+                'Сахар Б', 'сахар а', 'кокосовое молоко', 'молоко сгущённое',
+                'Молоко', 'соль', 'морская соль', 'картофель'))
+
+    def setUp(self):
+        ingredient_index.build()
+        patcher = mock.patch('core.tasks._task_queue', ImmediateTaskQueue())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def search(self, query, **kwargs):
+        return list(search_ingredients(Ingredient.objects.all(), query,
+                                       **kwargs).values_list('name',
+                                                             flat=True))
+
+    def test_prefix_matches_come_first(self):
+        self.assertEqual(self.search('МОЛОКО'), [
+            'Молоко', 'молоко сгущённое', 'кокосовое молоко'])
+
+    def test_typo(self):
+        self.assertEqual(self.search('млоко')[0], 'Молоко')
+        self.assertEqual(self.search('картошель'), ['картофель'])
+
+    def test_short_query_matches_prefix_only(self):
+        self.assertEqual(self.search('со'), ['соль'])
+
+    def test_ties_are_ordered_by_lowercase_name(self):
+        # Одинаковое сходство: порядок по названию, а не по id.
+        self.assertEqual(self.search('сахр'), ['сахар а', 'Сахар Б'])
+        self.assertEqual(self.search('сах'), ['сахар а', 'Сахар Б'])
+
+    def test_limit(self):
+        self.assertEqual(self.search('молоко', limit=2),
+                         ['Молоко', 'молоко сгущённое'])
+        self.assertEqual(self.search('млоко', limit=1), ['Молоко'])
+
+    def test_empty_query_keeps_queryset(self):
+        self.assertEqual(len(self.search('  ')), 8)
+
+    def test_index_is_rebuilt_after_change(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            Ingredient.objects.create(name='Сливки', measurement_unit='мл')
+        # До фиксации транзакции поиск идёт по старому индексу.
+        self.assertEqual(self.search('сливки'), [])
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.search('сливки'), ['Сливки'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.filter(name='соль').delete()
+        self.assertEqual(self.search('соль'), ['морская соль'])
+
+    def test_index_expires(self):
+        index = IngredientIndex(ttl=0)
+        index.get()
+        with self.captureOnCommitCallbacks() as callbacks:
+            index.get()
+            # Пока перестроение в очереди, второе не ставится.
+            index.get()
+        self.assertEqual(len(callbacks), 1)
+
+    def test_api_filter(self):
+        response = self.client.get('/api/ingredients/', {'name': 'млоко'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['name'], 'Молоко')
+
+
+class BenchmarkCommandTest(TestCase):
+
+    def test_benchmark_finds_typos(self):
+        self.addCleanup(ingredient_index.build)
+        out, err = StringIO(), StringIO()
+        call_command('benchmark_ingredient_search', size=500, repeat=1,
+                     stdout=out, stderr=err)
+        self.assertEqual(err.getvalue(), '')
+        self.assertIn('Каталог: 500 ингредиентов', out.getvalue())
+        # Синтетический каталог откатывается.
+        self.assertFalse(Ingredient.objects.exists())
@@ -0,0 +1,104 @@
+import re
+
+from django.test import TestCase, override_settings
+
+from core.metrics import CONTENT_TYPE
+from core.models import SiteUser
+
+OUTSIDE_IP = '203.0.113.7'
+METRIC_NAME = r'[a-zA-Z_:][a-zA-Z0-9_:]*'
+LABEL_PAIR = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\\n]|\\[\\"n])*)"')
+LABEL = LABEL_PAIR.pattern
+SAMPLE = re.compile(
+    rf'^(?P<name>{METRIC_NAME})'
+    rf'(?:\{{(?P<labels>{LABEL}(?:,{LABEL})*)?\}})?'
+    r' (?P<value>[+-]?(?:\d+(?:\.\d*)?(?:e[+-]?\d+)?|Inf|NaN))$')
+TYPE = re.compile(
+    rf'^# TYPE ({METRIC_NAME}) (counter|gauge|histogram|summary|untyped)$')
+HISTOGRAM_SUFFIXES = ('_bucket', '_sum', '_count')
+
+
+def parse_exposition(text):
+    """
+    Разбирает текстовый формат Prometheus 0.0.4.
+
+    Возвращает {семейство: (тип, [(имя, метки, значение), ...])} и
+    падает с AssertionError на строке, которая формату не отвечает.
+    """
+    families = {}
+    assert text.endswith('\n'), 'Вывод должен заканчиваться переводом строки'
+    for line in text.splitlines():
+        if line.startswith('# HELP '):
+            continue
+        match = TYPE.match(line)
+        if match:
+            name, kind = match.groups()
+            assert name not in families, f'Повтор TYPE: {line}'
+            families[name] = (kind, [])
+            continue
+        match = SAMPLE.match(line)
+        assert match, f'Строка не в формате Prometheus: {line!r}'
+        name = match['name']
+        family = name
+        if name not in families:
+            family = next(
+                (name[:-len(suffix)] for suffix in HISTOGRAM_SUFFIXES
+                 if name.endswith(suffix)), name)
+        assert family in families, f'Нет TYPE для {name}'
+        labels = dict(LABEL_PAIR.findall(match['labels'] or ''))
+        families[family][1].append((name, labels, float(match['value'])))
+    return families
+
+
+class MetricsViewTest(TestCase):
+    """Доступ к /metrics и формат выдачи."""
+
+    def scrape(self, **extra):
+        return self.client.get('/metrics', **extra)
+
+    def test_outside_anonymous_gets_404(self):
+        self.assertEqual(self.scrape(REMOTE_ADDR=OUTSIDE_IP).status_code, 404)
+
+    def test_allowed_ip(self):
+        response = self.scrape(REMOTE_ADDR='127.0.0.1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], CONTENT_TYPE)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_bearer_token(self):
+        self.assertEqual(self.scrape(
+            REMOTE_ADDR=OUTSIDE_IP,
+            HTTP_AUTHORIZATION='Bearer scrape-secret').status_code, 200)
+        self.assertEqual(self.scrape(
+            REMOTE_ADDR=OUTSIDE_IP,
+            HTTP_AUTHORIZATION='Bearer wrong').status_code, 404)
+
+    def test_staff(self):
+        user = SiteUser.objects.create(
+            email='staff@example.com', username='staff')
+        self.client.force_login(user)
+        self.assertEqual(self.scrape(REMOTE_ADDR=OUTSIDE_IP).status_code, 404)
+        SiteUser.objects.filter(pk=user.pk).update(is_staff=True)
+        self.assertEqual(self.scrape(REMOTE_ADDR=OUTSIDE_IP).status_code, 200)
+
+    def test_exposition_format(self):
+        self.client.get('/api/ingredients/')
+        families = parse_exposition(self.scrape().content.decode())
+
+        kind, samples = families['http_requests_total']
+        self.assertEqual(kind, 'counter')
+        self.assertIn(
+            {'view': 'IngredientViewSet', 'action': 'list', 'status': '200'},
+            [labels for _, labels, _ in samples])
+
+        kind, samples = families['http_request_duration_seconds']
+        self.assertEqual(kind, 'histogram')
+        series = [(name, labels, value) for name, labels, value in samples
+                  if labels.get('view') == 'IngredientViewSet']
+        buckets = [value for name, _, value in series
+                   if name.endswith('_bucket')]
+        count = next(value for name, _, value in series
+                     if name.endswith('_count'))
+        self.assertEqual(buckets, sorted(buckets))
+        self.assertEqual(buckets[-1], count)
+        self.assertGreaterEqual(count, 1)
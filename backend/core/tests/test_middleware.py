@@ -0,0 +1,179 @@
+import gzip
+from unittest import mock, skipUnless
+
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase
+
+from core.constants import COMPRESSION_MIN_SIZE
+from core.middleware import (COMPRESSORS, CompressionMiddleware, brotli,
+                             choose_encoding)
+
+ORIGIN = 'http://localhost'
+
+
+class CorsHeadersTest(TestCase):
+    """Заголовки CORS есть и у ответов, которые строит CommonMiddleware."""
+
+    def test_append_slash_redirect_has_cors_headers(self):
+        response = self.client.get('/api/ingredients', HTTP_ORIGIN=ORIGIN)
+        self.assertEqual(response.status_code, 301)
+        self.assertEqual(response['Location'], '/api/ingredients/')
+        self.assertEqual(response['Access-Control-Allow-Origin'], ORIGIN)
+
+    def test_api_response_has_cors_headers(self):
+        response = self.client.get('/api/ingredients/', HTTP_ORIGIN=ORIGIN)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Access-Control-Allow-Origin'], ORIGIN)
+
+
+class ChooseEncodingTest(SimpleTestCase):
+    """Выбор сжатия по q-значениям Accept-Encoding."""
+
+    def test_quality_values(self):
+        preferred = next(iter(COMPRESSORS))
+        cases = {
+            '': None,
+            'identity': None,
+            'gzip': 'gzip',
+            'GZIP': 'gzip',
+            'gzip;q=0': None,
+            'gzip;q=0.0, deflate': None,
+            'gzip;q=abc': None,
+            'deflate, gzip;q=0.5': 'gzip',
+            '*': preferred,
+            '*;q=0': None,
+            '*;q=0, gzip': 'gzip',
+            'gzip;q=0, *': next(
+                (name for name in COMPRESSORS if name != 'gzip'), None),
+        }
+        for header, expected in cases.items():
+            with self.subTest(header=header):
+                self.assertEqual(choose_encoding(header), expected)
+
+    @skipUnless(brotli, 'пакет Brotli не установлен')
+    def test_brotli_is_preferred(self):
+        self.assertEqual(choose_encoding('gzip, br'), 'br')
+        self.assertEqual(choose_encoding('gzip, deflate, br'), 'br')
+        self.assertEqual(choose_encoding('gzip, br;q=0.5'), 'gzip')
+        self.assertEqual(choose_encoding('gzip;q=0.5, br'), 'br')
+
+
+class CompressionMiddlewareTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.compressed = 0
+        compress = COMPRESSORS['gzip']
+
+        def counting(body):
+            self.compressed += 1
+            return compress(body)
+        patcher = mock.patch.dict(COMPRESSORS, gzip=counting)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def respond(self, response, encoding='gzip', method='get', **headers):
+        request = getattr(self.factory, method)(
+            '/api/recipes/', HTTP_ACCEPT_ENCODING=encoding, **headers)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    @staticmethod
+    def json(size=COMPRESSION_MIN_SIZE, **kwargs):
+        return HttpResponse(b'{"name": "' + b'a' * size + b'"}',
+                            content_type='application/json', **kwargs)
+
+    def assert_not_compressed(self, response):
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(self.compressed, 0)
+
+    def test_json_is_compressed(self):
+        original = self.json()
+        body = original.content
+        response = self.respond(original)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), body)
+        self.assertEqual(response['Content-Length'],
+                         str(len(response.content)))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_small_response_is_not_compressed(self):
+        response = self.respond(self.json(size=COMPRESSION_MIN_SIZE - 20))
+        self.assert_not_compressed(response)
+        # Другой клиент мог бы получить сжатое тело того же ответа.
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_client_without_gzip(self):
+        self.assert_not_compressed(self.respond(self.json(), 'gzip;q=0'))
+        self.assert_not_compressed(self.respond(self.json(), ''))
+
+    def test_other_types_are_not_compressed(self):
+        response = self.respond(HttpResponse(
+            b'\x89PNG' * COMPRESSION_MIN_SIZE, content_type='image/png'))
+        self.assert_not_compressed(response)
+        self.assertFalse(response.has_header('Vary'))
+
+    def test_streaming_response_passes_through(self):
+        response = self.respond(StreamingHttpResponse(
+            iter([b'a' * COMPRESSION_MIN_SIZE] * 2),
+            content_type='text/plain'))
+        self.assert_not_compressed(response)
+        self.assertEqual(b''.join(response), b'a' * COMPRESSION_MIN_SIZE * 2)
+
+    def test_encoded_response_passes_through(self):
+        response = self.json()
+        response['Content-Encoding'] = 'br'
+        body = response.content
+        response = self.respond(response)
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(response.content, body)
+        self.assertEqual(self.compressed, 0)
+
+    def test_strong_etag_becomes_weak(self):
+        response = self.json()
+        response['ETag'] = '"abc"'
+        self.assertEqual(self.respond(response)['ETag'], 'W/"abc"')
+        response = self.json()
+        response['ETag'] = 'W/"abc"'
+        self.assertEqual(self.respond(response)['ETag'], 'W/"abc"')
+
+    def test_uncompressed_etag_is_kept(self):
+        response = self.json(size=10)
+        response['ETag'] = '"abc"'
+        self.assertEqual(self.respond(response)['ETag'], '"abc"')
+
+    def test_shared_response_is_compressed_once(self):
+        for _ in range(3):
+            response = self.respond(self.json())
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(self.compressed, 1)
+        self.assertEqual(gzip.decompress(response.content),
+                         self.json().content)
+
+    def test_private_responses_are_not_cached(self):
+        private = self.json(headers={'Cache-Control': 'private'})
+        no_store = self.json(headers={'Cache-Control': 'no-store'})
+        with_cookie = self.json()
+        with_cookie.set_cookie('name', 'value')
+        cases = (
+            ('authorization', self.json(),
+             {'HTTP_AUTHORIZATION': 'Token abc'}),
+            ('session', self.json(), {'HTTP_COOKIE': 'sessionid=abc'}),
+            ('set-cookie', with_cookie, {}),
+            ('private', private, {}),
+            ('no-store', no_store, {}),
+            ('not found', self.json(status=404), {}),
+            ('post', self.json(), {'method': 'post'}),
+        )
+        for name, response, headers in cases:
+            with self.subTest(name):
+                self.compressed = 0
+                body = response.content
+                for _ in range(2):
+                    response.content = body
+                    response.headers.pop('Content-Encoding', None)
+                    self.assertEqual(
+                        self.respond(response, **headers)[
+                            'Content-Encoding'], 'gzip')
+                self.assertEqual(self.compressed, 2)
@@ -0,0 +1,192 @@
+import os
+import tempfile
+from io import StringIO
+
+import numpy as np
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from core.constants import MINHASH_BANDS, MINHASH_NUM_PERM
+from core.minhash import PRIME, band_buckets, minhash, near_duplicates
+from core.models import (Ingredient, Recipe, RecipeIngredient,
+                         RecipeSignature, RecipeSignatureBand, SiteUser)
+from core.ndjson import export_ndjson
+from core.tests.utils import run_tasks_immediately
+
+# Маленькая картинка PNG 1x1.
+IMAGE = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAA'
+         'fFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==')
+
+
+def signatures(*feature_sets):
+    rows = np.concatenate([np.full(len(features), row)
+                           for row, features in enumerate(feature_sets)])
+    features = np.concatenate([np.array(features, dtype=np.int64)
+                               for features in feature_sets])
+    return minhash(rows.astype(np.int64), features, len(feature_sets))
+
+
+class MinHashTest(SimpleTestCase):
+
+    def test_equal_sets_have_equal_signatures(self):
+        first, second = signatures([1, 2, 3], [3, 2, 1, 1])
+        self.assertEqual(first.shape, (MINHASH_NUM_PERM,))
+        np.testing.assert_array_equal(first, second)
+
+    def test_row_without_features(self):
+        _, empty = signatures([1, 2], [])
+        self.assertTrue((empty == PRIME).all())
+
+    def test_agreement_estimates_jaccard(self):
+        # Жаккар 100 / 300 = 1/3.
+        first, second, other = signatures(
+            range(200), range(100, 300), range(1000, 1200))
+        self.assertAlmostEqual((first == second).mean(), 1 / 3, delta=0.15)
+        self.assertEqual((first == other).mean(), 0)
+
+    def test_band_buckets(self):
+        first, second = signatures(range(10), range(10))
+        second[0] += 1
+        buckets = band_buckets(np.stack([first, second]))
+        self.assertEqual(buckets.shape, (2, MINHASH_BANDS))
+        self.assertEqual(buckets.dtype, np.int64)
+        # Изменилась только первая полоса.
+        self.assertNotEqual(buckets[0, 0], buckets[1, 0])
+        np.testing.assert_array_equal(buckets[0, 1:], buckets[1, 1:])
+
+
+def create_recipe(author, name, ingredients):
+    recipe = Recipe.objects.create(
+        author=author, name=name, text='Текст', cooking_time=10,
+        image='recipes/images/image.png')
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+        for ingredient in ingredients)
+    return recipe
+
+
+class NearDuplicatesTest(TestCase):
+    """Подписи обновляются после сохранения рецепта любым путём."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = SiteUser.objects.create(
+            email='cook@example.com', username='cook')
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(40))
+
+    def setUp(self):
+        run_tasks_immediately(self)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.original = create_recipe(
+                self.author, 'Борщ', self.ingredients[:20])
+            # 19 общих ингредиентов из 21 и то же название.
+            self.copy = create_recipe(
+                self.author, 'Борщ', self.ingredients[1:21])
+            self.other = create_recipe(
+                self.author, 'Плов', self.ingredients[25:35])
+
+    def test_signatures_are_saved(self):
+        self.assertEqual(RecipeSignature.objects.count(), 3)
+        self.assertEqual(RecipeSignatureBand.objects.count(),
+                         3 * MINHASH_BANDS)
+
+    def test_near_duplicates(self):
+        duplicates = near_duplicates(self.original.pk)
+        self.assertEqual([pk for pk, _ in duplicates], [self.copy.pk])
+        self.assertGreaterEqual(duplicates[0][1], 0.8)
+        self.assertEqual(
+            [pk for pk, _ in near_duplicates(self.copy.pk)],
+            [self.original.pk])
+        self.assertEqual(near_duplicates(self.other.pk), [])
+
+    def test_signature_follows_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.recipe_ingredients.all().delete()
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=self.other, ingredient=ingredient,
+                                 amount=1)
+                for ingredient in self.ingredients[:20])
+            self.other.name = 'Борщ'
+            self.other.save()
+        self.assertEqual(
+            {pk for pk, _ in near_duplicates(self.original.pk)},
+            {self.copy.pk, self.other.pk})
+
+    def test_soft_deleted_recipes_are_skipped(self):
+        Recipe.objects.filter(pk=self.copy.pk).update(is_deleted=True)
+        self.assertEqual(near_duplicates(self.original.pk), [])
+
+    def test_recipe_without_signature(self):
+        RecipeSignature.objects.filter(pk=self.other.pk).delete()
+        self.assertEqual(near_duplicates(self.other.pk), [])
+
+
+class ImportSignaturesTest(TransactionTestCase):
+    """Рецепты из import_ndjson (bulk_create без сигналов) тоже с подписью."""
+
+    def setUp(self):
+        run_tasks_immediately(self)
+
+    def test_import_builds_missing_signatures(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'dump.ndjson')
+        author = SiteUser.objects.create(
+            email='cook@example.com', username='cook')
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(5))
+        recipe = create_recipe(author, 'Борщ', ingredients)
+        export_ndjson(path)
+        Recipe.all_objects.all().delete()
+        call_command('import_ndjson', path, stdout=StringIO())
+        self.assertTrue(
+            RecipeSignature.objects.filter(recipe_id=recipe.pk).exists())
+        self.assertEqual(RecipeSignatureBand.objects.filter(
+            recipe_id=recipe.pk).count(), MINHASH_BANDS)
+
+
+class NearDuplicatesHeaderTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = SiteUser.objects.create(
+            email='cook@example.com', username='cook')
+        cls.token = Token.objects.create(user=cls.author)
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(40))
+
+    def setUp(self):
+        run_tasks_immediately(self)
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = self.settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.original = create_recipe(
+                self.author, 'Борщ', self.ingredients[:20])
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def create(self, name, ingredients):
+        return self.client.post('/api/recipes/', {
+            'name': name, 'text': 'Текст', 'cooking_time': 10,
+            'image': IMAGE, 'ingredients': [
+                {'id': ingredient.pk, 'amount': 1}
+                for ingredient in ingredients]}, format='json')
+
+    def test_duplicate_is_reported(self):
+        response = self.create('Борщ', self.ingredients[1:21])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response['X-Near-Duplicates'],
+                         str(self.original.pk))
+
+    def test_unrelated_recipe_has_no_header(self):
+        response = self.create('Плов', self.ingredients[25:35])
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('X-Near-Duplicates', response)
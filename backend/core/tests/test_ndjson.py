@@ -0,0 +1,44 @@
+import os
+import tempfile
+
+from django.test import TransactionTestCase
+
+from core.models import Ingredient, SiteUser
+from core.ndjson import export_ndjson, import_ndjson
+from core.tests.utils import run_tasks_immediately
+
+
+class ImportConflictsTest(TransactionTestCase):
+    """Импорт считает только вставленные строки и сообщает о конфликтах."""
+
+    def setUp(self):
+        run_tasks_immediately(self)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'dump.ndjson')
+        for number in range(2):
+            SiteUser.objects.create(email=f'user{number}@example.com',
+                                    username=f'user{number}')
+        Ingredient.objects.create(name='Соль', measurement_unit='г')
+        export_ndjson(self.path)
+
+    def test_round_trip_counts_inserted_rows(self):
+        SiteUser.all_objects.all().delete()
+        Ingredient.objects.all().delete()
+        counts = import_ndjson(self.path)
+        self.assertEqual(
+            counts, {'inserted': 3, 'existing': 0, 'conflicts': 0})
+        self.assertEqual(SiteUser.all_objects.count(), 2)
+
+    def test_unique_conflict_is_reported(self):
+        second = SiteUser.objects.get(username='user1')
+        SiteUser.objects.filter(pk=second.pk).delete()
+        # Другая запись с тем же email: pk свободен, но email занят.
+        SiteUser.objects.create(email=second.email, username='other')
+        conflicts = []
+        counts = import_ndjson(
+            self.path, on_conflict=lambda label, pk, error:
+            conflicts.append((label, pk)))
+        self.assertEqual(
+            counts, {'inserted': 0, 'existing': 2, 'conflicts': 1})
+        self.assertEqual(conflicts, [('core.siteuser', second.pk)])
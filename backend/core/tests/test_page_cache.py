@@ -0,0 +1,170 @@
+import threading
+from unittest import mock
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from rest_framework.test import APITestCase
+
+from core import page_cache
+from core.middleware import PageCacheMiddleware
+from core.models import Recipe, SiteUser
+from core.tests.utils import run_tasks_immediately
+from core.view_counts import view_counter
+
+
+@override_settings(PAGE_CACHE='default')
+class RecipePageCacheTest(APITestCase):
+    """Страница рецепта сбрасывается сигналами при любом виде id в адресе."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = SiteUser.objects.create(
+            email='cook@example.com', username='cook')
+        cls.recipe = Recipe.objects.create(
+            author=author, name='Борщ', text='Текст', cooking_time=10,
+            image='recipes/images/image.png')
+
+    def setUp(self):
+        cache.clear()
+        run_tasks_immediately(self)
+        # Просмотры не должны дожидаться записи до закрытия тестовой базы.
+        self.addCleanup(view_counter.drain)
+
+    def get(self, pk):
+        return self.client.get(f'/api/recipes/{pk}/')
+
+    def test_edit_invalidates_page_with_leading_zero(self):
+        url_pk = f'0{self.recipe.pk}'
+        response = self.get(url_pk)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertEqual(response.viewed_recipe_id, self.recipe.pk)
+        self.assertEqual(self.get(url_pk)['X-Page-Cache'], 'HIT')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.name = 'Щи'
+            self.recipe.save()
+        response = self.get(url_pk)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertEqual(response.data['name'], 'Щи')
+
+    def test_stale_page_is_served_while_another_request_rebuilds(self):
+        self.get(self.recipe.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.get(pk=self.recipe.pk).save()
+        with mock.patch.object(page_cache, 'acquire_lock',
+                               return_value=False):
+            response = self.get(self.recipe.pk)
+        self.assertEqual(response['X-Page-Cache'], 'STALE')
+
+
+@override_settings(PAGE_CACHE='default')
+class PageCacheMiddlewareTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.calls = 0
+
+    def middleware(self, build):
+        def get_response(request):
+            self.calls += 1
+            return build()
+        return PageCacheMiddleware(get_response)
+
+    @staticmethod
+    def tagged():
+        return page_cache.set_cache_tags(HttpResponse(b'page'), 'tag')
+
+    def test_fresh_entry_skips_view(self):
+        middleware = self.middleware(self.tagged)
+        self.assertEqual(
+            middleware(self.factory.get('/page/'))['X-Page-Cache'], 'MISS')
+        response = middleware(self.factory.get('/page/'))
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        self.assertEqual(response.content, b'page')
+        self.assertEqual(self.calls, 1)
+
+    def test_query_order_does_not_matter(self):
+        middleware = self.middleware(self.tagged)
+        middleware(self.factory.get('/page/?a=1&b=2'))
+        response = middleware(self.factory.get('/page/?b=2&a=1'))
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+
+    def test_tag_change_makes_entry_stale(self):
+        middleware = self.middleware(self.tagged)
+        middleware(self.factory.get('/page/'))
+        page_cache.invalidate_tags('tag')
+        self.assertEqual(
+            middleware(self.factory.get('/page/'))['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.calls, 2)
+
+    def test_other_tag_change_keeps_entry_fresh(self):
+        middleware = self.middleware(self.tagged)
+        middleware(self.factory.get('/page/'))
+        page_cache.invalidate_tags('other')
+        self.assertEqual(
+            middleware(self.factory.get('/page/'))['X-Page-Cache'], 'HIT')
+
+    def test_untagged_response_is_bypassed(self):
+        middleware = self.middleware(lambda: HttpResponse(b'page'))
+        for _ in range(2):
+            response = middleware(self.factory.get('/page/'))
+            self.assertNotIn('X-Page-Cache', response)
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(page_cache.load_entry(
+            cache, page_cache.page_digest(self.factory.get('/page/'))),
+            page_cache.BYPASS)
+
+    def test_response_with_cookie_is_bypassed(self):
+        def build():
+            response = self.tagged()
+            response.set_cookie('name', 'value')
+            return response
+
+        middleware = self.middleware(build)
+        middleware(self.factory.get('/page/'))
+        self.assertNotIn('X-Page-Cache', middleware(
+            self.factory.get('/page/')))
+        self.assertEqual(self.calls, 2)
+
+    def test_authorized_request_is_not_cached(self):
+        middleware = self.middleware(self.tagged)
+        for _ in range(2):
+            response = middleware(self.factory.get(
+                '/page/', HTTP_AUTHORIZATION='Token key'))
+            self.assertNotIn('X-Page-Cache', response)
+        self.assertEqual(self.calls, 2)
+
+    def test_concurrent_miss_waits_for_single_rebuild(self):
+        results = []
+
+        def build():
+            # Второй запрос приходит, пока первый собирает ответ.
+            waiter = threading.Thread(target=lambda: results.append(
+                middleware(self.factory.get('/page/'))))
+            waiter.start()
+            threads.append(waiter)
+            return self.tagged()
+
+        threads = []
+        middleware = self.middleware(build)
+        self.assertEqual(
+            middleware(self.factory.get('/page/'))['X-Page-Cache'], 'MISS')
+        threads[0].join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results[0]['X-Page-Cache'], 'HIT')
+        self.assertEqual(results[0].content, b'page')
+
+    def test_stale_entry_is_served_while_locked(self):
+        middleware = self.middleware(self.tagged)
+        request = self.factory.get('/page/')
+        middleware(request)
+        page_cache.invalidate_tags('tag')
+        digest = page_cache.page_digest(request)
+        self.assertTrue(page_cache.acquire_lock(cache, digest))
+        self.assertEqual(
+            middleware(self.factory.get('/page/'))['X-Page-Cache'], 'STALE')
+        self.assertEqual(self.calls, 1)
+        page_cache.release_lock(cache, digest)
+        self.assertEqual(
+            middleware(self.factory.get('/page/'))['X-Page-Cache'], 'MISS')
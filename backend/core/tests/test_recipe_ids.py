@@ -0,0 +1,92 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from core.models import Recipe, SiteUser
+from core.recipe_ids import RecipeIdSet, live_recipe_ids, recipe_exists
+from core.tests.utils import run_tasks_immediately
+
+
+class RecipeIdSetTest(TestCase):
+    """Битовая карта id: попадания, промахи и перестроение по TTL."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = SiteUser.objects.create(
+            email='cook@example.com', username='cook')
+        cls.recipe = cls.create_recipes(1)[0]
+
+    @classmethod
+    def create_recipes(cls, count, **kwargs):
+        # bulk_create не отправляет сигналы: так рецепт появляется
+        # в базе из другого процесса.
+        return Recipe.objects.bulk_create(
+            Recipe(author=cls.author, name=f'Рецепт {number}',
+                   text='Текст', cooking_time=10,
+                   image='recipes/images/image.png', **kwargs)
+            for number in range(count))
+
+    def setUp(self):
+        run_tasks_immediately(self)
+        live_recipe_ids.clear()
+        self.addCleanup(live_recipe_ids.clear)
+
+    def test_hit_needs_no_query(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(recipe_exists(self.recipe.pk))
+        with self.assertNumQueries(0):
+            self.assertTrue(recipe_exists(self.recipe.pk))
+
+    def test_miss_falls_back_to_database(self):
+        self.assertTrue(recipe_exists(self.recipe.pk))
+        other = self.create_recipes(1)[0]
+        with self.assertNumQueries(1):
+            self.assertTrue(recipe_exists(other.pk))
+        # Найденный в базе id запоминается.
+        with self.assertNumQueries(0):
+            self.assertTrue(recipe_exists(other.pk))
+        with self.assertNumQueries(1):
+            self.assertFalse(recipe_exists(other.pk + 1))
+
+    def test_signals_keep_map_current(self):
+        self.assertTrue(recipe_exists(self.recipe.pk))
+        recipe = Recipe.objects.create(
+            author=self.author, name='Борщ', text='Текст', cooking_time=10,
+            image='recipes/images/image.png')
+        pk = recipe.pk
+        with self.assertNumQueries(0):
+            self.assertTrue(recipe_exists(pk))
+        recipe.delete()
+        with self.assertNumQueries(1):
+            self.assertFalse(recipe_exists(pk))
+
+    def test_remote_deletion_expires_after_rebuild(self):
+        self.assertTrue(recipe_exists(self.recipe.pk))
+        # Удаление в другом процессе: сигналы сюда не доходят.
+        Recipe.objects.filter(pk=self.recipe.pk).update(is_deleted=True)
+        self.assertIn(self.recipe.pk, live_recipe_ids)
+        with mock.patch.object(live_recipe_ids, 'ttl', 0), \
+                self.captureOnCommitCallbacks(execute=True) as callbacks:
+            # Истёкшая карта ещё отвечает, но ставит перестроение.
+            self.assertIn(self.recipe.pk, live_recipe_ids)
+            self.assertIn(self.recipe.pk, live_recipe_ids)
+        self.assertEqual(len(callbacks), 1)
+        self.assertNotIn(self.recipe.pk, live_recipe_ids)
+        self.assertFalse(recipe_exists(self.recipe.pk))
+
+    def test_changes_during_rebuild_are_kept(self):
+        ids = RecipeIdSet()
+        self.assertIn(self.recipe.pk, ids)
+        read = RecipeIdSet._read
+
+        def read_with_changes():
+            bits = read()
+            # Сигналы, пришедшие, пока читалась база.
+            ids.add(10**6)
+            ids.discard(self.recipe.pk)
+            return bits
+
+        with mock.patch.object(ids, '_read', read_with_changes):
+            ids.rebuild()
+        self.assertIn(10**6, ids)
+        self.assertNotIn(self.recipe.pk, ids)
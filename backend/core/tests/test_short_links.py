@@ -0,0 +1,116 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from core.constants import (RECIPE_SHORT_CODE_ALPHABET,
+                            RECIPE_SHORT_CODE_LENGTH)
+from core.models import Recipe, SiteUser
+from core.short_codes import generate_short_code, resolve_short_code
+
+
+class GenerateShortCodeTest(SimpleTestCase):
+
+    def test_code_is_base62(self):
+        for _ in range(100):
+            code = generate_short_code()
+            self.assertEqual(len(code), RECIPE_SHORT_CODE_LENGTH)
+            self.assertLessEqual(set(code), set(RECIPE_SHORT_CODE_ALPHABET))
+
+    def test_code_is_never_numeric(self):
+        # Первый код из одних цифр совпал бы со старой ссылкой /s/<pk>.
+        digits = iter('1234567' + 'a234567')
+        with mock.patch('core.short_codes.secrets.choice',
+                        side_effect=lambda alphabet: next(digits)):
+            self.assertEqual(generate_short_code(), 'a234567')
+
+
+class ShortLinkTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = SiteUser.objects.create(
+            email='cook@example.com', username='cook')
+        cls.recipe, cls.deleted = (Recipe.objects.create(
+            author=author, name=name, text='Текст', cooking_time=10,
+            image='recipes/images/image.png') for name in ('Борщ', 'Плов'))
+        Recipe.objects.filter(pk=cls.deleted.pk).update(is_deleted=True)
+
+    def setUp(self):
+        resolve_short_code.cache_clear()
+        self.addCleanup(resolve_short_code.cache_clear)
+
+    def assert_redirects_to_recipe(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], f'/recipes/{self.recipe.pk}')
+
+    def test_code_is_assigned_on_create(self):
+        self.assertEqual(len(self.recipe.short_code),
+                         RECIPE_SHORT_CODE_LENGTH)
+        self.assertNotEqual(self.recipe.short_code, self.deleted.short_code)
+
+    def test_short_code(self):
+        self.assert_redirects_to_recipe(f'/s/{self.recipe.short_code}')
+
+    def test_legacy_numeric_link(self):
+        self.assert_redirects_to_recipe(f'/s/{self.recipe.pk}')
+
+    def test_resolved_codes_are_cached(self):
+        resolve_short_code(self.recipe.short_code)
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_short_code(self.recipe.short_code),
+                             self.recipe.pk)
+
+    def test_misses_are_not_cached(self):
+        for _ in range(2):
+            with self.assertRaises(Recipe.DoesNotExist), \
+                    self.assertNumQueries(1):
+                resolve_short_code('unknown')
+        self.assertEqual(resolve_short_code.cache_info().currsize, 0)
+
+    def test_unknown_links_return_404(self):
+        missing = self.deleted.pk + 1
+        for code in ('unknown', str(missing), '²', '١٢',
+                     self.deleted.short_code, str(self.deleted.pk)):
+            with self.subTest(code=code):
+                self.assertEqual(self.client.get(f'/s/{code}').status_code,
+                                 404)
+
+    def test_get_link(self):
+        response = self.client.get(f'/api/recipes/{self.recipe.pk}/get-link/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            {'short-link': f'http://testserver/s/{self.recipe.short_code}'})
+
+    def test_get_link_for_recipe_without_code(self):
+        Recipe.objects.filter(pk=self.recipe.pk).update(short_code=None)
+        response = self.client.get(f'/api/recipes/{self.recipe.pk}/get-link/')
+        self.assertEqual(response.json(), {
+            'short-link': f'http://testserver/s/{self.recipe.pk}'})
+
+    def test_get_link_for_bad_ids(self):
+        for pk in ('abc', '²', self.deleted.pk + 1):
+            with self.subTest(pk=pk):
+                self.assertEqual(self.client.get(
+                    f'/api/recipes/{pk}/get-link/').status_code, 404)
+
+    def test_generate_short_codes_command(self):
+        Recipe.all_objects.update(short_code=None)
+        call_command('generate_short_codes', batch_size=1, stdout=StringIO())
+        self.recipe.refresh_from_db()
+        self.assertEqual(len(self.recipe.short_code),
+                         RECIPE_SHORT_CODE_LENGTH)
+        self.assert_redirects_to_recipe(f'/s/{self.recipe.short_code}')
+
+
+class BenchmarkCommandTest(TestCase):
+
+    def test_benchmark(self):
+        out = StringIO()
+        call_command('benchmark_short_links', recipes=50, lookups=10,
+                     batch_size=20, stdout=out)
+        self.assertIn('кодов в выборке: 10', out.getvalue())
+        self.assertFalse(Recipe.all_objects.exists())
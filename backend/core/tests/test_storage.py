@@ -0,0 +1,50 @@
+import os
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.base import ContentFile, File
+from django.test import SimpleTestCase
+
+from core.storage import ContentAddressedStorage
+
+
+class NonSeekableFile(File):
+
+    def seekable(self):
+        return False
+
+    def chunks(self, chunk_size=None):
+        yield self.file.read()
+
+
+class ContentAddressedStorageTest(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.storage = ContentAddressedStorage(location=directory.name)
+
+    def test_duplicate_upload_writes_nothing(self):
+        name = self.storage.save('recipes/images/a.PNG', ContentFile(b'img'))
+        self.assertTrue(name.startswith('recipes/images/'))
+        self.assertTrue(name.endswith('.png'))
+        with mock.patch('core.storage.tempfile.mkstemp') as mkstemp, \
+                mock.patch('core.storage.os.fsync') as fsync:
+            again = self.storage.save(
+                'recipes/images/b.png', ContentFile(b'img'))
+        self.assertEqual(again, name)
+        mkstemp.assert_not_called()
+        fsync.assert_not_called()
+
+    def test_non_seekable_upload_is_streamed_once(self):
+        name = self.storage.save(
+            'avatar/icons/a.png', NonSeekableFile(BytesIO(b'avatar')))
+        with self.storage.open(name) as stored:
+            self.assertEqual(stored.read(), b'avatar')
+        again = self.storage.save(
+            'avatar/icons/b.png', NonSeekableFile(BytesIO(b'avatar')))
+        self.assertEqual(again, name)
+        self.assertEqual(
+            [entry for entry in os.listdir(self.storage.path(
+                os.path.dirname(name))) if entry.startswith('.upload-')], [])
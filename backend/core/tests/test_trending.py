@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from core.constants import TRENDING_HALF_LIFE_HOURS
+from core.models import Favorite, Recipe, ShopCart, SiteUser
+from core.trending import decay_trending_scores
+
+
+class TrendingScoreTest(TestCase):
+    """Отмена вычитает из популярности затухший вклад, а не исходный вес."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.first, cls.second = SiteUser.objects.bulk_create(
+            SiteUser(email=f'user{number}@example.com',
+                     username=f'user{number}')
+            for number in range(3))
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Рецепт', text='Текст',
+            cooking_time=10, image='recipes/images/image.png')
+
+    def score(self):
+        return Recipe.objects.get(pk=self.recipe.pk).trending_score
+
+    def age(self, model, hours):
+        model.objects.update(
+            added_at=timezone.now() - timedelta(hours=hours))
+
+    def test_removing_old_favorite_keeps_newer_ones(self):
+        old = Favorite.objects.create(user=self.first, recipe=self.recipe)
+        self.age(Favorite, TRENDING_HALF_LIFE_HOURS)
+        decay_trending_scores(0.5)
+        Favorite.objects.create(user=self.second, recipe=self.recipe)
+        self.assertAlmostEqual(self.score(), 1.5)
+        old.refresh_from_db()
+        old.delete()
+        self.assertAlmostEqual(self.score(), 1.0, places=3)
+
+    def test_removing_fresh_cart_entry_subtracts_full_weight(self):
+        Favorite.objects.create(user=self.first, recipe=self.recipe)
+        ShopCart.objects.create(user=self.first, recipe=self.recipe)
+        ShopCart.objects.get().delete()
+        self.assertAlmostEqual(self.score(), 1.0, places=3)
+
+    def test_unknown_age_subtracts_nothing(self):
+        favorite = Favorite.objects.create(
+            user=self.first, recipe=self.recipe)
+        Favorite.objects.update(added_at=None)
+        favorite.refresh_from_db()
+        favorite.delete()
+        self.assertAlmostEqual(self.score(), 1.0)
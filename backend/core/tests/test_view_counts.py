@@ -0,0 +1,50 @@
+from functools import partial
+from unittest import mock
+
+from django.db import DatabaseError
+from django.db.models import QuerySet
+from django.test import TestCase
+
+from core import view_counts
+from core.models import Recipe, SiteUser
+from core.view_counts import ViewCounter
+
+
+class ViewCounterFlushTest(TestCase):
+    """После сбоя пачки в очередь возвращаются только незаписанные."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = SiteUser.objects.create(
+            email='cook@example.com', username='cook')
+        cls.recipes = [
+            Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Текст',
+                cooking_time=10, image='recipes/images/image.png')
+            for number in range(3)]
+
+    def views(self):
+        return list(Recipe.objects.order_by('pk').values_list(
+            'views_count', flat=True))
+
+    def test_failed_batch_is_not_counted_twice(self):
+        counter = ViewCounter()
+        for recipe in self.recipes:
+            counter.hit(recipe.pk)
+        original = QuerySet.update
+        calls = []
+
+        def update(queryset, **kwargs):
+            calls.append(kwargs)
+            if len(calls) == 2:
+                raise DatabaseError('сбой второй пачки')
+            return original(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', update), \
+                mock.patch.object(view_counts, 'write_view_counts', partial(
+                    view_counts.write_view_counts, batch_size=1)), \
+                self.assertLogs('core.view_counts', 'ERROR'):
+            self.assertEqual(counter.flush(), 1)
+        self.assertEqual(self.views(), [1, 0, 0])
+        self.assertEqual(counter.flush(), 2)
+        self.assertEqual(self.views(), [1, 1, 1])
@@ -0,0 +1,15 @@
+from unittest import mock
+
+from core.tasks import ImmediateTaskQueue
+
+
+def run_tasks_immediately(test):
+    """
+    Фоновые задачи теста выполняются в его потоке.
+
+    Иначе задачи из сигналов идут в потоке очереди параллельно с тестом
+    и на SQLite блокируют его таблицы.
+    """
+    patcher = mock.patch('core.tasks._task_queue', ImmediateTaskQueue())
+    patcher.start()
+    test.addCleanup(patcher.stop)
@@ -0,0 +1,72 @@
+"""Популярность рецептов с затуханием по времени."""
+from datetime import timedelta
+
+from django.db.models import Count, F, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .constants import (TRENDING_DECAY_BATCH_SIZE, TRENDING_FAVORITE_WEIGHT,
+                        TRENDING_HALF_LIFE_HOURS, TRENDING_MIN_SCORE,
+                        TRENDING_SHOPPING_CART_WEIGHT)
+from .models import Favorite, Recipe, ShopCart
+from .page_cache import TRENDING_TAG, invalidate_tags
+
+
+def add_trending_score(recipe_id, weight):
+    """Прибавляет вес к популярности; отрицательный вес — для отмены."""
+    Recipe.objects.filter(pk=recipe_id).update(
+        trending_score=Greatest(F('trending_score') + weight, Value(0.0)))
+    invalidate_tags(TRENDING_TAG)
+
+
+def decayed_weight(weight, added_at, now=None):
+    """
+    Сколько осталось от вклада weight, добавленного в added_at.
+
+    Столько и вычитается при отмене: исходный вес за это время уже
+    уменьшился затуханием, и его вычитание съело бы вклад более новых
+    действий. Без даты добавления вклад считается затухшим.
+    """
+    if added_at is None:
+        return 0.0
+    hours = max((now or timezone.now()) - added_at,
+                timedelta()).total_seconds() / 3600
+    return weight * 0.5 ** (hours / TRENDING_HALF_LIFE_HOURS)
+
+
+def decay_trending_scores(factor, batch_size=TRENDING_DECAY_BATCH_SIZE):
+    """
+    Умножает все ненулевые оценки на `factor` пачками по диапазонам pk.
+
+    Оценки, которые станут меньше TRENDING_MIN_SCORE, обнуляются, чтобы
+    следующие проходы их не трогали. Возвращает число изменённых строк.
+    """
+    max_pk = Recipe.objects.aggregate(max_pk=Max('pk'))['max_pk'] or 0
+    threshold = TRENDING_MIN_SCORE / factor
+    changed = 0
+    for start in range(0, max_pk, batch_size):
+        batch = Recipe.objects.filter(
+            pk__gt=start, pk__lte=start + batch_size, trending_score__gt=0)
+        changed += batch.filter(trending_score__lt=threshold).update(
+            trending_score=0)
+        changed += batch.filter(trending_score__gte=threshold).update(
+            trending_score=F('trending_score') * factor)
+    invalidate_tags(TRENDING_TAG)
+    return changed
+
+
+def _count(model):
+    return Coalesce(Subquery(
+        model.objects.filter(recipe=OuterRef('pk')).order_by()
+        .values('recipe').annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def rebuild_trending_scores():
+    """Пересчитывает оценки по текущему избранному и корзинам без затухания."""
+    changed = Recipe.objects.update(trending_score=(
+        _count(Favorite) * TRENDING_FAVORITE_WEIGHT
+        + _count(ShopCart) * TRENDING_SHOPPING_CART_WEIGHT
+    ))
+    invalidate_tags(TRENDING_TAG)
+    return changed
@@ -1,8 +1,9 @@
 from django.urls import path
 
-from .views import short_link
+from .views import metrics_view, short_link
 
 urlpatterns = [
     path(
-        's/<int:pk>', short_link, name='short_link'),
+        's/<str:code>', short_link, name='short_link'),
+    path('metrics', metrics_view, name='metrics'),
 ]
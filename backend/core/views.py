@@ -1,8 +1,34 @@
-from django.shortcuts import get_object_or_404, redirect
+from django.http import Http404, HttpResponse
+from django.shortcuts import redirect
 
+from . import metrics
+from .constants import RECIPE_FRONTEND_URL
 from .models import Recipe
+from .page_cache import recipe_tag, set_cache_tags
+from .view_counts import record_view
+from .recipe_ids import recipe_exists
+from .short_codes import resolve_short_code
 
 
-def short_link(request, pk):
-    recipe = get_object_or_404(Recipe, pk=pk)
-    return redirect(recipe.get_absolute_url())
+def short_link(request, code):
+    # Числовые ссылки /s/<pk> выдавались до появления коротких кодов.
+    # isdigit() без isascii() пропустил бы и цифры вроде «²».
+    if code.isascii() and code.isdigit():
+        pk = int(code)
+    else:
+        try:
+            pk = resolve_short_code(code)
+        except Recipe.DoesNotExist:
+            raise Http404('Рецепт не найден.')
+    if not recipe_exists(pk):
+        raise Http404('Рецепт не найден.')
+    response = redirect(RECIPE_FRONTEND_URL.format(pk=pk))
+    return record_view(pk, set_cache_tags(response, recipe_tag(pk)))
+
+
+def metrics_view(request):
+    # Посторонним адрес не должен выдавать даже своё существование.
+    if not metrics.is_metrics_allowed(request):
+        raise Http404
+    return HttpResponse(metrics.registry.render(),
+                        content_type=metrics.CONTENT_TYPE)
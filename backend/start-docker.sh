@@ -27,4 +27,4 @@ python manage.py loaddata data/test_data.json
 
 echo "Запуск Gunicorn"
 # python manage.py runserver
-gunicorn --bind 0.0.0.0:8000 config.wsgi --log-level "debug" --enable-stdio-inheritance
+gunicorn --bind 0.0.0.0:8000 config.wsgi --preload --log-level "${GUNICORN_LOG_LEVEL:-info}" --enable-stdio-inheritance